@@ -0,0 +1,41 @@
+"""
+ASGI entry point of the application, for ASGI servers:
+
+    uvicorn asgi:application --workers 4
+
+Flask is a WSGI application. asgiref's WsgiToAsgi alone runs all the requests
+of a process on a single thread, one at a time: every request is served in an
+asgiref ThreadSensitiveContext of its own instead, which gives it a thread of
+its own, as Django's ASGI handler does. At most ASGI_THREADS (32 by default)
+requests are handed to the application at once, like the threads of a
+threaded WSGI server. Set ASYNC_VIEWS to serve the event reads with async
+views, see project.async_db for what they do and do not change; their engine
+pools its connections in the event loop of the server.
+"""
+import asyncio
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+from project import create_app
+
+app = create_app(asgi=True)
+
+
+class ThreadPerRequestWsgiToAsgi(WsgiToAsgi):
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        self.threads = threads
+        self._slots = None
+
+    async def __call__(self, scope, receive, send):
+        if self._slots is None:
+            # Created here, on the event loop of the server
+            self._slots = asyncio.Semaphore(self.threads)
+        async with self._slots, ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+application = ThreadPerRequestWsgiToAsgi(app, int(os.getenv('ASGI_THREADS', 32)))
@@ -0,0 +1,119 @@
+"""
+Benchmark of the async views against the synchronous ones at high concurrency.
+
+Seeds the events table, then starts the application in a separate process for
+every deployment and has --concurrency clients request GET /events/<id> of
+random events for --seconds, recording the requests per second, the latency
+percentiles and the errors:
+
+    wsgi        the threaded WSGI server of `flask run`, synchronous views
+    wsgi-async  the same server with ASYNC_VIEWS (see project.async_db)
+    asgi-async  uvicorn serving asgi.py with ASYNC_VIEWS, if uvicorn is installed
+
+The response cache is disabled, so every request reads the database. The
+async deployments need asyncpg.
+
+    python -m benchmarks.bench_async_views --concurrency 16 64 256 --seconds 10
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+
+import sqlalchemy as sa
+
+from benchmarks.common import (BENCH_TITLE_PREFIX, create_bench_app, delete_bench_events,
+                               http_load, load_result, print_table, seed_events,
+                               wait_until_up)
+from config import ProductionConfig
+from project import db
+from project.models import Event
+
+
+class SyncConfig(ProductionConfig):
+    CACHE_BACKEND = 'none'
+    INITIALIZE_DATABASE = False
+    SCHEDULER_RUN_LEADER_IN_APP = False
+
+
+class AsyncConfig(SyncConfig):
+    ASYNC_VIEWS = True
+
+
+# Command and configuration of every deployment, {port} is replaced
+DEPLOYMENTS = {
+    'wsgi': ([sys.executable, '-m', 'benchmarks.bench_async_views', '--serve', '{port}'],
+             'benchmarks.bench_async_views.SyncConfig'),
+    'wsgi-async': ([sys.executable, '-m', 'benchmarks.bench_async_views', '--serve', '{port}'],
+                   'benchmarks.bench_async_views.AsyncConfig'),
+    'asgi-async': ([sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}',
+                    '--no-access-log', '--log-level', 'warning'],
+                   'benchmarks.bench_async_views.AsyncConfig'),
+}
+
+
+def serve(port):
+    app = create_bench_app()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.run(port=port, threaded=True)
+
+
+def run(name, args, event_ids):
+    command, config_type = DEPLOYMENTS[name]
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen([part.format(port=args.port) for part in command],
+                              env={**os.environ, 'CONFIG_TYPE': config_type})
+    results = []
+    urls = [f'{base_url}/events/{event_id}' for event_id in event_ids]
+    try:
+        wait_until_up(f'{base_url}/tags')
+        for concurrency in args.concurrency:
+            http_load(urls, concurrency, 1)  # warm up
+            results.append(load_result(name, concurrency,
+                                       *http_load(urls, concurrency, args.seconds)))
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--deployments', nargs='+', choices=list(DEPLOYMENTS),
+                        default=list(DEPLOYMENTS))
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+
+    deployments = args.deployments
+    if 'asgi-async' in deployments and importlib.util.find_spec('uvicorn') is None:
+        print('uvicorn is not installed, skipping the asgi-async deployment.')
+        deployments = [name for name in deployments if name != 'asgi-async']
+
+    app = create_bench_app()
+    with app.app_context():
+        seed_events(db, args.events)
+        event_ids = db.session.execute(sa.select(Event.id).where(
+            Event.title.like(BENCH_TITLE_PREFIX + '%'))).scalars().all()
+        db.session.rollback()
+        try:
+            results = [result for name in deployments for result in run(name, args, event_ids)]
+            print_table(f'GET /events/<id> for {args.seconds} s per run', results)
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                delete_bench_events(db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of POST /events/batch against the same events sent as single POST /events.
+
+Both variants go through the whole Flask stack (routing, JWT check, user
+lookup, validation and database writes) using the test client, so the
+difference is the per-request and per-transaction overhead.
+
+    python -m benchmarks.bench_event_batch --events 500 --rounds 5
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from itertools import count
+
+from benchmarks.common import (BENCH_TITLE_PREFIX, bench_user_token,
+                               create_bench_app, delete_bench_events, print_table)
+from project import db
+
+_serial = count()
+
+
+def make_events(number):
+    event_date = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return [{
+        'title': f'{BENCH_TITLE_PREFIX}{next(_serial)}-{time.time_ns()}',
+        'description': 'Benchmark event',
+        'venue': 'Benchmark venue',
+        'location': 'Benchmark location',
+        'event_date': event_date,
+        'tags': ['bench'],
+    } for _ in range(number)]
+
+
+def post_single(client, headers, events):
+    for event in events:
+        response = client.post('/events', json=event, headers=headers)
+        assert response.status_code == 201, response.get_json()
+
+
+def post_batch(client, headers, events, batch_size):
+    for start in range(0, len(events), batch_size):
+        response = client.post('/events/batch', json=events[start:start + batch_size],
+                               headers=headers)
+        assert response.status_code == 201, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=500,
+                        help='events created per round and variant')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    client = app.test_client()
+    with app.app_context():
+        headers = {'x-access-tokens': bench_user_token(client)}
+        variants = {
+            f'{args.events} x POST /events': lambda events: post_single(
+                client, headers, events),
+            f'POST /events/batch ({args.batch_size} per request)': lambda events: post_batch(
+                client, headers, events, args.batch_size),
+        }
+        results = []
+        try:
+            for name, run in variants.items():
+                durations = []
+                for _ in range(args.rounds):
+                    events = make_events(args.events)
+                    start = time.perf_counter()
+                    run(events)
+                    durations.append(time.perf_counter() - start)
+                best = min(durations)
+                results.append({'name': name,
+                                'best_s': round(best, 3),
+                                'events_per_s': round(args.events / best, 1)})
+        finally:
+            delete_bench_events(db)
+    print_table(f'Creating {args.events} events (best of {args.rounds} rounds)', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark of the GET /events query patterns with and without the listing indexes.
+
+Seeds a large events table, then records the EXPLAIN (ANALYZE, BUFFERS) plan
+and the latency of the first page and of a deep page for every filter + sort
+combination of GET /events, first without the events indexes and then with
+them.
+
+The indexes are dropped for the whole table while the benchmark runs, so it
+only runs against a scratch database, named with --scratch-database: it
+refuses to start when the application is configured (.env) for another one.
+
+    python -m benchmarks.bench_event_indexes --scratch-database bench --events 1000000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from benchmarks.common import (create_bench_app, delete_bench_events, measure,
+                               print_table, seed_events, summarize)
+from project import db
+from project.events.pagination import encode_cursor, order_events, seek
+from project.models import Event
+
+NOW = datetime.now().replace(second=0, microsecond=0)
+FILTERS = {
+    'none': None,
+    'location': Event.location == 'Location 42',
+    'venue': Event.venue == 'Venue 123',
+    # ?upcoming=1&to=<in a week>, the seeded dates span a year around now
+    'upcoming week': sa.and_(Event.event_date >= NOW,
+                             Event.event_date < NOW + timedelta(days=7)),
+}
+SORTS = [None, 'date', 'popularity', 'creation_time']
+PAGE_SIZE = 50
+
+
+def page_query(criterion, sort_by, cursor):
+    query = Event.query
+    if criterion is not None:
+        query = query.filter(criterion)
+    return seek(query, sort_by, cursor).limit(PAGE_SIZE + 1)
+
+
+def deep_cursor(criterion, sort_by, depth):
+    """Cursor pointing depth rows into the ordered result."""
+    query = Event.query
+    if criterion is not None:
+        query = query.filter(criterion)
+    event = order_events(query, sort_by).offset(depth).limit(1).first()
+    return encode_cursor(event, sort_by) if event else None
+
+
+def explain(query):
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql(
+        'EXPLAIN (ANALYZE, BUFFERS) ' + str(compiled), compiled.params)
+    return '\n'.join(row[0] for row in rows)
+
+
+def run_patterns(label, runs, plans):
+    results = []
+    for filter_name, criterion in FILTERS.items():
+        for sort_by in SORTS:
+            cursors = {'first': None,
+                       'deep': deep_cursor(criterion, sort_by, depth=5000)}
+            for page, cursor in cursors.items():
+                query = page_query(criterion, sort_by, cursor)
+                name = f'filter={filter_name} sort_by={sort_by} page={page}'
+                plans.write(f'-- [{label}] {name}\n{explain(query)}\n\n')
+                latencies = measure(query.all, runs)
+                db.session.rollback()
+                results.append({'name': name, **summarize(latencies)})
+    print_table(f'{label} ({runs} runs per pattern)', results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scratch-database', required=True, metavar='NAME',
+                        help='name of the database the application is configured for, '
+                             'whose indexes may be dropped')
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--plans', default='event_index_plans.txt',
+                        help='file the EXPLAIN plans are written to')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        database = db.session.execute(sa.text('SELECT current_database()')).scalar()
+        db.session.rollback()
+    if database != args.scratch_database:
+        parser.error(f"the application is configured for the database {database!r}, "
+                     f"not {args.scratch_database!r}: refusing to drop its indexes")
+
+    with app.app_context(), open(args.plans, 'w') as plans:
+        seed_events(db, args.events)
+        indexes = list(Event.__table__.indexes)
+        try:
+            connection = db.session.connection()
+            for index in indexes:
+                index.drop(bind=connection, checkfirst=True)
+            db.session.commit()
+            run_patterns('without indexes', args.runs, plans)
+
+            connection = db.session.connection()
+            for index in indexes:
+                index.create(bind=connection, checkfirst=True)
+            db.session.execute(db.text('ANALYZE events'))
+            db.session.commit()
+            run_patterns('with indexes', args.runs, plans)
+        finally:
+            db.session.rollback()
+            connection = db.session.connection()
+            for index in indexes:
+                index.create(bind=connection, checkfirst=True)
+            db.session.commit()
+            if not args.keep:
+                delete_bench_events(db)
+    print(f'\nEXPLAIN plans written to {args.plans}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of GET /events/search on a large events table.
+
+Seeds the events table, then measures the latency of search requests whose
+words match a growing share of the events: a single event, about 0.7% (two
+words), 7.7% (one word), and the second page of the latter. Every query is
+also timed as the ILIKE scan a search without the search vector would need.
+
+    python -m benchmarks.bench_event_search --events 1000000
+"""
+import argparse
+
+import sqlalchemy as sa
+
+from benchmarks.common import (create_bench_app, delete_bench_events, measure,
+                               print_table, seed_events, summarize)
+from project import db
+from project.models import Event
+
+# Search string and the words an ILIKE scan would have to match
+QUERIES = {
+    'one event': ('"number 123457"', ['number 123457']),
+    'two words': ('jazz festival', ['jazz', 'festival']),
+    'one word': ('jazz', ['jazz']),
+}
+PAGE_SIZE = 50
+
+
+def ilike_scan(words):
+    criteria = [sa.or_(Event.title.ilike(f'%{word}%'), Event.description.ilike(f'%{word}%'))
+                for word in words]
+    return Event.query.filter(*criteria).order_by(Event.id).limit(PAGE_SIZE + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_events(db, args.events)
+        try:
+            results = []
+            for name, (q, words) in QUERIES.items():
+                params = {'q': q, 'limit': PAGE_SIZE}
+                response = client.get('/events/search', query_string=params)
+                assert response.status_code == 200, response.get_data(as_text=True)
+                next_params = {**params, 'cursor': response.get_json()['next_cursor']}
+                results.append({'name': f'{name}, search', **summarize(measure(
+                    lambda: client.get('/events/search', query_string=params), args.runs))})
+                if next_params['cursor']:
+                    results.append({'name': f'{name}, search page 2', **summarize(measure(
+                        lambda: client.get('/events/search', query_string=next_params),
+                        args.runs))})
+                results.append({'name': f'{name}, ILIKE scan',
+                                **summarize(measure(ilike_scan(words).all, args.runs))})
+                db.session.rollback()
+            print_table(f'Search of {args.events} events ({args.runs} runs per query)', results)
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                delete_bench_events(db)
+
+
+if __name__ == '__main__':
+    main()
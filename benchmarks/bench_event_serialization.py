@@ -0,0 +1,151 @@
+"""
+Microbenchmark of the event read path: ORM instances against Core rows.
+
+Compares, in rows per second, the previous read path of GET /events (Event
+instances loaded by the ORM, copied into dicts with strftime() and encoded
+by Flask's JSON provider) with the current one (Core select() rows zipped
+with the field names and encoded by project.json_provider). Reading is
+measured on a seeded events table, serializing on the rows read, so both
+steps and their sum are reported.
+
+With --no-database only the serialization is measured, on synthetic rows
+and on transient Event instances.
+
+    python -m benchmarks.bench_event_serialization --rows 200 5000
+"""
+import argparse
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.common import create_bench_app, delete_bench_events, print_table, seed_events
+from project import db
+from project.events.serialization import event_columns, event_dicts
+from project.json_provider import JSONProvider
+from project.models import Event
+
+
+def orm_event_to_dict(event):
+    # The serializer of the ORM read path, before the Core rows
+    return {
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'venue': event.venue,
+        'location': event.location,
+        'event_date': event.event_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'tags': event.tags,
+        'participants': event.participants,
+    }
+
+
+def best_seconds(func, runs):
+    """Best time of runs calls of func, the least disturbed by the rest of the machine."""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def serializers(app):
+    default_provider = DefaultJSONProvider(app)
+    json_provider = JSONProvider(app)
+
+    def orm(events):
+        return default_provider.dumps({'events': [orm_event_to_dict(event) for event in events]},
+                                      separators=(',', ':'))
+
+    def core(rows):
+        return json_provider.dumps({'events': event_dicts(rows)})
+
+    return orm, core
+
+
+def synthetic_data(count):
+    events, rows = [], []
+    for number in range(1, count + 1):
+        event = Event(f'Bench Event {number}', f'Benchmark jazz concert event number {number}',
+                      f'Venue {number % 500}', f'Location {number % 100}',
+                      datetime(2099, 1, 1, 12, 0), ['tag1', 'tag2'], participants=number)
+        event.id = number
+        events.append(event)
+        rows.append(tuple(getattr(event, column.key) for column in event_columns()))
+    return events, rows
+
+
+def result(name, count, seconds):
+    return {'name': name, 'rows': count, 'ms': round(seconds * 1000, 3),
+            'rows_per_s': int(count / seconds)}
+
+
+def run_without_database(counts, runs):
+    orm, core = serializers(Flask(__name__))
+    results = []
+    for count in counts:
+        events, rows = synthetic_data(count)
+        results.append(result('serialize ORM instances', count,
+                              best_seconds(lambda: orm(events), runs)))
+        results.append(result('serialize Core rows', count,
+                              best_seconds(lambda: core(rows), runs)))
+    print_table(f'Serialization only (best of {runs} runs)', results)
+
+
+def run_with_database(app, counts, runs):
+    orm, core = serializers(app)
+    results = []
+    for count in counts:
+        def read_orm():
+            events = Event.query.order_by(Event.id).limit(count).all()
+            # Ends the transaction and empties the identity map, like the end of a
+            # request, without expiring the loaded events
+            db.session.close()
+            return events
+
+        def read_core():
+            statement = sa.select(*event_columns()).order_by(Event.id).limit(count)
+            rows = db.session.execute(statement).all()
+            db.session.close()
+            return rows
+
+        events, rows = read_orm(), read_core()
+        for name, read, serialize, data in [('ORM', read_orm, orm, events),
+                                            ('Core', read_core, core, rows)]:
+            read_seconds = best_seconds(read, runs)
+            serialize_seconds = best_seconds(lambda: serialize(data), runs)
+            results.append(result(f'{name} read', count, read_seconds))
+            results.append(result(f'{name} serialize', count, serialize_seconds))
+            results.append(result(f'{name} total', count, read_seconds + serialize_seconds))
+    print_table(f'Event read path (best of {runs} runs)', results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[200, 5000])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--no-database', action='store_true',
+                        help='only measure the serialization, on synthetic data')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    if args.no_database:
+        return run_without_database(args.rows, args.runs)
+
+    app = create_bench_app()
+    with app.app_context():
+        seed_events(db, max(args.rows))
+        try:
+            run_with_database(app, args.rows, args.runs)
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                delete_bench_events(db)
+
+
+if __name__ == '__main__':
+    main()
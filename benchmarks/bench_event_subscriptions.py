@@ -0,0 +1,149 @@
+"""
+Concurrent load test of POST /events/<id>/subscribe and /unsubscribe.
+
+--users seeded users hit --events events from --concurrency threads at once:
+every user subscribes twice to one of them, and every other user unsubscribes
+again (twice too), in a shuffled order. The run fails unless the participants
+of every event end up exactly at their initial value plus the subscriptions
+left, and the responses report every change exactly once. It is repeated for
+every value of --shards (0 updates the event row, see
+project.events.subscriptions), folding the shards before checking the counts,
+and of --events: subscriptions to different events share no row, so they
+should not be slower than those to a single hot event.
+
+    python -m benchmarks.bench_event_subscriptions --users 2000 --shards 0 16 --events 1 16
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from benchmarks.common import (BENCH_TITLE_PREFIX, create_bench_app, delete_bench_events,
+                               print_table)
+from project import db
+from project.events import subscriptions
+from project.models import Event, event_subscriptions
+from project.tokens import issue_tokens
+
+EMAIL_PREFIX = 'bench-subscriber-'
+INITIAL_PARTICIPANTS = 1
+
+
+def seed_users(count):
+    """Insert count users, without hashing any password, and return their ids."""
+    db.session.execute(sa.text("""
+        INSERT INTO users (email, password_hashed, registered_on)
+        SELECT :prefix || g || '@example.com', 'not a password hash', now()
+        FROM generate_series(1, :count) AS g
+        ON CONFLICT (email) DO NOTHING
+    """), {'prefix': EMAIL_PREFIX, 'count': count})
+    user_ids = db.session.execute(sa.text(
+        'SELECT id FROM users WHERE email LIKE :pattern ORDER BY id LIMIT :count'),
+        {'pattern': EMAIL_PREFIX + '%', 'count': count}).scalars().all()
+    db.session.commit()
+    return user_ids
+
+
+def delete_users():
+    db.session.execute(sa.text('DELETE FROM users WHERE email LIKE :pattern'),
+                       {'pattern': EMAIL_PREFIX + '%'})
+    db.session.commit()
+
+
+def create_event(shards):
+    event = Event(f'{BENCH_TITLE_PREFIX}subscriptions {shards} {time.time_ns()}',
+                  'Benchmark event', 'Benchmark venue', 'Benchmark location',
+                  datetime.now() + timedelta(days=30), ['bench'],
+                  participants=INITIAL_PARTICIPANTS)
+    db.session.add(event)
+    db.session.commit()
+    return event.id
+
+
+def operations(event_ids, tokens):
+    """The requests of the run, shuffled, as (path, token) pairs."""
+    ops = []
+    for number, token in enumerate(tokens):
+        event_id = event_ids[number % len(event_ids)]
+        ops += [(f'/events/{event_id}/subscribe', token)] * 2
+        if number % 2:
+            ops += [(f'/events/{event_id}/unsubscribe', token)] * 2
+    random.shuffle(ops)
+    return ops
+
+
+def run(app, tokens, shards, events, concurrency):
+    app.config['EVENTS_PARTICIPANT_SHARDS'] = shards
+    event_ids = [create_event(shards) for _ in range(events)]
+    ops = operations(event_ids, tokens)
+
+    def send(op):
+        path, token = op
+        with app.test_client() as client:
+            response = client.post(path, headers={'x-access-tokens': token})
+        assert response.status_code in (200, 201), response.get_json()
+        return response.get_json()['message']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(send, ops))
+    elapsed = time.perf_counter() - start
+
+    if shards:
+        subscriptions.fold_shards()
+        db.session.commit()
+
+    # A subscription can come after the unsubscription of the same user, so only
+    # the numbers reported by the responses are known in advance of the counts
+    subscribed = results.count('Subscribed to event successfully')
+    unsubscribed = results.count('Unsubscribed from event successfully')
+    participants = dict(db.session.execute(
+        sa.select(Event.id, Event.participants).where(Event.id.in_(event_ids))).all())
+    rows = dict(db.session.execute(
+        sa.select(event_subscriptions.c.event_id, sa.func.count())
+        .where(event_subscriptions.c.event_id.in_(event_ids))
+        .group_by(event_subscriptions.c.event_id)).all())
+    db.session.rollback()
+
+    # Every even user is subscribed in the end, whatever the order of the requests
+    total = sum(rows.values())
+    exact = (all(participants[event_id] == INITIAL_PARTICIPANTS + rows.get(event_id, 0)
+                 for event_id in event_ids)
+             and total == subscribed - unsubscribed
+             and total >= (len(tokens) + 1) // 2)
+    assert exact, (f'{shards} shards, {events} events: {participants} participants, '
+                   f'{rows} subscriptions, {subscribed} subscribed, {unsubscribed} unsubscribed')
+    return {'name': f'{shards} shards' if shards else 'event row', 'events': events,
+            'requests': len(ops), 'requests_per_s': round(len(ops) / elapsed, 1),
+            'subscriptions': total, 'participants': sum(participants.values()),
+            'exact': exact}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--shards', type=int, nargs='+', default=[0, 16])
+    parser.add_argument('--events', type=int, nargs='+', default=[1, 16],
+                        help='numbers of events the users subscribe to')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        user_ids = seed_users(args.users)
+        tokens = [issue_tokens(user_id)['token'] for user_id in user_ids]
+        try:
+            results = [run(app, tokens, shards, events, args.concurrency)
+                       for events in args.events for shards in args.shards]
+            print_table(f'{args.users} users, {args.concurrency} threads', results)
+        finally:
+            db.session.rollback()
+            delete_bench_events(db)
+            delete_users()
+
+
+if __name__ == '__main__':
+    main()
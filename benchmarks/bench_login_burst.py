@@ -0,0 +1,128 @@
+"""
+Benchmark of a burst of POST /login against the latency of unrelated requests.
+
+For every value of --hash-workers the application is started in a separate
+process with the threaded development server and PASSWORD_HASH_WORKERS set to
+that value (0 hashes on the request threads). While --concurrency clients log
+in --logins times, another client keeps requesting GET /events and records
+its latencies, which are compared with the same requests without the burst.
+
+    python -m benchmarks.bench_login_burst --logins 200 --hash-workers 0 4
+"""
+import argparse
+import base64
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import create_bench_app, print_table, summarize
+
+EMAIL = 'bench-user@example.com'
+PASSWORD = 'Bench1234!'
+
+
+def serve(port, hash_workers):
+    from project import password_hasher
+
+    app = create_bench_app()
+    app.config['PASSWORD_HASH_WORKERS'] = hash_workers
+    password_hasher.init_app(app)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.run(port=port, threaded=True)
+
+
+def request(url, method='GET', headers=None, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, body, method=method,
+                                 headers={'Content-Type': 'application/json',
+                                          **(headers or {})})
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read() or 'null')
+
+
+def login(base_url):
+    credentials = base64.b64encode(f'{EMAIL}:{PASSWORD}'.encode()).decode()
+    return request(f'{base_url}/login', 'POST',
+                   {'Authorization': f'Basic {credentials}'})['token']
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f'{base_url}/swagger/').close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def get_latencies(base_url, headers, stop):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        request(f'{base_url}/events?limit=1', headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(args, hash_workers):
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_login_burst',
+                               '--serve', '--port', str(args.port),
+                               '--hash-workers', str(hash_workers)])
+    try:
+        wait_until_up(base_url)
+        request(f'{base_url}/register', 'POST', data={'email': EMAIL, 'password': PASSWORD})
+        headers = {'x-access-tokens': login(base_url)}
+
+        # Unrelated requests alone
+        stop = threading.Event()
+        timer = threading.Timer(args.idle_seconds, stop.set)
+        timer.start()
+        idle = get_latencies(base_url, headers, stop)
+
+        # The same requests during the login burst
+        stop = threading.Event()
+        with ThreadPoolExecutor(args.concurrency + 1) as pool:
+            busy = pool.submit(get_latencies, base_url, headers, stop)
+            start = time.perf_counter()
+            list(pool.map(lambda _: login(base_url), range(args.logins)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            busy = busy.result()
+    finally:
+        server.terminate()
+        server.wait()
+
+    idle, busy = summarize(idle), summarize(busy)
+    return {'name': f'{hash_workers} hash workers',
+            'logins_per_s': round(args.logins / elapsed, 1),
+            'get_p50_idle_ms': idle['p50_ms'], 'get_p99_idle_ms': idle['p99_ms'],
+            'get_p50_burst_ms': busy['p50_ms'], 'get_p99_burst_ms': busy['p99_ms']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--hash-workers', type=int, nargs='+', default=[0, 4])
+    parser.add_argument('--idle-seconds', type=float, default=3)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.port, args.hash_workers[0])
+    results = [run(args, hash_workers) for hash_workers in args.hash_workers]
+    print_table(f'{args.logins} logins by {args.concurrency} clients', results)
+
+
+if __name__ == '__main__':
+    main()
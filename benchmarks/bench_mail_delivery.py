@@ -0,0 +1,106 @@
+"""
+Benchmark of the reminder e-mail delivery against a local SMTP server.
+
+An aiosmtpd server (pip install aiosmtpd) listening on localhost stands in for
+the mail server and counts the messages it receives. The variants send the
+same reminders with mail.send(), one SMTP connection per message, and through
+the Mailer with different numbers of workers. No database is needed.
+
+    python -m benchmarks.bench_mail_delivery --messages 2000 --workers 1 4
+"""
+import argparse
+import threading
+import time
+
+from flask import Flask
+from flask_mail import Mail, Message
+
+from benchmarks.common import print_table
+from project.mailer import Mailer
+
+
+class CountingHandler:
+
+    def __init__(self):
+        self.received = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.received += 1
+        return '250 Message accepted for delivery'
+
+
+def start_smtp_server(port):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit('This benchmark needs aiosmtpd: pip install aiosmtpd')
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    return controller, handler
+
+
+def make_app(port, workers):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                      MAIL_DEFAULT_SENDER='events@example.com', MAIL_WORKERS=workers,
+                      MAIL_QUEUE_SIZE=1000, MAIL_BATCH_SIZE=100, MAIL_RETRY_BACKOFF=0.1)
+    return app
+
+
+def make_messages(number):
+    return [Message('Event Reminder', sender='events@example.com',
+                    recipients=[f'user{n}@example.com'],
+                    body=f"Your event 'Bench Event {n}' is scheduled in 30 minutes!")
+            for n in range(number)]
+
+
+def send_one_by_one(app, messages):
+    mail = Mail(app)
+    with app.app_context():
+        for message in messages:
+            mail.send(message)
+
+
+def send_with_mailer(app, messages):
+    Mail(app)
+    mailer = Mailer(app)
+    with app.app_context():
+        mailer.send_many(messages)
+        mailer.join()
+        mailer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    controller, handler = start_smtp_server(args.port)
+    variants = [('mail.send() per message', 1, send_one_by_one)]
+    variants += [(f'Mailer, {workers} workers', workers, send_with_mailer)
+                 for workers in args.workers]
+    results = []
+    try:
+        for name, workers, send in variants:
+            app = make_app(args.port, workers)
+            messages = make_messages(args.messages)
+            received = handler.received
+            start = time.perf_counter()
+            send(app, messages)
+            elapsed = time.perf_counter() - start
+            assert handler.received - received == args.messages
+            results.append({'name': name,
+                            'seconds': round(elapsed, 3),
+                            'messages_per_s': round(args.messages / elapsed, 1)})
+    finally:
+        controller.stop()
+    print_table(f'Delivering {args.messages} reminders', results)
+
+
+if __name__ == '__main__':
+    main()
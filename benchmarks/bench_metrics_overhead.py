@@ -0,0 +1,62 @@
+"""
+Benchmark of the overhead of the metrics on requests and SQL statements.
+
+A minimal application serves a route executing --statements statements on an
+in-memory SQLite database, with and without the metrics of project.metrics,
+through the Flask test client. The difference of the latencies is the cost of
+the request hooks and the engine events. No database needs to be configured.
+
+    python -m benchmarks.bench_metrics_overhead --runs 5000 --statements 5
+"""
+import argparse
+
+import sqlalchemy as sa
+from flask import Flask
+
+from benchmarks.common import measure, print_table, summarize
+from project.metrics import Metrics
+
+
+def make_app(with_metrics, statements):
+    app = Flask(__name__)
+    app.config['METRICS_ENABLED'] = with_metrics
+    engine = sa.create_engine('sqlite://')
+    if with_metrics:
+        Metrics(app).instrument_engine(engine)
+
+    @app.route('/events')
+    def get_events():
+        with engine.connect() as connection:
+            for _ in range(statements):
+                connection.execute(sa.text('SELECT 1'))
+        return {'events': []}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5000)
+    parser.add_argument('--statements', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    clients = {with_metrics: make_app(with_metrics, args.statements).test_client()
+               for with_metrics in (False, True)}
+    # Alternate the variants and keep the best round of each, to even out noise
+    best = {}
+    for _ in range(args.rounds):
+        for with_metrics, client in clients.items():
+            summary = summarize(measure(lambda: client.get('/events'), args.runs, warmup=100))
+            if with_metrics not in best or summary['p50_ms'] < best[with_metrics]['p50_ms']:
+                best[with_metrics] = summary
+    results = [{'name': 'with metrics' if with_metrics else 'without metrics', **summary}
+               for with_metrics, summary in best.items()]
+    overhead = (best[True]['p50_ms'] - best[False]['p50_ms']) * 1000
+    print_table(f'GET with {args.statements} statements (best of {args.rounds} rounds)',
+                results)
+    print(f'\nOverhead: {overhead:.1f} us per request (p50)')
+
+
+if __name__ == '__main__':
+    main()
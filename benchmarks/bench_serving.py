@@ -0,0 +1,120 @@
+"""
+Benchmark of the production server against the development server.
+
+Seeds the events table, then starts the application in a separate process for
+every server and has --concurrency clients request pages of GET /events and
+GET /events/<id> of random events for --seconds, recording the requests per
+second, the latency percentiles and the errors:
+
+    flask-debug     `flask --debug run --cert=adhoc`, the previous
+                    docker-compose command: one process, reloader, HTTPS
+    gunicorn        gunicorn.conf.py with gthread workers
+    gunicorn-gevent gunicorn.conf.py with gevent workers, if gevent and
+                    psycogreen are installed
+
+Every server runs the same configuration with the response cache disabled,
+so every request reads the database. Clients open a connection per request:
+the TLS handshakes of flask-debug are part of its numbers, as they were for
+its clients.
+
+    python -m benchmarks.bench_serving --concurrency 16 64 256 --workers 4
+"""
+import argparse
+import importlib.util
+import os
+import signal
+import ssl
+import subprocess
+import sys
+
+import sqlalchemy as sa
+
+from benchmarks.common import (BENCH_TITLE_PREFIX, create_bench_app, delete_bench_events,
+                               http_load, load_result, print_table, seed_events,
+                               wait_until_up)
+from config import ProductionConfig
+from project import db
+from project.models import Event
+
+
+class ServingConfig(ProductionConfig):
+    CACHE_BACKEND = 'none'
+    INITIALIZE_DATABASE = False
+    SCHEDULER_RUN_LEADER_IN_APP = False
+
+
+# Command, URL scheme and extra environment of every server, {port} is replaced
+SERVERS = {
+    'flask-debug': ([sys.executable, '-m', 'flask', '--app', 'app', '--debug', 'run',
+                     '--cert=adhoc', '--port', '{port}'], 'https', {}),
+    'gunicorn': ([sys.executable, '-m', 'gunicorn'], 'http',
+                 {'GUNICORN_WORKER_CLASS': 'gthread'}),
+    'gunicorn-gevent': ([sys.executable, '-m', 'gunicorn'], 'http',
+                        {'GUNICORN_WORKER_CLASS': 'gevent'}),
+}
+
+
+def run(name, args, event_ids):
+    command, scheme, environment = SERVERS[name]
+    base_url = f'{scheme}://127.0.0.1:{args.port}'
+    # The certificate of --cert=adhoc is self-signed
+    context = ssl._create_unverified_context() if scheme == 'https' else None
+    environment = {**os.environ, **environment, 'CONFIG_TYPE': 'benchmarks.bench_serving.ServingConfig',
+                   'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+                   'GUNICORN_WORKERS': str(args.workers)}
+    # In a session of its own, to stop the reloader of flask-debug with the server
+    server = subprocess.Popen([part.format(port=args.port) for part in command],
+                              env=environment, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    urls = ([f'{base_url}/events?limit=20'] * 4
+            + [f'{base_url}/events/{event_id}' for event_id in event_ids[:4 * len(event_ids) // 5]])
+    results = []
+    try:
+        wait_until_up(f'{base_url}/tags', context=context)
+        for concurrency in args.concurrency:
+            http_load(urls, concurrency, 1, context)  # warm up
+            results.append(load_result(name, concurrency,
+                                       *http_load(urls, concurrency, args.seconds, context)))
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='gunicorn workers, 0 for the default of gunicorn.conf.py')
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    servers = args.servers
+    if 'gunicorn-gevent' in servers and not all(
+            importlib.util.find_spec(package) for package in ('gevent', 'psycogreen')):
+        print('gevent or psycogreen is not installed, skipping the gunicorn-gevent server.')
+        servers = [name for name in servers if name != 'gunicorn-gevent']
+
+    app = create_bench_app()
+    with app.app_context():
+        seed_events(db, args.events)
+        event_ids = db.session.execute(sa.select(Event.id).where(
+            Event.title.like(BENCH_TITLE_PREFIX + '%'))).scalars().all()
+        db.session.rollback()
+        try:
+            results = [result for name in servers for result in run(name, args, event_ids)]
+            print_table(f'GET /events and GET /events/<id> for {args.seconds} s per run',
+                        results)
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                delete_bench_events(db)
+
+
+if __name__ == '__main__':
+    main()
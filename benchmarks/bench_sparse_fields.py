@@ -0,0 +1,59 @@
+"""
+Benchmark of GET /events and GET /events/<id> with and without ?fields=.
+
+Seeds the events table, then measures pages of GET /events for every page
+size, and the details of an event, requesting every field and only the
+fields of a list view (id, title, event_date). The response cache is
+disabled so that every request reads the database and serializes the events.
+
+    python -m benchmarks.bench_sparse_fields --events 100000 --limits 50 200
+"""
+import argparse
+
+from benchmarks.common import (create_bench_app, delete_bench_events, measure,
+                               print_table, seed_events, summarize)
+from project import cache, db
+from project.models import Event
+
+FIELDS = {'all fields': None, 'id,title,event_date': 'id,title,event_date'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--limits', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the seeded events after the run')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    app.config['CACHE_BACKEND'] = 'none'
+    cache.init_app(app)
+    client = app.test_client()
+    with app.app_context():
+        seed_events(db, args.events)
+        event_id = db.session.query(db.func.max(Event.id)).scalar()
+        db.session.rollback()
+        try:
+            requests = [(f'GET /events?limit={limit}', '/events', {'limit': limit})
+                        for limit in args.limits]
+            requests.append(('GET /events/<id>', f'/events/{event_id}', {}))
+            results = []
+            for name, path, params in requests:
+                for label, fields in FIELDS.items():
+                    query_string = dict(params, **({'fields': fields} if fields else {}))
+                    size = len(client.get(path, query_string=query_string).get_data())
+                    latencies = measure(lambda: client.get(path, query_string=query_string),
+                                        args.runs)
+                    results.append({'name': f'{name}, {label}', 'bytes': size,
+                                    **summarize(latencies)})
+            print_table(f'Sparse fieldsets ({args.runs} runs per request)', results)
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                delete_bench_events(db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark of the application startup: the import of `project` and create_app().
+
+Every run is a fresh Python process, as when a worker boots, which reports
+how long both steps took. Runs are repeated with and without the check for an
+empty database (INITIALIZE_DATABASE), which needs the database of .env.
+
+    python -m benchmarks.bench_startup --runs 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import print_table, summarize
+
+MEASURE = """
+import json, time
+start = time.perf_counter()
+import project
+imported = time.perf_counter()
+project.create_app()
+created = time.perf_counter()
+print(json.dumps({'import': (imported - start) * 1000, 'create_app': (created - imported) * 1000}))
+"""
+
+
+def boot(initialize_database):
+    env = dict(os.environ, INITIALIZE_DATABASE=str(int(initialize_database)))
+    env.setdefault('CONFIG_TYPE', 'config.ProductionConfig')
+    output = subprocess.run([sys.executable, '-c', MEASURE], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--skip-database', action='store_true',
+                        help='only measure without the database check')
+    args = parser.parse_args()
+
+    variants = [False] if args.skip_database else [False, True]
+    results = []
+    for initialize_database in variants:
+        timings = [boot(initialize_database) for _ in range(args.runs)]
+        for step in ('import', 'create_app'):
+            results.append({'name': f'{step}, INITIALIZE_DATABASE={int(initialize_database)}',
+                            **summarize([timing[step] for timing in timings])})
+    print_table(f'Startup of a worker process ({args.runs} runs)', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against the database configured in .env and insert large
+amounts of data, so point them at a scratch database. Rows they create are
+recognisable by the BENCH_TITLE_PREFIX of their title and are removed again
+by delete_bench_events().
+"""
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+
+BENCH_TITLE_PREFIX = 'Bench Event '
+# Words of the seeded descriptions, each one appearing in 1/13 or 1/11 of the events
+GENRES = ['jazz', 'rock', 'folk', 'opera', 'ballet', 'comedy', 'poetry', 'cinema',
+          'theatre', 'techno', 'blues', 'gospel', 'circus']
+FORMATS = ['festival', 'concert', 'workshop', 'conference', 'meetup', 'exhibition',
+           'screening', 'reading', 'tour', 'lecture', 'party']
+
+
+def create_bench_app():
+    """Create the Flask application used by the benchmarks."""
+    os.environ.setdefault('CONFIG_TYPE', 'config.ProductionConfig')
+    from project import create_app
+    return create_app()
+
+
+def seed_events(db, count, batch_size=100000):
+    """Insert count synthetic events with a realistic spread of values.
+
+    The rows are generated server side with generate_series, which is orders
+    of magnitude faster than inserting them through the ORM.
+    """
+    for start in range(0, count, batch_size):
+        db.session.execute(sa.text("""
+            INSERT INTO events (title, description, venue, location, event_date,
+                                tags, participants, created_at)
+            SELECT :prefix || g,
+                   'Benchmark ' || (:genres)[1 + g % 13] || ' ' || (:formats)[1 + g % 11]
+                       || ' event number ' || g,
+                   'Venue ' || (g % 500),
+                   'Location ' || (g % 100),
+                   now() + ((g % 525600) - 262800) * interval '1 minute',
+                   ARRAY['tag' || (g % 50), 'tag' || (g % 7)],
+                   1 + (g * 7919) % 1000,
+                   now() - (g % 1000000) * interval '1 second'
+            FROM generate_series(:start, :stop) AS g
+        """), {'prefix': BENCH_TITLE_PREFIX, 'genres': GENRES, 'formats': FORMATS,
+               'start': start + 1,
+               'stop': min(start + batch_size, count)})
+        db.session.commit()
+    db.session.execute(sa.text('ANALYZE events'))
+    db.session.commit()
+
+
+def delete_bench_events(db):
+    pattern = {'pattern': BENCH_TITLE_PREFIX + '%'}
+    db.session.execute(sa.text("""
+        DELETE FROM user_event_association
+        WHERE event_id IN (SELECT id FROM events WHERE title LIKE :pattern)
+    """), pattern)
+    db.session.execute(sa.text('DELETE FROM events WHERE title LIKE :pattern'), pattern)
+    db.session.commit()
+
+
+def bench_user_token(client, email='bench-user@example.com', password='Bench1234!'):
+    """Register (if needed) and log in the benchmark user, return its token."""
+    client.post('/register', json={'email': email, 'password': password})
+    response = client.post('/login', auth=(email, password))
+    return response.get_json()['token']
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(func, runs, warmup=3):
+    """Call func runs times and return the latencies in milliseconds."""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        'runs': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def print_table(title, rows):
+    """Print a list of {'name': ..., <metric>: ...} dicts as an aligned table."""
+    print(f'\n== {title}')
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows))
+              for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width)
+                        for column, width in zip(columns, widths)))
+
+
+def wait_until_up(url, timeout=30, context=None):
+    """Wait until a server started in another process answers url."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, context=context).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def http_load(urls, concurrency, seconds, context=None):
+    """Request random urls from concurrency threads for seconds.
+
+    Returns the latencies of the successful requests in milliseconds, the
+    number of failed requests and the elapsed seconds.
+    """
+    stop = threading.Event()
+    errors = []
+
+    def client():
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(random.choice(urls), context=context) as response:
+                    json.loads(response.read())
+            except (OSError, ValueError):
+                errors.append(1)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        clients = [pool.submit(client) for _ in range(concurrency)]
+        time.sleep(seconds)
+        stop.set()
+        latencies = [latency for future in clients for latency in future.result()]
+        elapsed = time.perf_counter() - start
+    return latencies, len(errors), elapsed
+
+
+def load_result(name, concurrency, latencies, errors, elapsed):
+    """Row of print_table() for the result of http_load()."""
+    summary = summarize(latencies) if latencies else {'p50_ms': None, 'p99_ms': None}
+    return {'name': name, 'concurrency': concurrency,
+            'requests_per_s': round(len(latencies) / elapsed, 1),
+            'p50_ms': summary['p50_ms'], 'p99_ms': summary['p99_ms'], 'errors': errors}
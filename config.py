@@ -19,6 +19,46 @@ class Settings(BaseSettings):
     JWT_HS256_SECRET_KEY: str
     FLASK_APP: str
 
+    # 'memory' (per process), 'none' or the URL of a shared redis store
+    CACHE_BACKEND: str = 'memory'
+    # The application is served by a single process, so caches kept in memory see
+    # every write; see PrincipalCache
+    SINGLE_PROCESS: bool = False
+    # Create the tables at startup when the database is empty
+    INITIALIZE_DATABASE: bool = True
+    # Directory shared by the worker processes of a server to sum up their metrics,
+    # see project.metrics. Unset, /metrics serves those of the worker answering it
+    METRICS_MULTIPROCESS_DIR: str = ''
+
+    # Connection pool of every process, see SQLALCHEMY_ENGINE_OPTIONS. 0 connections
+    # means one per thread of a gunicorn worker, GUNICORN_THREADS
+    DB_POOL_SIZE: int = 0
+    DB_MAX_OVERFLOW: int = 4
+    DB_POOL_TIMEOUT: float = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Statements running longer are cancelled by PostgreSQL, 0 disables the limit
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+
+    # gunicorn, see gunicorn.conf.py. 0 workers means 2 per CPU + 1, at most 8
+    GUNICORN_BIND: str = '0.0.0.0:5000'
+    GUNICORN_WORKERS: int = 0
+    # 'gthread' serves GUNICORN_THREADS requests per worker, 'gevent' up to
+    # GUNICORN_WORKER_CONNECTIONS (requires the gevent and psycogreen packages)
+    GUNICORN_WORKER_CLASS: str = 'gthread'
+    GUNICORN_THREADS: int = 4
+    GUNICORN_WORKER_CONNECTIONS: int = 1000
+    # Load the application once in the master process and fork the workers from it
+    GUNICORN_PRELOAD_APP: bool = True
+    GUNICORN_TIMEOUT: int = 30
+    GUNICORN_KEEPALIVE: int = 5
+    # Replace every worker after this many requests, give or take the jitter, 0 never does
+    GUNICORN_MAX_REQUESTS: int = 10000
+    GUNICORN_MAX_REQUESTS_JITTER: int = 1000
+    # Serve HTTPS with these files instead of HTTP
+    GUNICORN_CERTFILE: str = ''
+    GUNICORN_KEYFILE: str = ''
+
     class Config:
         env_file = './.env'
 
@@ -36,10 +76,112 @@ class Config(object):
     SECRET_KEY = settings.JWT_HS256_SECRET_KEY
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Checking for an empty database costs a round trip on every boot, disable it
+    # once the database is managed with `flask db upgrade`
+    INITIALIZE_DATABASE = settings.INITIALIZE_DATABASE
+    # PostgreSQL advisory lock serializing the processes initializing an empty database
+    INITIALIZE_DATABASE_LOCK_ID = 7210462
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # Connections kept open, and opened on top of them under load
+        'pool_size': settings.DB_POOL_SIZE or settings.GUNICORN_THREADS,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        # Seconds a request waits for a free connection before failing
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        # Replace connections older than this, before the server or a proxy drops them
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        # Test connections on checkout, so none is stale after a PostgreSQL restart
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'connect_args': {
+            'options': f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}',
+        },
+    }
+    # Serve the single-statement reads of the events with async views, on an asyncpg engine
+    # without connection pool, or with one under an ASGI server (ASYNC_ENGINE_POOLED, set
+    # by asgi.py), see project.async_db. ASYNC_DATABASE_URI defaults to the database of
+    # SQLALCHEMY_DATABASE_URI
+    ASYNC_VIEWS = False
+    ASYNC_ENGINE_POOLED = False
+    ASYNC_DATABASE_URI = None
+    ASYNC_ENGINE_OPTIONS = {
+        'connect_args': {
+            'server_settings': {'statement_timeout': str(settings.DB_STATEMENT_TIMEOUT_MS)},
+        },
+    }
     # Logging
     LOG_WITH_GUNICORN = True  # os.getenv('LOG_WITH_GUNICORN', default=False)
+    # Set to None to leave out the Swagger UI
     SWAGGER_URL = "/swagger"
     API_URL = "/static/swagger.json"
+    # Pagination of GET /events
+    EVENTS_PAGE_SIZE = 50
+    EVENTS_MAX_PAGE_SIZE = 200
+    # Tags accepted by the tags filter of GET /events
+    EVENTS_MAX_TAGS_FILTER = 20
+    # Number of rows fetched per round trip when streaming GET /events
+    EVENTS_STREAM_BATCH_SIZE = 500
+    # Maximum number of events in a POST /events/batch request
+    EVENTS_BATCH_MAX_SIZE = 500
+    # Subscriptions update the participants of their event, locking its row until they commit.
+    # With EVENTS_PARTICIPANT_SHARDS > 0 they update one of that many counter rows of the event
+    # instead, folded into it every EVENTS_PARTICIPANT_FOLD_SECONDS by the scheduler leader
+    EVENTS_PARTICIPANT_SHARDS = 0
+    EVENTS_PARTICIPANT_FOLD_SECONDS = 5
+    # Caching
+    CACHE_BACKEND = settings.CACHE_BACKEND
+    CACHE_MAX_ENTRIES = 4096
+    CACHE_DEFAULT_TTL = 60
+    EVENT_CACHE_TTL = 60
+    # Users authenticated by an access token, capped by the token expiry. Disabled with
+    # several processes unless CACHE_BACKEND is shared, see project.principals
+    SINGLE_PROCESS = settings.SINGLE_PROCESS
+    PRINCIPAL_CACHE_TTL = 300
+    PRINCIPAL_CACHE_MAX_ENTRIES = 10000
+    # Password hashes, see werkzeug.security.generate_password_hash. Stored hashes made
+    # with other parameters are replaced on the next login
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = 16
+    # Processes computing the hashes off the request threads, 0 computes them inline
+    PASSWORD_HASH_WORKERS = 2
+    # Hashes queued or running per process, requests waiting longer than the timeout get a 503
+    PASSWORD_HASH_QUEUE_SIZE = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT = 5
+    # Expired rows of the revoked_tokens table are deleted at this interval
+    REVOKED_TOKENS_PURGE_SECONDS = 3600
+    # Prometheus metrics under /metrics, each metric keeps at most METRICS_MAX_SERIES label sets
+    METRICS_ENABLED = True
+    METRICS_MAX_SERIES = 500
+    METRICS_MULTIPROCESS_DIR = settings.METRICS_MULTIPROCESS_DIR
+    METRICS_FLUSH_SECONDS = 1
+    # Count the SQL statements of every request and check them against the budget of
+    # the view (see project.queries), failing the request when QUERY_BUDGETS_ENFORCED
+    QUERY_COUNTER = False
+    QUERY_BUDGETS_ENFORCED = False
+    # Operational endpoints under /internal
+    INTERNAL_ENDPOINTS = True
+    # Scheduled jobs: 'database' keeps them in the apscheduler_jobs table, 'memory' in the process
+    SCHEDULER_JOBSTORE = 'database'
+    # Let the web processes compete for running the reminders, instead of `flask run-scheduler`
+    SCHEDULER_RUN_LEADER_IN_APP = False
+    # PostgreSQL advisory lock held by the process running the reminders
+    SCHEDULER_LOCK_ID = 7210461
+    SCHEDULER_HEARTBEAT_SECONDS = 15
+    # Sweeps missed while no scheduler was running are still run within this delay
+    REMINDER_MISFIRE_GRACE_SECONDS = 1800
+    # Reminders are sent this long before an event, by a sweep running every REMINDER_SWEEP_SECONDS
+    REMINDER_LEAD_MINUTES = 30
+    REMINDER_SWEEP_SECONDS = 60
+    # Events claimed and reminded per transaction of a sweep
+    REMINDER_BATCH_SIZE = 500
+    # E-mail the reminders through the mailer instead of only printing them
+    MAIL_SEND_REMINDERS = False
+    # Mailer: worker threads, each with its own SMTP connection, fed by a bounded queue
+    MAIL_WORKERS = 2
+    MAIL_QUEUE_SIZE = 1000
+    # Messages sent in a row over a connection before looking at the queue again
+    MAIL_BATCH_SIZE = 100
+    MAIL_MAX_RETRIES = 3
+    MAIL_RETRY_BACKOFF = 1.0
+    MAIL_CONNECTION_IDLE_SECONDS = 30
 
 
 class ProductionConfig(Config):
@@ -48,8 +190,18 @@ class ProductionConfig(Config):
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SINGLE_PROCESS = True
+    SCHEDULER_RUN_LEADER_IN_APP = True
+    QUERY_COUNTER = True
 
 
 class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
+    # Tests write to the database directly, bypassing the cache invalidation
+    CACHE_BACKEND = 'none'
+    SINGLE_PROCESS = True
+    SCHEDULER_JOBSTORE = 'memory'
+    PASSWORD_HASH_WORKERS = 0
+    QUERY_COUNTER = True
+    QUERY_BUDGETS_ENFORCED = True
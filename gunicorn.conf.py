@@ -0,0 +1,122 @@
+"""
+gunicorn configuration of the production server, read from the GUNICORN_*
+settings (see config.py and the .env file):
+
+    gunicorn
+
+With preload_app the master process creates the application once and forks
+the workers from it, so they boot in no time and share its memory. The
+master must then hand them nothing that belongs to a single process:
+
+- It may have connected to the database (INITIALIZE_DATABASE): every worker
+  drops the inherited pool without closing its connections, which are still
+  the master's, and opens its own.
+- It never starts the reminders scheduler, whose threads would not survive
+  the fork. With SCHEDULER_RUN_LEADER_IN_APP every worker competes for the
+  scheduler lock instead, and a worker stopping (e.g. after max_requests)
+  releases it to the others.
+
+Every worker keeps its own metrics: with METRICS_MULTIPROCESS_DIR, /metrics
+serves the sum of every worker, see project.metrics.
+"""
+import math
+import multiprocessing
+import os
+
+from config import settings
+
+# Default workers are capped, so that their connection pools stay within the
+# max_connections of PostgreSQL on a large host too (see README)
+MAX_DEFAULT_WORKERS = 8
+
+
+def available_cpus():
+    """CPUs this process may run on: its affinity, and the quota of its container."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+    # cgroup v2 (e.g. docker --cpus): "<quota> <period>" or "max <period>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+        if quota != 'max':
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+bind = settings.GUNICORN_BIND
+workers = settings.GUNICORN_WORKERS or min(available_cpus() * 2 + 1, MAX_DEFAULT_WORKERS)
+worker_class = settings.GUNICORN_WORKER_CLASS
+threads = settings.GUNICORN_THREADS
+worker_connections = settings.GUNICORN_WORKER_CONNECTIONS
+preload_app = settings.GUNICORN_PRELOAD_APP
+timeout = settings.GUNICORN_TIMEOUT
+keepalive = settings.GUNICORN_KEEPALIVE
+max_requests = settings.GUNICORN_MAX_REQUESTS
+max_requests_jitter = settings.GUNICORN_MAX_REQUESTS_JITTER
+certfile = settings.GUNICORN_CERTFILE or None
+keyfile = settings.GUNICORN_KEYFILE or None
+
+# The application logs through the gunicorn.error logger (LOG_WITH_GUNICORN)
+accesslog = '-'
+errorlog = '-'
+
+# The scheduler is started by the workers, see post_worker_init
+wsgi_app = 'project:create_app(run_scheduler=False)'
+
+if worker_class == 'gevent':
+    # Patch the standard library before the application is preloaded, and let
+    # psycopg2 yield to the other greenlets while it waits on PostgreSQL
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        raise RuntimeError("The psycogreen package is required by the gevent worker class.")
+    patch_psycopg()
+
+
+def on_starting(server):
+    if settings.METRICS_MULTIPROCESS_DIR:
+        from project.metrics import reset_multiprocess_dir
+        reset_multiprocess_dir(settings.METRICS_MULTIPROCESS_DIR)
+    elif workers > 1:
+        server.log.warning('METRICS_MULTIPROCESS_DIR is not set, /metrics serves the metrics '
+                           'of whichever of the %s workers answers the scrape.', workers)
+
+
+def post_worker_init(worker):
+    from project import db
+
+    app = worker.wsgi
+    if preload_app:
+        # Connections inherited from the master, closing them would close its own
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    if app.config['SCHEDULER_RUN_LEADER_IN_APP']:
+        from project.reminders import start_scheduler
+        worker.scheduler_leader = start_scheduler(app)
+
+
+def worker_exit(server, worker):
+    from project import mailer, metrics
+
+    leader = getattr(worker, 'scheduler_leader', None)
+    if leader is not None:
+        from project.reminders import scheduler
+        leader.stop()
+        scheduler.shutdown()
+    # Deliver the reminders that are still queued
+    mailer.stop()
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    # Also run for the workers killed without running worker_exit, e.g. after a timeout
+    if settings.METRICS_MULTIPROCESS_DIR:
+        from project.metrics import mark_process_dead
+        mark_process_dead(settings.METRICS_MULTIPROCESS_DIR, worker.pid)
@@ -0,0 +1,72 @@
+"""event search vector
+
+Revision ID: 0e6b3d95c1f4
+Revises: c3a9e1f04b26
+Create Date: 2026-10-18 15:21:07.384215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0e6b3d95c1f4'
+down_revision = 'c3a9e1f04b26'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = ("setweight(to_tsvector('english', coalesce({0}title, '')), 'A') || "
+                 "setweight(to_tsvector('english', coalesce({0}description, '')), 'B')")
+# Events backfilled per transaction, each batch locks its rows until it commits
+BACKFILL_BATCH = 10000
+
+
+def upgrade():
+    op.add_column('events', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION events_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format('NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER events_search_vector
+        BEFORE INSERT OR UPDATE OF title, description ON events
+        FOR EACH ROW EXECUTE PROCEDURE events_search_vector()
+    """)
+
+    # Events written from now on get their vector from the trigger. The others
+    # are backfilled by id range, committing every batch instead of locking the
+    # whole table, and the index is built without blocking writes, as in
+    # fc75913b4920. A failed upgrade leaves an INVALID index: drop it first.
+    with op.get_context().autocommit_block():
+        op.execute(f"""
+            DO $$
+            DECLARE
+                last_id integer := (SELECT coalesce(max(id), 0) FROM events);
+                batch_start integer := 0;
+            BEGIN
+                WHILE batch_start < last_id LOOP
+                    UPDATE events SET search_vector = {SEARCH_VECTOR.format('')}
+                    WHERE id > batch_start AND id <= batch_start + {BACKFILL_BATCH}
+                      AND search_vector IS NULL;
+                    COMMIT;
+                    batch_start := batch_start + {BACKFILL_BATCH};
+                END LOOP;
+            END
+            $$
+        """)
+        op.create_index('ix_events_search_vector', 'events', ['search_vector'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_events_search_vector', table_name='events', postgresql_using='gin',
+                      postgresql_concurrently=True)
+    op.execute('DROP TRIGGER events_search_vector ON events')
+    op.execute('DROP FUNCTION events_search_vector()')
+    op.drop_column('events', 'search_vector')
@@ -0,0 +1,31 @@
+"""event versions
+
+Revision ID: 22f94c56ad08
+Revises: fc75913b4920
+Create Date: 2026-10-18 11:02:54.310692
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '22f94c56ad08'
+down_revision = 'fc75913b4920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.add_column('events', sa.Column('version', sa.Integer(),
+                  server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('events', 'version')
+    op.drop_table('table_versions')
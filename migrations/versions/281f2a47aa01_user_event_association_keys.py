@@ -0,0 +1,45 @@
+"""user event association keys
+
+Revision ID: 281f2a47aa01
+Revises: 22f94c56ad08
+Create Date: 2026-10-18 12:20:17.845033
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '281f2a47aa01'
+down_revision = '22f94c56ad08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop the rows that cannot be part of the new primary key
+    op.execute('DELETE FROM user_event_association '
+               'WHERE user_id IS NULL OR event_id IS NULL')
+    op.execute('DELETE FROM user_event_association a '
+               'USING user_event_association b '
+               'WHERE a.ctid > b.ctid AND a.user_id = b.user_id '
+               'AND a.event_id = b.event_id')
+    op.alter_column('user_event_association', 'user_id',
+                    existing_type=sa.Integer(), nullable=False)
+    op.alter_column('user_event_association', 'event_id',
+                    existing_type=sa.Integer(), nullable=False)
+    op.create_primary_key('user_event_association_pkey', 'user_event_association',
+                          ['user_id', 'event_id'])
+    op.create_index('ix_user_event_association_event_id', 'user_event_association',
+                    ['event_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_event_association_event_id',
+                  table_name='user_event_association')
+    op.drop_constraint('user_event_association_pkey', 'user_event_association',
+                       type_='primary')
+    op.alter_column('user_event_association', 'event_id',
+                    existing_type=sa.Integer(), nullable=True)
+    op.alter_column('user_event_association', 'user_id',
+                    existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,35 @@
+"""events version sequence
+
+Revision ID: 4c8e2a6f9d15
+Revises: 9b3e5d7f1c48
+Create Date: 2026-10-19 09:12:44.618203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8e2a6f9d15'
+down_revision = '9b3e5d7f1c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(sa.schema.CreateSequence(sa.Sequence('events_version_seq')))
+    # Continue after the last version of the table, so no ETag handed out
+    # before the upgrade can match a later state
+    op.execute("SELECT setval('events_version_seq', coalesce(max(version), 0) + 1) "
+               "FROM table_versions WHERE name = 'events'")
+    op.drop_table('table_versions')
+
+
+def downgrade():
+    op.create_table('table_versions',
+                    sa.Column('name', sa.String(length=64), nullable=False),
+                    sa.Column('version', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('name'))
+    op.execute("INSERT INTO table_versions (name, version) "
+               "SELECT 'events', last_value + 1 FROM events_version_seq")
+    op.execute(sa.schema.DropSequence(sa.Sequence('events_version_seq')))
@@ -0,0 +1,36 @@
+"""event reminder state
+
+Revision ID: 5b1e0d7c9a32
+Revises: 281f2a47aa01
+Create Date: 2026-10-18 13:05:41.512870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0d7c9a32'
+down_revision = '281f2a47aa01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('events', sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+    # The reminders of these events were due before the sweep existed
+    op.execute("UPDATE events SET reminder_sent_at = now() "
+               "WHERE event_date <= now() + interval '30 minutes'")
+    op.create_index('ix_events_reminder_due', 'events', ['event_date'], unique=False,
+                    postgresql_where=sa.text('reminder_sent_at IS NULL'))
+    # Reminders are no longer scheduled as one job per event
+    op.execute("DO $$ BEGIN "
+               "IF to_regclass('apscheduler_jobs') IS NOT NULL THEN "
+               "DELETE FROM apscheduler_jobs WHERE id LIKE 'reminder-%'; "
+               "END IF; END $$")
+
+
+def downgrade():
+    op.drop_index('ix_events_reminder_due', table_name='events',
+                  postgresql_where=sa.text('reminder_sent_at IS NULL'))
+    op.drop_column('events', 'reminder_sent_at')
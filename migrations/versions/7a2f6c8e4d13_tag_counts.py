@@ -0,0 +1,75 @@
+"""tag counts
+
+Revision ID: 7a2f6c8e4d13
+Revises: 0e6b3d95c1f4
+Create Date: 2026-10-18 16:04:52.190437
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2f6c8e4d13'
+down_revision = '0e6b3d95c1f4'
+branch_labels = None
+depends_on = None
+
+UPSERT = ("INSERT INTO tag_counts (tag, count) {} ORDER BY tag "
+          "ON CONFLICT (tag) DO UPDATE SET count = tag_counts.count + excluded.count")
+INSERTED = "SELECT tag, count(DISTINCT id) FROM new_rows, unnest(tags) AS tag GROUP BY tag"
+DELETED = "SELECT tag, -count(DISTINCT id) FROM old_rows, unnest(tags) AS tag GROUP BY tag"
+UPDATED = ("SELECT tag, sum(delta) FROM ("
+           "SELECT DISTINCT id, tag, 1 AS delta FROM new_rows, unnest(tags) AS tag "
+           "UNION ALL "
+           "SELECT DISTINCT id, tag, -1 FROM old_rows, unnest(tags) AS tag"
+           ") AS changes GROUP BY tag HAVING sum(delta) <> 0")
+TRIGGERS = [('INSERT', 'NEW TABLE AS new_rows'),
+            ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('DELETE', 'OLD TABLE AS old_rows')]
+
+
+def upgrade():
+    op.create_table('tag_counts',
+                    sa.Column('tag', sa.String(length=50), nullable=False),
+                    sa.Column('count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('tag'))
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION events_tag_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {UPSERT.format(INSERTED)};
+            ELSIF TG_OP = 'DELETE' THEN
+                {UPSERT.format(DELETED)};
+            ELSE
+                {UPSERT.format(UPDATED)};
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Writes to events wait until the counts are backfilled
+    op.execute('LOCK TABLE events IN SHARE MODE')
+    for operation, tables in TRIGGERS:
+        op.execute(f"""
+            CREATE TRIGGER events_tag_counts_{operation.lower()}
+            AFTER {operation} ON events REFERENCING {tables}
+            FOR EACH STATEMENT EXECUTE PROCEDURE events_tag_counts()
+        """)
+    op.execute("INSERT INTO tag_counts (tag, count) "
+               "SELECT tag, count(DISTINCT id) FROM events, unnest(tags) AS tag GROUP BY tag")
+
+    # Built once the counts are committed, without blocking writes (see fc75913b4920)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_events_tags', 'events', ['tags'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_events_tags', table_name='events', postgresql_using='gin',
+                      postgresql_concurrently=True)
+    for operation, _ in TRIGGERS:
+        op.execute(f'DROP TRIGGER events_tag_counts_{operation.lower()} ON events')
+    op.execute('DROP FUNCTION events_tag_counts()')
+    op.drop_table('tag_counts')
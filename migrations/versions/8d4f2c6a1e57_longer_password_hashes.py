@@ -0,0 +1,31 @@
+"""longer password hashes
+
+Revision ID: 8d4f2c6a1e57
+Revises: 5b1e0d7c9a32
+Create Date: 2026-10-18 13:41:09.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f2c6a1e57'
+down_revision = '5b1e0d7c9a32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # scrypt hashes do not fit in 128 characters
+    op.alter_column('users', 'password_hashed',
+                    existing_type=sa.String(length=128),
+                    type_=sa.String(length=256),
+                    existing_nullable=False)
+
+
+def downgrade():
+    op.alter_column('users', 'password_hashed',
+                    existing_type=sa.String(length=256),
+                    type_=sa.String(length=128),
+                    existing_nullable=False)
@@ -0,0 +1,39 @@
+"""event subscriptions
+
+Revision ID: 9b3e5d7f1c48
+Revises: 7a2f6c8e4d13
+Create Date: 2026-10-18 18:21:07.503914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5d7f1c48'
+down_revision = '7a2f6c8e4d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_subscriptions',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('event_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'event_id'))
+    op.create_index('ix_event_subscriptions_event_id', 'event_subscriptions',
+                    ['event_id'], unique=False)
+    op.create_table('event_participant_shards',
+                    sa.Column('event_id', sa.Integer(), nullable=False),
+                    sa.Column('shard', sa.SmallInteger(), nullable=False),
+                    sa.Column('count', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('event_id', 'shard'))
+
+
+def downgrade():
+    op.drop_table('event_participant_shards')
+    op.drop_index('ix_event_subscriptions_event_id', table_name='event_subscriptions')
+    op.drop_table('event_subscriptions')
@@ -0,0 +1,30 @@
+"""revoked tokens
+
+Revision ID: c3a9e1f04b26
+Revises: 8d4f2c6a1e57
+Create Date: 2026-10-18 14:02:33.716052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e1f04b26'
+down_revision = '8d4f2c6a1e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_tokens',
+                    sa.Column('jti', sa.Uuid(), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('jti'))
+    op.create_index(op.f('ix_revoked_tokens_expires_at'), 'revoked_tokens',
+                    ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_revoked_tokens_expires_at'), table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
@@ -0,0 +1,54 @@
+"""event listing indexes
+
+Revision ID: fc75913b4920
+Revises: 96366814dab2
+Create Date: 2026-10-18 09:31:07.502117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fc75913b4920'
+down_revision = '96366814dab2'
+branch_labels = None
+depends_on = None
+
+# (index name, columns) matching the filter + sort pairs of GET /events
+INDEXES = [
+    ('ix_events_event_date_id', ['event_date', 'id']),
+    ('ix_events_participants_id', ['participants', 'id']),
+    ('ix_events_created_at_id', ['created_at', 'id']),
+    ('ix_events_location_event_date_id', ['location', 'event_date', 'id']),
+    ('ix_events_location_participants_id', ['location', 'participants', 'id']),
+    ('ix_events_location_created_at_id', ['location', 'created_at', 'id']),
+    ('ix_events_venue_event_date_id', ['venue', 'event_date', 'id']),
+    ('ix_events_venue_participants_id', ['venue', 'participants', 'id']),
+    ('ix_events_venue_created_at_id', ['venue', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    # The keyset pagination sort keys must not be NULL
+    op.execute('UPDATE events SET participants = 1 WHERE participants IS NULL')
+    op.execute('UPDATE events SET created_at = now() WHERE created_at IS NULL')
+    op.alter_column('events', 'participants', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('events', 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+    # Built without blocking the writes to a populated table. CREATE INDEX
+    # CONCURRENTLY cannot run in a transaction, and one that fails leaves an
+    # INVALID index behind: drop it before running the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'events', columns, unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='events', postgresql_concurrently=True)
+
+    op.alter_column('events', 'created_at', existing_type=sa.DateTime(), nullable=True)
+    op.alter_column('events', 'participants', existing_type=sa.Integer(), nullable=True)
@@ -1,16 +1,23 @@
-from datetime import timedelta
 import logging
 import os
+import threading
 from logging.handlers import RotatingFileHandler
 
 import sqlalchemy as sa
-from click import echo
+from click import echo, option
 from flask import Flask
 from flask.logging import default_handler
 from flask_sqlalchemy import SQLAlchemy
-from flask_swagger_ui import get_swaggerui_blueprint
-from flask_mail import Mail, Message
-from apscheduler.schedulers.background import BackgroundScheduler
+from flask_mail import Mail
+from project.async_db import AsyncDatabase
+from project.cache import Cache
+from project.hashing import PasswordHasher
+from project.json_provider import JSONProvider
+from project.mailer import Mailer
+from project.metrics import Metrics
+from project.pool import TimedQueuePool
+from project.principals import PrincipalCache
+from project.queries import QueryCounter
 # -------------
 # Configuration
 # -------------
@@ -19,22 +26,42 @@ from apscheduler.schedulers.background import BackgroundScheduler
 # the global scope, but without any arguments passed in.  These instances are not attached
 # to the application at this point.
 db = SQLAlchemy()
+async_db = AsyncDatabase()
+cache = Cache()
+principal_cache = PrincipalCache()
+password_hasher = PasswordHasher()
 mail = Mail()
-# Initialize the scheduler
-scheduler = BackgroundScheduler(daemon=True)
-scheduler.start()
+mailer = Mailer()
+metrics = Metrics()
+query_counter = QueryCounter()
+# Alembic migrations live next to the project package
+MIGRATIONS_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), 'migrations')
 # ----------------------------
 # Application Factory Function
 # ----------------------------
 
 
-def create_app():
+def create_app(run_scheduler=True, asgi=False):
+    """Create the application.
+
+    run_scheduler=False leaves the reminders of SCHEDULER_RUN_LEADER_IN_APP to
+    the caller, e.g. servers that fork their workers from this process start
+    them in every worker (see gunicorn.conf.py). asgi=True creates it for an
+    ASGI server (see asgi.py), whose event loop outlives the requests.
+    """
     # Create the Flask application
     app = Flask(__name__)
 
     # Configure the Flask application
     config_type = os.getenv('CONFIG_TYPE', default='config.DevelopmentConfig')
     app.config.from_object(config_type)
+    if asgi:
+        # The async views run in the loop of the server, see project.async_db
+        app.config['ASYNC_ENGINE_POOLED'] = True
+
+    # Serialize the responses with orjson when it is installed
+    app.json = JSONProvider(app)
 
     initialize_extensions(app)
     register_blueprints(app)
@@ -42,16 +69,18 @@ def create_app():
     register_cli_commands(app)
     configure_event_reminders(app)
 
+    # The flask command runs `flask db`, `flask run-scheduler`, etc.
+    if os.getenv('FLASK_RUN_FROM_CLI'):
+        initialize_migrations(app)
+
     # Check if the database needs to be initialized
-    engine = sa.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-    inspector = sa.inspect(engine)
-    if not inspector.has_table("users"):
-        with app.app_context():
-            db.drop_all()
-            db.create_all()
-            app.logger.info('Initialized the database!')
-    else:
-        app.logger.info('Database already contains the users table.')
+    if app.config['INITIALIZE_DATABASE']:
+        initialize_empty_database(app)
+
+    # Run the reminders in this process when it becomes the leader
+    if run_scheduler and app.config['SCHEDULER_RUN_LEADER_IN_APP']:
+        from project.reminders import start_scheduler
+        start_scheduler(app)
 
     return app
 
@@ -63,7 +92,16 @@ def create_app():
 def initialize_extensions(app):
     # Since the application instance is now created, pass it to each Flask
     # extension instance to bind it to the Flask application instance (app)
+    # Measure the checkouts of the connection pool, see /internal/stats
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': TimedQueuePool, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
     db.init_app(app)
+    async_db.init_app(app)
+    metrics.init_app(app)
+    query_counter.init_app(app)
+    cache.init_app(app)
+    principal_cache.init_app(app)
+    password_hasher.init_app(app)
 
     # Flask-Login configuration
     from project.models import User
@@ -74,19 +112,63 @@ def register_blueprints(app):
     # with the Flask application instance (app)
     from project.users import users_blueprint
     from project.events import events_blueprint
+    from project.internal import internal_blueprint
 
     app.register_blueprint(users_blueprint)
     app.register_blueprint(events_blueprint)
+    if app.config['ASYNC_VIEWS']:
+        from project.events.async_routes import register_async_views
+        register_async_views(app)
+    if app.config['INTERNAL_ENDPOINTS']:
+        app.register_blueprint(internal_blueprint, url_prefix='/internal')
+
+    if app.config['SWAGGER_URL']:
+        from flask_swagger_ui import get_swaggerui_blueprint
+
+        swagger_ui_blueprint = get_swaggerui_blueprint(
+            app.config['SWAGGER_URL'],
+            app.config['API_URL'],
+            config={
+                'app_name': 'Access API'
+            }
+        )
+        app.register_blueprint(swagger_ui_blueprint,
+                               url_prefix=app.config['SWAGGER_URL'])
+
+
+def initialize_migrations(app):
+    # Flask-Migrate, and Alembic with it, is only needed by the `flask db`
+    # commands and to stamp a new database: importing it slows every boot
+    if 'migrate' in app.extensions:
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+def initialize_empty_database(app):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            has_users_table = sa.inspect(connection).has_table('users')
+            if has_users_table:
+                app.logger.info('Database already contains the users table.')
+                return
+            if connection.dialect.name == 'postgresql':
+                # Every gunicorn worker and the scheduler may find the database empty: one
+                # of them initializes it while the others wait, then find the users table.
+                # The lock is released when the transaction of this connection ends.
+                connection.execute(sa.text('SELECT pg_advisory_xact_lock(:id)'),
+                                   {'id': app.config['INITIALIZE_DATABASE_LOCK_ID']})
+                if sa.inspect(connection).has_table('users'):
+                    app.logger.info('Database was initialized by another process.')
+                    return
+            from flask_migrate import stamp
 
-    swagger_ui_blueprint = get_swaggerui_blueprint(
-        app.config['SWAGGER_URL'],
-        app.config['API_URL'],
-        config={
-            'app_name': 'Access API'
-        }
-    )
-    app.register_blueprint(swagger_ui_blueprint,
-                           url_prefix=app.config['SWAGGER_URL'])
+            db.drop_all()
+            db.create_all()
+            # The schema is now up to date, record it as such for Flask-Migrate
+            initialize_migrations(app)
+            stamp()
+            app.logger.info('Initialized the database!')
 
 
 def configure_logging(app):
@@ -113,43 +195,52 @@ def configure_logging(app):
 
 def configure_event_reminders(app):
     # i will not actually send emails
-    app.config['MAIL_SERVER'] = 'mail_server'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
-    app.config['MAIL_USERNAME'] = 'your_username'
-    app.config['MAIL_PASSWORD'] = 'your_password'
-    app.config['MAIL_DEFAULT_SENDER'] = 'your_email@example.com'
+    app.config.setdefault('MAIL_SERVER', 'mail_server')
+    app.config.setdefault('MAIL_PORT', 587)
+    app.config.setdefault('MAIL_USE_TLS', True)
+    app.config.setdefault('MAIL_USERNAME', 'your_username')
+    app.config.setdefault('MAIL_PASSWORD', 'your_password')
+    app.config.setdefault('MAIL_DEFAULT_SENDER', 'your_email@example.com')
     mail.init_app(app)
+    mailer.init_app(app)
 
 
 def register_cli_commands(app):
     @app.cli.command('init_db')
     def initialize_database():
         """Initialize the database."""
+        from flask_migrate import stamp
+
         db.drop_all()
         db.create_all()
+        stamp()
         echo('Initialized the database!')
 
-
-# Define a function to send reminders
-def send_reminder(event, user_email):
-    # Print the reminder to the console
-    print(
-        f"Reminder: User: {user_email} Your event '{event.title}' is scheduled in 30 minutes!")
-
-    # Send reminder via email Code - do not Actually send
-    """
-    msg = Message('Event Reminder', recipients=[user_email])
-    msg.body = f"Hello {user_email},\n\nThis is a reminder that your event '{event.title}' is scheduled in 30 minutes!\n\nBest regards,\nYour Event App"
-    mail.send(msg)
-    """
-
-# Function to schedule an event and reminder
-
-
-def schedule_event_with_reminder(event, user_email):
-    # Schedule the event
-    scheduler.add_job(func=send_reminder, trigger='date',
-                      run_date=event.event_date - timedelta(minutes=30), args=[event, user_email])
-
-    # Save the event to the database or perform any other necessary operations
+    @app.cli.command('run-scheduler')
+    @option('--metrics-port', type=int, help='Serve the metrics of the scheduler on this port.')
+    def run_scheduler(metrics_port):
+        """Run the scheduled reminders in this process.
+
+        Any number of these processes can be started, the one holding the
+        scheduler lock runs the reminders while the others stand by.
+        """
+        from project.reminders import SchedulerLeader, configure_scheduler, scheduler
+
+        if metrics_port:
+            from werkzeug.serving import make_server
+
+            server = make_server('0.0.0.0', metrics_port, metrics.wsgi_app, threaded=True)
+            threading.Thread(target=server.serve_forever, name='metrics',
+                             daemon=True).start()
+        configure_scheduler(app)
+        leader = SchedulerLeader(app)
+        echo('Waiting for the scheduler lock...')
+        try:
+            leader.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            leader.stop()
+            scheduler.shutdown()
+            # Deliver the reminders that are still queued
+            mailer.stop()
@@ -0,0 +1,81 @@
+"""
+Async database engine of the async views.
+
+With ASYNC_VIEWS, the read views of project.events.async_routes replace
+their synchronous versions. They are coroutines that await their statements
+on an AsyncEngine. The engine uses asyncpg by default. ASYNC_DATABASE_URI can
+select another driver, e.g. sqlite+aiosqlite for a local database in tests.
+
+Flask runs a coroutine view with asgiref's async_to_sync while the thread of
+the request waits for it to return: under a WSGI server in an event loop
+created for the request, under an ASGI server (see asgi.py) in the loop of
+the server. Async views therefore do not free the worker thread while the
+database works, and a process serves as many requests at once as before.
+They help views that await several statements or services concurrently.
+
+asyncpg connections belong to the event loop that opened them. Under a WSGI
+server these loops end with their request, so the engine does not pool
+connections (NullPool): every request connects to the database. Put
+PgBouncer in front of PostgreSQL before enabling ASYNC_VIEWS there. Under an
+ASGI server the loop lives as long as the process: asgi.py sets
+ASYNC_ENGINE_POOLED, and the engine keeps a pool sized like the one of the
+synchronous engine.
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+# Options of SQLALCHEMY_ENGINE_OPTIONS shared by a pooled async engine
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+def async_database_uri(uri):
+    """The URI of the database of uri, for asyncpg."""
+    return make_url(uri).set(drivername='postgresql+asyncpg').render_as_string(
+        hide_password=False)
+
+
+class AsyncDatabase:
+    """Flask extension holding the AsyncEngine of the async views.
+
+    engine is None unless ASYNC_VIEWS is set.
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['async_db'] = self
+        if not app.config.get('ASYNC_VIEWS', False):
+            return
+        # Needs greenlet, which SQLAlchemy only installs on common platforms
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        uri = (app.config.get('ASYNC_DATABASE_URI')
+               or async_database_uri(app.config['SQLALCHEMY_DATABASE_URI']))
+        if app.config.get('ASYNC_ENGINE_POOLED', False):
+            sync_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options = {name: sync_options[name] for name in POOL_OPTIONS if name in sync_options}
+            options['poolclass'] = AsyncAdaptedQueuePool
+        else:
+            options = {'poolclass': NullPool}
+        try:
+            self.engine = create_async_engine(
+                uri, **options, **app.config.get('ASYNC_ENGINE_OPTIONS', {}))
+        except ImportError as e:
+            raise RuntimeError(
+                f"The {make_url(uri).get_driver_name()} package is required to use "
+                f"ASYNC_VIEWS: {e}")
+
+    async def all(self, statement):
+        """Execute a statement on a connection of its own and return its rows."""
+        async with self.engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+    async def first(self, statement):
+        """Execute a statement and return its first row, or None."""
+        async with self.engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.first()
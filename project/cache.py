@@ -0,0 +1,190 @@
+"""
+Caching for read-mostly data.
+
+The Cache extension delegates to one of the following backends, selected with
+the CACHE_BACKEND setting:
+
+    * 'memory'           - in-process LRU cache with per-entry expiry (default),
+                           only used when SINGLE_PROCESS is set
+    * 'redis://host/db'  - shared store, so every worker sees the same entries
+    * 'none'             - disables caching
+
+A write only invalidates the entries of the process that served it, so with
+several worker processes an in-process cache would keep serving stale
+responses from the others: without SINGLE_PROCESS it is replaced by 'none'.
+
+Besides plain entries, every backend keeps integer counters (see incr). They
+are used as generation numbers that are part of the cache keys: bumping a
+generation makes every entry stored under the previous one unreachable, which
+is how a whole group of entries (e.g. every event listing) is invalidated at
+once. Counters are never evicted, otherwise an old generation, and with it
+stale entries, could come back to life.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullCache:
+    """Backend that never stores anything."""
+
+    shared = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def get_counter(self, key):
+        return 0
+
+    def incr(self, key):
+        return 0
+
+
+class LRUCache:
+    """Thread-safe in-process cache bounded by entry count and time to live."""
+
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Backend storing pickled entries in Redis, shared by all workers."""
+
+    shared = True
+
+    def __init__(self, url, key_prefix='alfabet:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "The redis package is required to use a redis:// CACHE_BACKEND.")
+        self._client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self._client.get(self.key_prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(self.key_prefix + key, ttl, pickle.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.key_prefix + key for key in keys])
+
+    def get_counter(self, key):
+        return int(self._client.get(self.key_prefix + key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(self.key_prefix + key)
+
+
+def create_backend(url, max_entries=1024):
+    if not url or url == 'none':
+        return NullCache()
+    if url == 'memory':
+        return LRUCache(max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported CACHE_BACKEND: {url}")
+
+
+class Cache:
+    """Flask extension giving access to the configured cache backend.
+
+    Keeps hit and miss counters so the effect of the cache can be checked.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_ttl = 60
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config.get('CACHE_BACKEND', 'memory')
+        backend = create_backend(url, app.config.get('CACHE_MAX_ENTRIES', 1024))
+        if isinstance(backend, LRUCache) and not app.config.get('SINGLE_PROCESS', True):
+            app.logger.warning(f"CACHE_BACKEND {url!r} is not shared between processes and "
+                               "SINGLE_PROCESS is not set, caching is disabled.")
+            backend = NullCache()
+        self.backend = backend
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        app.extensions['cache'] = self
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl if ttl is not None else self.default_ttl)
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    @property
+    def shared(self):
+        """Whether every process sees the same entries and counters."""
+        return self.backend.shared
+
+    def get_counter(self, key):
+        return self.backend.get_counter(key)
+
+    def incr(self, key):
+        return self.backend.incr(key)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
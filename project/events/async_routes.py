@@ -0,0 +1,87 @@
+"""
+Coroutine versions of the read views of the events.
+
+With ASYNC_VIEWS they replace the views of the same endpoints in
+project.events.routes (see register_async_views). They parse the same
+parameters, run the same statements on the async engine (project.async_db)
+and build the same responses. Only views reading with a single statement
+have an async version; the others stay synchronous in either mode.
+
+Under an ASGI server the views run in the event loop of the server, shared by
+every request of the process. A shared cache (e.g. redis) is a network round
+trip that would block that loop, so its lookups and stores run on a thread.
+"""
+import asyncio
+
+from flask import jsonify, request
+
+from project import async_db, cache
+from project.queries import query_budget
+
+from . import search
+from .routes import (_cached_event_details, _event_details_response, _event_details_statement,
+                     _get_fields, _get_page_size, _top_tags_statement)
+from .serialization import event_dicts
+
+
+async def _cache_io(function, *args):
+    """Call a function using the cache, on a thread when the cache is a network store."""
+    if cache.shared:
+        # The request context is a context variable, copied to the thread
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+
+@query_budget(1)
+async def search_events():
+    try:
+        limit = _get_page_size()
+        statement = search.search_statement(
+            request.args.get('q'), limit, request.args.get('cursor'))
+        rows, next_cursor = search.search_page(await async_db.all(statement), limit)
+        return jsonify({'events': event_dicts(rows), 'next_cursor': next_cursor})
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@query_budget(1)
+async def get_tags():
+    try:
+        tag_counts = await async_db.all(_top_tags_statement(_get_page_size()))
+        return jsonify({'tags': [{'tag': tag, 'count': count} for tag, count in tag_counts]})
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@query_budget(1)
+async def get_event_details(event_id):
+    try:
+        fields = _get_fields()
+        cache_key, response = await _cache_io(_cached_event_details, event_id, fields)
+        if response is not None:
+            return response
+
+        event = await async_db.first(_event_details_statement(event_id, fields))
+        return await _cache_io(_event_details_response, event_id, fields, cache_key, event)
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+# Endpoint of the events blueprint served by every async view
+ASYNC_VIEWS = {
+    'events.search_events': search_events,
+    'events.get_tags': get_tags,
+    'events.get_event_details': get_event_details,
+}
+
+
+def register_async_views(app):
+    """Serve the endpoints of ASYNC_VIEWS with their async view, keeping the URL rules."""
+    for endpoint, view in ASYNC_VIEWS.items():
+        app.view_functions[endpoint] = view
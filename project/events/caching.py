@@ -0,0 +1,101 @@
+"""
+Read-through caching and conditional GET for the GET /events and
+GET /events/<id> responses.
+
+A cache entry holds the ETag and the serialized JSON body of a response, so a
+hit skips both the query and the serialization. The keys embed generation
+counters:
+
+    events:list:<list generation>:<query string>[&as_of=<minute>]
+    events:detail:<event id>:<event generation>[-<fields>]
+
+Every write bumps the list generation (any listing may include the event) and
+the generation of the event it touched, so no reader sees the old responses
+after the write. Readers look the generations up *before* querying the
+database: a response built from rows that a concurrent write has replaced is
+stored under a generation that nobody reads anymore.
+
+ETags are strong and derived from database state: the version of the events
+table (bumped after every write, see TableVersion) for listings, the row
+version for an event. A request whose If-None-Match matches gets a 304
+without any serialization.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from flask import current_app, request
+
+from project import cache
+
+LIST_GENERATION_KEY = 'events:list-generation'
+
+
+def _event_generation_key(event_id):
+    return f'events:generation:{event_id}'
+
+
+def _query_string(as_of=None):
+    query_string = urlencode(sorted(request.args.items(multi=True)))
+    if as_of is not None:
+        query_string += f'&as_of={as_of.isoformat()}'
+    return query_string
+
+
+def list_cache_key(as_of=None):
+    """Cache key of a listing. as_of is the time relative filters are
+    evaluated at, e.g. ?upcoming=1, listings of another time are different."""
+    return f'events:list:{cache.get_counter(LIST_GENERATION_KEY)}:{_query_string(as_of)}'
+
+
+def detail_cache_key(event_id, fields=None):
+    """Cache key of an event. fields are those requested with ?fields=, if any."""
+    generation = cache.get_counter(_event_generation_key(event_id))
+    return f'events:detail:{event_id}:{generation}{_fields_suffix(fields)}'
+
+
+def list_etag(table_version, as_of=None):
+    digest = hashlib.sha1(_query_string(as_of).encode()).hexdigest()[:16]
+    return f'events-{table_version}-{digest}'
+
+
+def detail_etag(event_id, version, fields=None):
+    return f'event-{event_id}-{version}{_fields_suffix(fields)}'
+
+
+def _fields_suffix(fields):
+    # Every set of fields is another representation of the event
+    return '-' + '.'.join(fields) if fields else ''
+
+
+def not_modified(etag):
+    """Return a 304 response when the client's copy carries this ETag."""
+    if etag not in request.if_none_match:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def cached_response(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    etag, body = entry
+    response = not_modified(etag)
+    if response is None:
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+    return response
+
+
+def cache_response(key, etag, response):
+    response.set_etag(etag)
+    cache.set(key, (etag, response.get_data()),
+              current_app.config['EVENT_CACHE_TTL'])
+
+
+def invalidate_events(*event_ids):
+    """Drop the cached responses that a write to the given events affects."""
+    cache.incr(LIST_GENERATION_KEY)
+    for event_id in event_ids:
+        cache.incr(_event_generation_key(event_id))
@@ -0,0 +1,95 @@
+"""
+Keyset (cursor) pagination for the event listing endpoint.
+
+Every page is fetched with ``WHERE (sort_column, id) > (last_value, last_id)``
+followed by ``ORDER BY sort_column, id LIMIT n``, so the database never has to
+skip over the rows of the previous pages and page N costs the same as page 1.
+The cursor handed to the client is an opaque, url-safe encoding of the sort
+key of the last event of the page.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from project import db
+from project.models import Event
+
+
+# Sort key for every supported sort_by value: (column, descending).
+# Event.id is always appended as the tie-breaker so the ordering is total.
+SORT_KEYS = {
+    None: (None, False),
+    'date': (Event.event_date, False),
+    'popularity': (Event.participants, True),
+    'creation_time': (Event.created_at, False),
+}
+
+
+def encode_cursor(event, sort_by):
+    column, _ = SORT_KEYS[sort_by]
+    value = getattr(event, column.key) if column is not None else None
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, value, event.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort_by, value, event_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid value for cursor.")
+
+    if cursor_sort_by != sort_by or not isinstance(event_id, int):
+        raise ValueError("Cursor does not match the requested sort_by.")
+
+    column, _ = SORT_KEYS[sort_by]
+    if column is not None and isinstance(column.type, sa.DateTime):
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid value for cursor.")
+    return value, event_id
+
+
+def order_events(query, sort_by):
+    """Order an Event query by the sort key of sort_by and the id tie-breaker."""
+    column, descending = SORT_KEYS[sort_by]
+    keys = (column, Event.id) if column is not None else (Event.id,)
+    return query.order_by(*[key.desc() if descending else key for key in keys])
+
+
+def seek(query, sort_by, cursor=None):
+    """Order an Event query and skip to the position after the cursor."""
+    column, descending = SORT_KEYS[sort_by]
+    keys = (column, Event.id) if column is not None else (Event.id,)
+
+    if cursor:
+        value, event_id = decode_cursor(cursor, sort_by)
+        values = (value, event_id) if column is not None else (event_id,)
+        if descending:
+            query = query.filter(sa.tuple_(*keys) < sa.tuple_(*values))
+        else:
+            query = query.filter(sa.tuple_(*keys) > sa.tuple_(*values))
+
+    return order_events(query, sort_by)
+
+
+def paginate(statement, sort_by, limit, cursor=None):
+    """Apply keyset pagination to a select() of event columns.
+
+    The statement must select Event.id and the sort key of sort_by. Returns
+    the rows of the requested page and the cursor of the next page (None when
+    this is the last page).
+    """
+    # Fetch one extra row to find out whether there is a next page
+    events = db.session.execute(seek(statement, sort_by, cursor).limit(limit + 1)).all()
+    if len(events) > limit:
+        events = events[:limit]
+        return events, encode_cursor(events[-1], sort_by)
+    return events, None
@@ -1,15 +1,28 @@
 from datetime import datetime, timedelta
 from flask import (abort, current_app, render_template,
-                   request, url_for, jsonify)
+                   request, url_for, jsonify, Response, stream_with_context)
 from pydantic import BaseModel, ValidationError, validator
 from functools import wraps
-import jwt
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
-from project import db, schedule_event_with_reminder
-from project.models import Event, User
-from config import settings
+from sqlalchemy.orm.exc import StaleDataError
+from project import db, principal_cache
+from project.models import Event, TableVersion, TagCount, User, user_event_association
+from project.queries import query_budget
+from project.tokens import decode_token
 
-from . import events_blueprint
+from . import events_blueprint, search, subscriptions
+from .caching import (cache_response, cached_response, detail_cache_key,
+                      detail_etag, invalidate_events, list_cache_key, list_etag,
+                      not_modified)
+from .pagination import SORT_KEYS, order_events, paginate
+from .serialization import EVENT_FIELDS, event_columns, event_dict, event_dicts
+
+
+# Columns set by the batch insert, the remaining ones take their defaults
+BATCH_COLUMNS = ['title', 'description', 'venue', 'location', 'event_date',
+                 'tags', 'participants']
 
 
 def token_required(f):
@@ -22,10 +35,16 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'a valid token is missing'})
         try:
-            data = jwt.decode(
-                token, settings.JWT_HS256_SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.filter_by(
-                id=data['public_id']).first()
+            data = decode_token(token)
+            current_user = principal_cache.get(token, db.session)
+            if current_user is None:
+                generation = principal_cache.generation(data['public_id'])
+                current_user = User.query.filter_by(
+                    id=data['public_id']).first()
+                if current_user is None:
+                    raise ValueError('user does not exist')
+                principal_cache.put(
+                    token, current_user, data.get('exp'), generation)
         except Exception as e:
             return jsonify({'message': f'token is invalid, error: {str(e)}'})
 
@@ -34,24 +53,18 @@ def token_required(f):
 
 
 @events_blueprint.route('/events', methods=['POST'])
+@query_budget(4)
 @token_required
 def schedule_event(user):
     try:
         data = request.get_json()
-        new_event = Event(
-            title=data['title'],
-            description=data['description'],
-            venue=data['venue'],
-            location=data['location'],
-            event_date=datetime.strptime(
-                data['event_date'], '%Y-%m-%d %H:%M:%S'),
-            tags=data.get('tags', []),
-        )
-        user.events.append(new_event)
+        new_event = _event_from_json(data)
         db.session.add(new_event)
+        db.session.flush()
+        _link_events(user, [new_event.id])
+        TableVersion.bump_after_commit(Event.__tablename__)
         db.session.commit()
-        # Schedule the event with a reminder
-        schedule_event_with_reminder(new_event, user.email)
+        invalidate_events()
         return jsonify({'message': 'Event scheduled successfully'}), 201
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -59,16 +72,213 @@ def schedule_event(user):
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
-# Endpoint to retrieve a list of all scheduled events
 
+# Endpoint to schedule many events in one transaction
+@events_blueprint.route('/events/batch', methods=['POST'])
+@query_budget(4)
+@token_required
+def schedule_events(user):
+    try:
+        data = request.get_json()
+        max_size = current_app.config['EVENTS_BATCH_MAX_SIZE']
+        if not isinstance(data, list) or not 1 <= len(data) <= max_size:
+            raise ValueError(
+                f"Request body must be a list of between 1 and {max_size} events.")
+
+        # Validate every event with the rules of the Event constructor
+        events, errors = {}, []
+        for index, item in enumerate(data):
+            try:
+                event = _event_from_json(item)
+                if event.title in events:
+                    raise ValueError("Title is used by another event of the batch.")
+                events[event.title] = (index, event)
+            except Exception as e:
+                errors.append({'index': index, 'message': str(e)})
+
+        created = []
+        if events:
+            # One multi-row INSERT, skipping titles that are already taken
+            rows = [{column: getattr(event, column) for column in BATCH_COLUMNS}
+                    for _, event in events.values()]
+            statement = insert(Event).on_conflict_do_nothing(
+                index_elements=[Event.title]).returning(Event.id, Event.title)
+            inserted = db.session.execute(statement, rows).all()
+
+            for event_id, title in inserted:
+                index, event = events.pop(title)
+                event.id = event_id
+                created.append((index, event))
+            for index, _ in events.values():
+                errors.append(
+                    {'index': index, 'message': 'An event with this title already exists.'})
+
+            if created:
+                _link_events(user, [event.id for _, event in created])
+                TableVersion.bump_after_commit(Event.__tablename__)
+            db.session.commit()
+
+        if created:
+            invalidate_events()
+
+        if not created:
+            status = 400
+        else:
+            status = 207 if errors else 201
+        return jsonify({
+            'created': [{'index': index, 'id': event.id}
+                        for index, event in sorted(created, key=lambda item: item[0])],
+            'errors': sorted(errors, key=lambda error: error['index']),
+        }), status
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+
+def _event_from_json(data):
+    return Event(
+        title=data['title'],
+        description=data['description'],
+        venue=data['venue'],
+        location=data['location'],
+        event_date=datetime.strptime(
+            data['event_date'], '%Y-%m-%d %H:%M:%S'),
+        tags=data.get('tags', []),
+    )
+
+
+def _link_events(user, event_ids):
+    # Insert the ownership rows directly, without loading user.events
+    db.session.execute(user_event_association.insert(), [
+        {'user_id': user.id, 'event_id': event_id} for event_id in event_ids])
+
+
+def _is_event_owner(user, event_id):
+    # Single primary key lookup instead of loading every event of the user
+    return db.session.query(sa.exists().where(
+        user_event_association.c.user_id == user.id,
+        user_event_association.c.event_id == event_id)).scalar()
+
+
+def _event_exists(event_id):
+    return db.session.query(sa.exists().where(Event.id == event_id)).scalar()
 
+
+def _get_fields():
+    """Return the fields requested with ?fields=, in their usual order, or None
+    for all of them. The id is always included."""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - EVENT_FIELDS.keys()
+    if unknown:
+        raise ValueError(
+            f"Invalid value for fields. Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Must be among {', '.join(EVENT_FIELDS)}.")
+    return tuple(field for field in EVENT_FIELDS if field == 'id' or field in requested)
+
+
+def _stream_events(statement, ndjson, fields=None):
+    """Stream the events of a select() without materializing the whole result.
+
+    Rows are fetched from a server-side cursor in batches of
+    EVENTS_STREAM_BATCH_SIZE and written out as soon as they are serialized,
+    either as newline-delimited JSON or as a single {"events": [...]} document.
+    """
+    batch_size = current_app.config['EVENTS_STREAM_BATCH_SIZE']
+    dumps = current_app.json.dumps
+
+    def generate():
+        rows = db.session.execute(statement.execution_options(yield_per=batch_size))
+        if ndjson:
+            for row in rows:
+                yield dumps(event_dict(row, fields)) + '\n'
+            return
+
+        yield '{"events": ['
+        separator = ''
+        for row in rows:
+            yield separator + dumps(event_dict(row, fields))
+            separator = ', '
+        yield ']}'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def _get_page_size():
+    max_page_size = current_app.config['EVENTS_MAX_PAGE_SIZE']
+    limit = request.args.get('limit')
+    if limit is None:
+        return current_app.config['EVENTS_PAGE_SIZE']
+    if not limit.isdigit() or not 1 <= int(limit) <= max_page_size:
+        raise ValueError(
+            f"Invalid value for limit. Must be an integer between 1 and {max_page_size}.")
+    return int(limit)
+
+
+def _get_tags():
+    tags = request.args.get('tags')
+    if not tags:
+        return []
+    tags = sorted({tag.strip() for tag in tags.split(',') if tag.strip()})
+    max_tags = current_app.config['EVENTS_MAX_TAGS_FILTER']
+    if len(tags) > max_tags or any(len(tag) > 50 for tag in tags):
+        raise ValueError(
+            f"Invalid value for tags. Must be at most {max_tags} tags of at most 50 characters.")
+    return tags
+
+
+def _get_date_range():
+    """Return the (start, end) of the event_date window of the request.
+
+    from is inclusive and to exclusive, either may be None. upcoming moves the
+    start to the current minute, the time the window is relative to.
+    """
+    start, end = (_parse_date(request.args.get(name), name) for name in ('from', 'to'))
+    if request.args.get('upcoming') in ('1', 'true'):
+        now = datetime.now().replace(second=0, microsecond=0)
+        start = max(start, now) if start is not None else now
+    if start is not None and end is not None and start >= end:
+        raise ValueError("Invalid date range. from must be before to.")
+    return start, end
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    for date_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise ValueError(
+        f"Invalid value for {name}. Must be a date (YYYY-MM-DD) or a date and time "
+        f"(YYYY-MM-DD HH:MM:SS).")
+
+
+# Endpoint to retrieve a page of the scheduled events
 @events_blueprint.route('/events', methods=['GET'])
+@query_budget(2)
 def get_events():
     try:
         # Retrieve query parameters from the request
         location = request.args.get('location')
         venue = request.args.get('venue')
-        sort_by = request.args.get('sort_by')
+        sort_by = request.args.get('sort_by') or None
+        fields = _get_fields()
+        tags = _get_tags()
+        tags_match = request.args.get('tags_match') or 'all'
+        start, end = _get_date_range()
+        # Listings relative to the current time are cached per minute
+        as_of = start if request.args.get('upcoming') in ('1', 'true') else None
+
+        # Check if tags_match is a valid option
+        if tags_match not in ('any', 'all'):
+            raise ValueError("Invalid value for tags_match. Must be one of 'any', 'all'.")
 
         # Check if sort_by is a valid option
         valid_sort_options = ['date', 'popularity', 'creation_time']
@@ -76,89 +286,219 @@ def get_events():
             raise ValueError(
                 "Invalid value for sort_by. Must be one of 'date', 'popularity', 'creation_time'.")
 
-        # Construct the base query
-        base_query = Event.query
+        # Large listings can be streamed instead of paginated
+        ndjson = request.accept_mimetypes.best_match(
+            ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+        stream = ndjson or request.args.get('stream') in ('1', 'true')
+
+        # Serve repeated page requests from the cache
+        if not stream:
+            cache_key = list_cache_key(as_of)
+            response = cached_response(cache_key)
+            if response is not None:
+                return response
 
-        # Filter events based on location or venue
+        # Construct the base query, selecting the columns of the requested fields
+        # and the sort key of the page cursor
+        base_query = sa.select(*event_columns(fields, SORT_KEYS[sort_by][0]))
+
+        # Filter events based on location, venue, date or tags
         if location:
             base_query = base_query.filter(Event.location == location)
         if venue:
             base_query = base_query.filter(Event.venue == venue)
+        # The scan of the event_date indexes starts at the window: sorted by date,
+        # the events before it are never read
+        if start is not None:
+            base_query = base_query.filter(Event.event_date >= start)
+        if end is not None:
+            base_query = base_query.filter(Event.event_date < end)
+        if tags:
+            # Events with any of the tags (&&) or with all of them (@>)
+            if tags_match == 'any':
+                base_query = base_query.filter(Event.tags.overlap(tags))
+            else:
+                base_query = base_query.filter(Event.tags.contains(tags))
 
-        # Retrieve and sort events based on the specified parameter
-        if sort_by == 'date':
-            events = base_query.order_by(Event.event_date).all()
-        elif sort_by == 'popularity':
-            events = base_query.order_by(Event.participants.desc()).all()
-        elif sort_by == 'creation_time':
-            events = base_query.order_by(Event.created_at).all()
-        else:
-            events = base_query.all()
-
-        event_list = []
-        for event in events:
-            event_list.append({
-                'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'venue': event.venue,
-                'location': event.location,
-                'event_date': event.event_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'tags': event.tags,
-                'participants': event.participants,
-            })
-        return jsonify({'events': event_list})
+        if stream:
+            return _stream_events(order_events(base_query, sort_by), ndjson, fields)
+
+        # Nothing to send when the client already has this version of the page
+        etag = list_etag(TableVersion.current(Event.__tablename__), as_of)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        # Retrieve one page of events sorted by the specified parameter
+        rows, next_cursor = paginate(
+            base_query, sort_by, _get_page_size(), request.args.get('cursor'))
+
+        event_list = event_dicts(rows, fields)
+        response = jsonify({'events': event_list, 'next_cursor': next_cursor})
+        cache_response(cache_key, etag, response)
+        return response
     except ValueError as ve:
         return jsonify({'message': str(ve)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 
+# Endpoint to search the events by the words of their title and description
+@events_blueprint.route('/events/search', methods=['GET'])
+@query_budget(1)
+def search_events():
+    try:
+        rows, next_cursor = search.search_events(
+            request.args.get('q'), _get_page_size(), request.args.get('cursor'))
+        event_list = event_dicts(rows)
+        return jsonify({'events': event_list, 'next_cursor': next_cursor})
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+def _top_tags_statement(limit):
+    return (sa.select(TagCount.tag, TagCount.count).where(TagCount.count > 0)
+            .order_by(TagCount.count.desc(), TagCount.tag).limit(limit))
+
+
+# Endpoint to retrieve the most used tags and their number of events
+@events_blueprint.route('/tags', methods=['GET'])
+@query_budget(1)
+def get_tags():
+    try:
+        tag_counts = db.session.execute(_top_tags_statement(_get_page_size())).all()
+        return jsonify({'tags': [{'tag': tag, 'count': count} for tag, count in tag_counts]})
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+def _event_details_statement(event_id, fields):
+    return sa.select(*event_columns(fields, Event.version)).where(Event.id == event_id)
+
+
+def _cached_event_details(event_id, fields):
+    """The cache key of the details of an event, and their cached response or None."""
+    cache_key = detail_cache_key(event_id, fields)
+    return cache_key, cached_response(cache_key)
+
+
+def _event_details_response(event_id, fields, cache_key, event):
+    if not event:
+        return jsonify({'message': 'Event not found'}), 404
+
+    # Nothing to send when the client already has this version of the event
+    etag = detail_etag(event_id, event.version, fields)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    response = jsonify(event_dict(event, fields))
+    cache_response(cache_key, etag, response)
+    return response
+
+
 # Endpoint to retrieve details of a specific event
 @events_blueprint.route('/events/<int:event_id>', methods=['GET'])
+@query_budget(1)
 def get_event_details(event_id):
     try:
-        event = Event.query.get(event_id)
-        if event:
-            event_details = {
-                'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'venue': event.venue,
-                'location': event.location,
-                'event_date': event.event_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'tags': event.tags,
-                'participants': event.participants,
-            }
-            return jsonify(event_details)
-        else:
-            return jsonify({'message': 'Event not found'}), 404
+        fields = _get_fields()
+        cache_key, response = _cached_event_details(event_id, fields)
+        if response is not None:
+            return response
+
+        event = db.session.execute(_event_details_statement(event_id, fields)).first()
+        return _event_details_response(event_id, fields, cache_key, event)
+    except ValueError as ve:
+        return jsonify({'message': str(ve)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
 
 # Endpoint to update details of a specific event
 @events_blueprint.route('/events/<int:event_id>', methods=['PUT'])
+@query_budget(5)
 @token_required
 def update_event(user, event_id):
     try:
         event = Event.query.get(event_id)
         if event:
-            user_events_ids = [event.id for event in user.events]
-            if event_id not in user_events_ids:
+            if not _is_event_owner(user, event_id):
                 return jsonify({'message': "only owners of event can update it"}), 403
             data = request.get_json()
             event.description = data.get('description', event.description)
             event.venue = data.get('venue', event.venue)
             event.location = data.get('location', event.location)
-            event.event_date = datetime.strptime(
+            event_date = datetime.strptime(
                 data.get('event_date', event.event_date), '%Y-%m-%d %H:%M:%S')
+            if event_date != event.event_date:
+                event.event_date = event_date
+                # Remind the owner again before the new date. A SQL NULL is always
+                # written, even if a sweep marked the reminder sent after we loaded it.
+                event.reminder_sent_at = sa.null()
             event.tags = data.get('tags', event.tags)
             event.participants = data.get('participants', event.participants)
+            TableVersion.bump_after_commit(Event.__tablename__)
             db.session.commit()  # updates the user .events automatically
+            invalidate_events(event_id)
             return jsonify({'message': 'Event updated successfully'})
         else:
             return jsonify({'message': 'Event not found'}), 404
+    except StaleDataError:
+        # The version of the event changed since it was loaded, e.g. by a subscription
+        db.session.rollback()
+        return jsonify({'message': 'Event was changed by another request, try again'}), 409
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+
+# Endpoint to subscribe to a specific event
+@events_blueprint.route('/events/<int:event_id>/subscribe', methods=['POST'])
+@query_budget(3)
+@token_required
+def subscribe_event(user, event_id):
+    try:
+        subscribed = subscriptions.subscribe(user.id, event_id)
+        if not subscribed and not _event_exists(event_id):
+            db.session.rollback()
+            return jsonify({'message': 'Event not found'}), 404
+        db.session.commit()
+        if not subscribed:
+            return jsonify({'message': 'Already subscribed to event'})
+        # Sharded counts reach the event, and its responses, when they are folded
+        if not subscriptions.is_sharded():
+            invalidate_events(event_id)
+        return jsonify({'message': 'Subscribed to event successfully'}), 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+
+# Endpoint to unsubscribe from a specific event
+@events_blueprint.route('/events/<int:event_id>/unsubscribe', methods=['POST'])
+@query_budget(3)
+@token_required
+def unsubscribe_event(user, event_id):
+    try:
+        unsubscribed = subscriptions.unsubscribe(user.id, event_id)
+        if not unsubscribed and not _event_exists(event_id):
+            db.session.rollback()
+            return jsonify({'message': 'Event not found'}), 404
+        db.session.commit()
+        if not unsubscribed:
+            return jsonify({'message': 'Not subscribed to event'})
+        if not subscriptions.is_sharded():
+            invalidate_events(event_id)
+        return jsonify({'message': 'Unsubscribed from event successfully'})
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -168,17 +508,22 @@ def update_event(user, event_id):
 
 # Endpoint to delete a specific event
 @events_blueprint.route('/events/<int:event_id>', methods=['DELETE'])
+@query_budget(6)
 @token_required
 def delete_event(user, event_id):
     try:
         event = Event.query.get(event_id)
         if event:
-            user_events_ids = [event.id for event in user.events]
-            if event_id not in user_events_ids:
+            if not _is_event_owner(user, event_id):
                 return jsonify({'message': "only owners of event can delete it"}), 403
-            user.events.remove(event)
-            db.session.delete(event)
+            db.session.execute(user_event_association.delete().where(
+                user_event_association.c.event_id == event_id))
+            # By id, not by version: subscriptions committed since the event was loaded
+            # must not fail the delete, their rows go with the event (ON DELETE CASCADE)
+            db.session.execute(sa.delete(Event).where(Event.id == event_id))
+            TableVersion.bump_after_commit(Event.__tablename__)
             db.session.commit()
+            invalidate_events(event_id)
             return jsonify({'message': 'Event deleted successfully'})
         else:
             return jsonify({'message': 'Event not found'}), 404
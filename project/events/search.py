@@ -0,0 +1,83 @@
+"""
+Full-text search of the events, for GET /events/search.
+
+The search query is parsed with websearch_to_tsquery (quoted phrases, OR,
+-word) and matched against Event.search_vector through its GIN index. Matches
+are ranked with ts_rank, title words weighing more than description words,
+and paginated by keyset on (rank, id) like the listing (see pagination.py):
+the cursor holds the rank and id of the last event of the page.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+import sqlalchemy as sa
+
+from project import db
+from project.models import SEARCH_CONFIG, Event
+
+from .serialization import event_columns
+
+MAX_QUERY_LENGTH = 200
+
+
+def search_query(q):
+    """Return the tsquery of a search string, raising ValueError if it is invalid."""
+    q = (q or '').strip()
+    if not q:
+        raise ValueError("Missing search query q.")
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f"Search query q must be at most {MAX_QUERY_LENGTH} characters long.")
+    return sa.func.websearch_to_tsquery(SEARCH_CONFIG, q)
+
+
+def encode_cursor(rank, event_id):
+    payload = json.dumps([str(rank), event_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, event_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        rank = Decimal(rank)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, InvalidOperation):
+        raise ValueError("Invalid value for cursor.")
+    if not rank.is_finite() or not isinstance(event_id, int):
+        raise ValueError("Invalid value for cursor.")
+    return rank, event_id
+
+
+def search_statement(q, limit, cursor=None):
+    """Select the columns of the events matching q and their rank, best matches first.
+
+    limit + 1 rows are selected to find out whether there is a next page.
+    """
+    tsquery = search_query(q)
+    # ts_rank returns a real, whose text form is rounded: as a numeric, the rank
+    # sent back in the cursor is exactly the one the rows are ordered by
+    rank = sa.cast(sa.func.ts_rank(Event.search_vector, tsquery), sa.Numeric)
+    statement = sa.select(*event_columns(), rank).where(Event.search_vector.op('@@')(tsquery))
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor)
+        statement = statement.where(sa.tuple_(rank, Event.id) < sa.tuple_(last_rank, last_id))
+    return statement.order_by(rank.desc(), Event.id.desc()).limit(limit + 1)
+
+
+def search_events(q, limit, cursor=None):
+    """Return one page of the events matching q, best matches first.
+
+    Returns the rows of the page, the columns of event_columns() followed by
+    the rank, and the cursor of the next page (None when this is the last page).
+    """
+    return search_page(db.session.execute(search_statement(q, limit, cursor)).all(), limit)
+
+
+def search_page(rows, limit):
+    """Return the rows of search_statement() that belong to the page, and the
+    cursor of the next page."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1][-1], rows[-1].id)
+    return rows, None
@@ -0,0 +1,43 @@
+"""
+Serialization of the events read by the API.
+
+Event reads select the columns of the returned fields with a Core select()
+instead of loading Event instances: the rows are plain tuples, without
+identity map, change tracking or attribute instrumentation. event_dicts()
+zips them with the field names, and the JSON provider (project.json_provider)
+writes their datetimes in the format of the API.
+"""
+from project.models import Event
+
+# Every field of the event representation and its column, in response order
+EVENT_FIELDS = {
+    'id': Event.id,
+    'title': Event.title,
+    'description': Event.description,
+    'venue': Event.venue,
+    'location': Event.location,
+    'event_date': Event.event_date,
+    'tags': Event.tags,
+    'participants': Event.participants,
+}
+
+
+def event_columns(fields=None, *extra):
+    """Columns to select for fields (all of them when None), followed by the
+    extra columns the query needs but the response leaves out."""
+    columns = [EVENT_FIELDS[field] for field in fields or EVENT_FIELDS]
+    for column in extra:
+        if column is not None and not any(column is selected for selected in columns):
+            columns.append(column)
+    return columns
+
+
+def event_dict(row, fields=None):
+    """The representation of an event from a row selected by event_columns(fields)."""
+    # zip() stops at the last field, before the extra columns
+    return dict(zip(fields or EVENT_FIELDS, row))
+
+
+def event_dicts(rows, fields=None):
+    names = tuple(fields or EVENT_FIELDS)
+    return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,133 @@
+"""
+Subscriptions of users to events, and the participant counts they change.
+
+Reading the count of an event, adding one in Python and writing it back
+loses the subscriptions of concurrent requests. Here the database applies
+the change itself: one statement inserts (or deletes) the subscription and,
+only if a row was actually inserted (or deleted), runs
+
+    UPDATE events SET participants = participants + 1, version = version + 1
+
+so counts stay exact however many requests race, and subscribing twice
+counts once.
+
+The update locks the row of the event until the transaction ends, which
+serializes the subscriptions of an event, and nothing else: the version of
+the events table in the ETags of the listings is bumped after the commit
+(see TableVersion), so subscriptions to different events never wait for
+each other.
+
+For events with thousands of signups at once, EVENTS_PARTICIPANT_SHARDS > 0
+spreads the changes over that many rows of event_participant_shards per
+event, picked at random, and subscriptions no longer touch the event. The
+scheduler leader folds the shards into events.participants every
+EVENTS_PARTICIPANT_FOLD_SECONDS: the count then lags behind by up to that
+delay, but no change is lost or applied twice.
+"""
+import random
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
+
+from project import db
+from project.models import Event, ParticipantShard, TableVersion, event_subscriptions
+
+events = Event.__table__
+shards = ParticipantShard.__table__
+
+
+def is_sharded():
+    """Whether subscriptions go to the shards instead of the event."""
+    return current_app.config['EVENTS_PARTICIPANT_SHARDS'] > 0
+
+
+def subscribe(user_id, event_id):
+    """Subscribe a user to an event and count them in its participants.
+
+    Returns False, without any change, when the user already is a subscriber
+    or the event does not exist.
+    """
+    return _change(user_id, event_id, 1)
+
+
+def unsubscribe(user_id, event_id):
+    """Remove the subscription of a user to an event and its participant.
+
+    Returns False, without any change, when the user is not a subscriber.
+    """
+    return _change(user_id, event_id, -1)
+
+
+def _change(user_id, event_id, delta):
+    shard = None
+    if is_sharded():
+        shard = random.randrange(current_app.config['EVENTS_PARTICIPANT_SHARDS'])
+    changed = db.session.execute(subscription_statement(user_id, event_id, delta, shard)).first()
+    if changed is not None and shard is None:
+        TableVersion.bump_after_commit(Event.__tablename__)
+    return changed is not None
+
+
+def subscription_statement(user_id, event_id, delta, shard=None):
+    """Statement inserting (delta 1) or deleting (delta -1) a subscription and
+    adding delta to the participants of the event, or to one of its shards.
+
+    Returns a row only if the subscription changed.
+    """
+    if delta > 0:
+        # Selected from events, a missing event inserts nothing instead of failing
+        subscription = insert(event_subscriptions).from_select(
+            ['user_id', 'event_id'],
+            sa.select(sa.literal(user_id), events.c.id).where(events.c.id == event_id),
+        ).on_conflict_do_nothing()
+    else:
+        subscription = event_subscriptions.delete().where(
+            event_subscriptions.c.user_id == user_id,
+            event_subscriptions.c.event_id == event_id)
+    changed = subscription.returning(event_subscriptions.c.event_id).cte('changed')
+
+    if shard is None:
+        statement = events.update().where(events.c.id == changed.c.event_id).values(
+            participants=events.c.participants + delta, version=events.c.version + 1)
+        return statement.returning(events.c.participants)
+
+    statement = insert(shards).from_select(
+        ['event_id', 'shard', 'count'],
+        sa.select(changed.c.event_id, sa.literal(shard), sa.literal(delta)))
+    statement = statement.on_conflict_do_update(
+        index_elements=[shards.c.event_id, shards.c.shard],
+        set_={'count': shards.c.count + statement.excluded.count})
+    return statement.returning(shards.c.count)
+
+
+def fold_statement():
+    """Statement moving the counts of the shards into the participants of
+    their events, returning the ids of the events that changed.
+
+    Shards locked by a subscription in progress are left for the next fold
+    instead of waited for. A subscription waiting for a shard being folded
+    inserts a new one once the fold commits.
+    """
+    claimed = (sa.select(shards.c.event_id, shards.c.shard)
+               .with_for_update(skip_locked=True).subquery('claimed'))
+    folded = (shards.delete()
+              .where(shards.c.event_id == claimed.c.event_id,
+                     shards.c.shard == claimed.c.shard)
+              .returning(shards.c.event_id, shards.c.count).cte('folded'))
+    deltas = (sa.select(folded.c.event_id, sa.func.sum(folded.c.count).label('delta'))
+              .group_by(folded.c.event_id)
+              .having(sa.func.sum(folded.c.count) != 0).subquery('deltas'))
+    return (events.update().where(events.c.id == deltas.c.event_id)
+            .values(participants=events.c.participants + deltas.c.delta,
+                    version=events.c.version + 1)
+            .returning(events.c.id))
+
+
+def fold_shards():
+    """Apply the sharded participant counts to their events as part of the
+    current transaction, and return the ids of the events that changed."""
+    event_ids = db.session.execute(fold_statement()).scalars().all()
+    if event_ids:
+        TableVersion.bump_after_commit(Event.__tablename__)
+    return event_ids
@@ -0,0 +1,104 @@
+"""
+Password hashing off the request threads.
+
+Werkzeug's password hashes are slow on purpose. Computed on a request thread
+they keep a core busy while holding the GIL, so a burst of /login and
+/register requests stalls every other request of the worker. The
+PasswordHasher runs them in a pool of PASSWORD_HASH_WORKERS processes instead;
+the request thread only waits for the result, without holding the GIL.
+
+At most PASSWORD_HASH_QUEUE_SIZE hashes are queued or running per process. A
+request that cannot get a slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds gets
+HashingBusy, so a login burst is shed instead of piling up.
+
+Hashes are created with PASSWORD_HASH_METHOD and PASSWORD_SALT_LENGTH.
+needs_rehash() tells whether a stored hash was made with other parameters, so
+that it can be replaced on the next successful login.
+
+With PASSWORD_HASH_WORKERS = 0, or before init_app, hashes are computed inline.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the queue of the hashing pool is full."""
+
+
+class PasswordHasher:
+
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256:600000'
+        self.salt_length = 16
+        self.workers = 0
+        self.queue_timeout = 5
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', self.salt_length)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+        self._slots = threading.BoundedSemaphore(
+            app.config.get('PASSWORD_HASH_QUEUE_SIZE', 64))
+        self._prefix = None
+        self.shutdown()
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether password_hash was not made with the configured parameters."""
+        method, _, rest = password_hash.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self._method_prefix() or len(salt) != self.salt_length
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _method_prefix(self):
+        # Werkzeug completes the method with its default parameters, e.g. the
+        # number of iterations: learn them once from a hash with the method
+        if self._prefix is None:
+            self._prefix = self._run(
+                generate_password_hash, '', self.method, 1).partition('$')[0]
+        return self._prefix
+
+    def _run(self, func, *args):
+        if not self.workers or self._slots is None:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy('Too many password checks in progress, try again later.')
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        # A pool inherited through fork() belongs to the parent process
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # Forking the threaded server process is unsafe, the pool's
+                    # processes are forked from a clean server process instead
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context('forkserver'))
+                    self._pid = os.getpid()
+        return self._executor
@@ -0,0 +1,11 @@
+"""
+The internal Blueprint exposes operational data about the running process,
+such as the effectiveness of the caches. It is registered under /internal
+when the INTERNAL_ENDPOINTS setting is enabled.
+"""
+from flask import Blueprint
+
+
+internal_blueprint = Blueprint('internal', __name__)
+
+from . import routes  # nopep8
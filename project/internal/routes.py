@@ -0,0 +1,16 @@
+from flask import jsonify
+
+from project import cache, db, mailer, principal_cache
+
+from . import internal_blueprint
+
+
+# Endpoint to retrieve the counters of the caches, the mailer and the database pool of this process
+@internal_blueprint.route('/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'cache': cache.stats(),
+        'principal_cache': principal_cache.stats(),
+        'mailer': mailer.stats(),
+        'db_pool': db.engine.pool.stats() if hasattr(db.engine.pool, 'stats') else None,
+    })
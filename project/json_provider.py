@@ -0,0 +1,57 @@
+"""
+JSON provider of the application, the serializer of jsonify() and app.json.
+
+Responses are encoded with orjson, a dependency several times faster than the
+json module, and with Flask's provider where orjson could not be installed
+(a platform without orjson wheels). Both produce the same documents: sorted
+keys, compact separators (indented in debug mode), and datetimes written as
+'YYYY-MM-DD HH:MM:SS', the format of the API, so rows can be serialized
+without formatting their dates first.
+"""
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, datetime):
+        return o.isoformat(' ', 'seconds')
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def _options(self, indent=None):
+        options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                   | orjson.OPT_PASSTHROUGH_DATETIME)
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        # Arguments orjson has no equivalent for go to the json module
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default,
+                            option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
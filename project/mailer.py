@@ -0,0 +1,155 @@
+"""
+Background delivery of e-mails through a pool of SMTP connections.
+
+Sending a message with mail.send() opens an SMTP connection, greets, maybe
+starts TLS and logs in, sends one message and quits. The Mailer instead hands
+messages to a bounded queue served by MAIL_WORKERS threads. Each worker keeps
+its connection open while there is work, sends up to MAIL_BATCH_SIZE queued
+messages in a row over it, and closes it after MAIL_CONNECTION_IDLE_SECONDS
+without messages.
+
+A message that cannot be sent is retried MAIL_MAX_RETRIES times over a fresh
+connection, waiting MAIL_RETRY_BACKOFF seconds doubled on every attempt, and
+then dropped and logged. When the queue is full, send() blocks the producer
+until the workers catch up.
+
+The workers are started with the first message, so processes that never send
+any mail do not run them.
+"""
+import queue
+import smtplib
+import threading
+import time
+
+from flask_mail import Connection
+
+# Put in the queue to stop a worker
+_STOP = object()
+
+
+class Mailer:
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connections = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.worker_count = app.config.get('MAIL_WORKERS', 2)
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 100)
+        self.max_retries = app.config.get('MAIL_MAX_RETRIES', 3)
+        self.retry_backoff = app.config.get('MAIL_RETRY_BACKOFF', 1.0)
+        self.idle_timeout = app.config.get('MAIL_CONNECTION_IDLE_SECONDS', 30)
+        self._queue = queue.Queue(app.config.get('MAIL_QUEUE_SIZE', 1000))
+        app.extensions['mailer'] = self
+
+    def send(self, message, block=True, timeout=None):
+        """Queue a message, raises queue.Full if it cannot be queued in time."""
+        self._start()
+        self._queue.put(message, block, timeout)
+
+    def send_many(self, messages):
+        """Queue messages that are due together, they share connections."""
+        for message in messages:
+            self.send(message)
+
+    def join(self):
+        """Wait until every queued message has been sent or dropped."""
+        self._queue.join()
+
+    def stop(self):
+        """Send the queued messages, then stop the workers."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(_STOP)
+        for worker in workers:
+            worker.join()
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'sent': self.sent,
+                'retried': self.retried, 'failed': self.failed,
+                'connections': self.connections, 'workers': len(self._workers)}
+
+    def _start(self):
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            for number in range(self.worker_count):
+                worker = threading.Thread(target=self._work, name=f'mailer-{number}',
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        with self.app.app_context():
+            connection = None
+            try:
+                while True:
+                    try:
+                        message = self._queue.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        connection = self._close(connection)
+                        continue
+                    batch = [message]
+                    while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    for message in batch:
+                        if message is not _STOP:
+                            connection = self._deliver(connection, message)
+                    for _ in batch:
+                        self._queue.task_done()
+                    if batch[-1] is _STOP:
+                        return
+            finally:
+                self._close(connection)
+
+    def _deliver(self, connection, message):
+        """Send message, return the connection to use for the next one."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if connection is None:
+                    connection = Connection(self.app.extensions['mail'])
+                    connection.__enter__()
+                    self.connections += 1
+                connection.send(message)
+                self.sent += 1
+                return connection
+            except (smtplib.SMTPException, OSError) as e:
+                connection = self._close(connection)
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    self.app.logger.error(
+                        f'Dropping e-mail to {message.send_to} after '
+                        f'{attempt + 1} attempts: {e}')
+                else:
+                    self.retried += 1
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as e:
+                # The message itself is invalid, sending it again will not help
+                self.failed += 1
+                self.app.logger.error(f'Dropping e-mail to {message.send_to}: {e}')
+                return connection
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+        return None
@@ -0,0 +1,416 @@
+"""
+Prometheus metrics of the application, served as text by GET /metrics.
+
+    http_request_duration_seconds{endpoint,method,status}   histogram
+    http_requests_in_flight{endpoint}                        gauge
+    db_statement_duration_seconds{endpoint}                  histogram
+    db_statements_per_request{endpoint}                      histogram
+    db_time_per_request_seconds{endpoint}                    histogram
+    scheduler_jobs_total{job,outcome}                        counter
+
+endpoint is the Flask endpoint of the request ('unmatched' when no route
+matched, 'none' for statements outside of requests), so the labels only take
+a fixed set of values. As a safeguard, a metric stops creating series after
+METRICS_MAX_SERIES and records further label values as '_other'.
+
+Metrics are kept per process. Under a server running several worker
+processes, e.g. gunicorn, set METRICS_MULTIPROCESS_DIR to a directory of their
+own: every process then writes its series to a file of that directory every
+METRICS_FLUSH_SECONDS, and GET /metrics serves the sum of every file, whichever
+worker serves it. The counters and histograms of a worker that exited are
+folded into an archive file by mark_process_dead, so that they never go back,
+and its gauges are dropped. gunicorn.conf.py empties the directory when the
+server starts and calls mark_process_dead for every worker that exits.
+
+The duration of a streamed response only covers the time until its first byte.
+"""
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import request
+from sqlalchemy import event
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OTHER = '_other'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=(), max_series=500):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.max_series = max_series
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        if key not in self._series and len(self._series) >= self.max_series:
+            return (OTHER,) * len(self.labels)
+        return key
+
+    def snapshot(self):
+        """The series of the metric, as a list of JSON values."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._series.items()]
+
+    def render(self, series=None):
+        """Render the series of the metric, or the given ones (see read_multiprocess_dir)."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.type}']
+        if series is None:
+            with self._lock:
+                series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.labels, key)} {value}']
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS,
+                 max_series=500):
+        super().__init__(name, documentation, labels, max_series)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        # Observations are counted in their own bucket and summed up on render
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]]
+                    for key, (counts, total) in self._series.items()]
+
+    def _render_series(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            labels = _format_labels(self.labels, key, f'le="{bound}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labels, key)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Metrics:
+
+    def __init__(self, app=None):
+        self.max_series = 500
+        self.directory = None
+        self.flush_seconds = 1
+        self._flusher_pid = None
+        self._create_metrics()
+        if app is not None:
+            self.init_app(app)
+
+    def _create_metrics(self):
+        max_series = self.max_series
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Time spent handling requests.',
+            ('endpoint', 'method', 'status'), max_series=max_series)
+        self.requests_in_flight = Gauge(
+            'http_requests_in_flight', 'Requests being handled.', ('endpoint',),
+            max_series=max_series)
+        self.statement_duration = Histogram(
+            'db_statement_duration_seconds', 'Time spent executing SQL statements.',
+            ('endpoint',), max_series=max_series)
+        self.statements_per_request = Histogram(
+            'db_statements_per_request', 'SQL statements executed per request.',
+            ('endpoint',), buckets=COUNT_BUCKETS, max_series=max_series)
+        self.db_time_per_request = Histogram(
+            'db_time_per_request_seconds', 'Time spent executing SQL statements per request.',
+            ('endpoint',), max_series=max_series)
+        self.jobs = Counter(
+            'scheduler_jobs_total', 'Scheduled jobs run, by outcome.', ('job', 'outcome'),
+            max_series=max_series)
+
+    @property
+    def all(self):
+        return [self.request_duration, self.requests_in_flight, self.statement_duration,
+                self.statements_per_request, self.db_time_per_request, self.jobs]
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.max_series = app.config.get('METRICS_MAX_SERIES', 500)
+        self.directory = app.config.get('METRICS_MULTIPROCESS_DIR') or None
+        self.flush_seconds = app.config.get('METRICS_FLUSH_SECONDS', 1)
+        self._create_metrics()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        if 'sqlalchemy' in app.extensions:
+            with app.app_context():
+                for engine in app.extensions['sqlalchemy'].engines.values():
+                    self.instrument_engine(engine)
+        # The async views run their statements on the sync engine of the async one
+        async_db = app.extensions.get('async_db')
+        if async_db is not None and async_db.engine is not None:
+            self.instrument_engine(async_db.engine.sync_engine)
+
+    def instrument_engine(self, engine):
+        """Time the statements executed by an engine."""
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def render(self):
+        lines = []
+        if self.directory is None:
+            for metric in self.all:
+                lines.extend(metric.render())
+        else:
+            self.flush()
+            merged = read_multiprocess_dir(self.directory)
+            for metric in self.all:
+                lines.extend(metric.render(merged.get(metric.name, {}).get('series', {})))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Write the series of this process to its file of METRICS_MULTIPROCESS_DIR."""
+        if self.directory is None:
+            return
+        snapshot = {metric.name: {'type': metric.type, 'series': metric.snapshot()}
+                    for metric in self.all}
+        _write_json(_process_path(self.directory, os.getpid()), snapshot)
+
+    def _ensure_flusher(self):
+        # Started on first use in every process: the threads of a preloading
+        # master do not survive the fork of its workers
+        pid = os.getpid()
+        if self.directory is None or self._flusher_pid == pid:
+            return
+        self._flusher_pid = pid
+        threading.Thread(target=self._flush_periodically, name='metrics-flusher',
+                         daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                # Written again at the next flush
+                pass
+
+    def view(self):
+        return self.render(), 200, {'Content-Type': CONTENT_TYPE}
+
+    def wsgi_app(self, environ, start_response):
+        """Serve the metrics alone, for processes that serve no requests."""
+        body = self.render().encode()
+        start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    def count_job(self, job_event):
+        """APScheduler listener counting the jobs run by the scheduler."""
+        from apscheduler.events import EVENT_JOB_MISSED
+
+        if job_event.code == EVENT_JOB_MISSED:
+            outcome = 'missed'
+        else:
+            outcome = 'error' if job_event.exception else 'success'
+        self.jobs.inc(job=job_event.job_id, outcome=outcome)
+        self._ensure_flusher()
+
+    def _before_request(self):
+        self._ensure_flusher()
+        state = _RequestState(_endpoint())
+        _request_state.set(state)
+        self.requests_in_flight.inc(endpoint=state.endpoint)
+
+    def _after_request(self, response):
+        state = _request_state.get()
+        if state is not None:
+            method = request.method if request.method in METHODS else OTHER
+            self.request_duration.observe(time.perf_counter() - state.start,
+                                          endpoint=state.endpoint, method=method,
+                                          status=response.status_code)
+            self.statements_per_request.observe(state.statements, endpoint=state.endpoint)
+            self.db_time_per_request.observe(state.sql_seconds, endpoint=state.endpoint)
+        return response
+
+    def _teardown_request(self, exception):
+        state = _request_state.get()
+        if state is not None:
+            self.requests_in_flight.dec(endpoint=state.endpoint)
+            _request_state.set(None)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context,
+                              executemany):
+        start = conn.info.pop('metrics_query_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        state = _request_state.get()
+        if state is None:
+            self.statement_duration.observe(duration, endpoint='none')
+        else:
+            state.statements += 1
+            state.sql_seconds += duration
+            self.statement_duration.observe(duration, endpoint=state.endpoint)
+
+
+class _RequestState:
+    """Measurements of the request being handled."""
+    __slots__ = ('endpoint', 'start', 'statements', 'sql_seconds')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+# Request contexts are context-local, and so is the state of their request
+_request_state = ContextVar('metrics_request_state', default=None)
+
+
+def _endpoint():
+    return request.url_rule.endpoint if request.url_rule is not None else 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
+
+
+# --------------------------------------------------
+# Processes sharing their metrics, see Metrics.flush
+# --------------------------------------------------
+
+_ARCHIVE = 'archive.json'
+
+
+def _process_path(directory, pid):
+    return os.path.join(directory, f'{pid}.json')
+
+
+@contextmanager
+def _locked(directory, operation):
+    # Readers share the lock, mark_process_dead moves a file into the archive under an
+    # exclusive one: a reader never sees the series of a process twice, or not at all
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_json(path, value):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(value, file)
+    os.replace(temporary, path)
+
+
+def _merge_file(merged, path):
+    try:
+        with open(path) as file:
+            snapshot = json.load(file)
+    except FileNotFoundError:
+        return
+    for name, metric in snapshot.items():
+        merged_metric = merged.setdefault(name, {'type': metric['type'], 'series': {}})
+        series = merged_metric['series']
+        for key, value in metric['series']:
+            key = tuple(key)
+            if metric['type'] == 'histogram':
+                current = series.get(key)
+                if current is None:
+                    series[key] = value
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+            else:
+                series[key] = series.get(key, 0) + value
+
+
+def read_multiprocess_dir(directory):
+    """Sum the series written by every process, and the archive of those that exited.
+
+    Returns {metric name: {'type': type, 'series': {label values: value}}}.
+    """
+    merged = {}
+    with _locked(directory, fcntl.LOCK_SH):
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            _merge_file(merged, path)
+    return merged
+
+
+def mark_process_dead(directory, pid):
+    """Fold the counters and histograms of a process that exited into the archive."""
+    path = _process_path(directory, pid)
+    if not os.path.exists(path):
+        return
+    with _locked(directory, fcntl.LOCK_EX):
+        merged = {}
+        _merge_file(merged, os.path.join(directory, _ARCHIVE))
+        _merge_file(merged, path)
+        archive = {name: {'type': metric['type'],
+                          'series': [[list(key), value] for key, value in metric['series'].items()]}
+                   for name, metric in merged.items() if metric['type'] != 'gauge'}
+        _write_json(os.path.join(directory, _ARCHIVE), archive)
+        os.remove(path)
+
+
+def reset_multiprocess_dir(directory):
+    """Create the directory, without the files of a previous run of the server."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
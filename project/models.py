@@ -1,20 +1,36 @@
 
 from datetime import datetime
 
+from flask import current_app
 from flask_login import UserMixin
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, ARRAY
-from sqlalchemy.orm import mapped_column, relationship
-from sqlalchemy.sql import func
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import (DDL, DateTime, ForeignKey, Index, Integer, Sequence, SmallInteger,
+                        String, Text, Uuid, event, inspect)
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, mapped_column, object_session, relationship
+from sqlalchemy.sql import column, func, select, table, text
 import re
 from validate_email_address import validate_email
-from project import db
+from project import db, password_hasher, principal_cache
 
 
+# Links users to the events they own. The primary key serves the lookups by
+# user (User.events and ownership checks), the event_id index those by event.
 user_event_association = db.Table(
     'user_event_association',
-    db.Column('user_id', Integer, ForeignKey('users.id')),
-    db.Column('event_id', Integer, ForeignKey('events.id'))
+    db.Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    db.Column('event_id', Integer, ForeignKey('events.id'), primary_key=True),
+    Index('ix_user_event_association_event_id', 'event_id')
+)
+
+# Links users to the events they subscribed to. Rows are only written by
+# project.events.subscriptions, in the statements that also count them in the
+# participants of the event, and go away with their user or event.
+event_subscriptions = db.Table(
+    'event_subscriptions',
+    db.Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('event_id', Integer, ForeignKey('events.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_event_subscriptions_event_id', 'event_id')
 )
 
 
@@ -25,7 +41,7 @@ class User(UserMixin, db.Model):
 
     The following attributes of a user are stored in this table:
         * email - email address of the user
-        * hashed password - hashed password (using werkzeug.security)
+        * hashed password - hashed password (using werkzeug.security, see project.hashing)
         * registered_on - date & time that the user registered
 
     """
@@ -34,7 +50,7 @@ class User(UserMixin, db.Model):
 
     id = mapped_column(Integer(), primary_key=True, autoincrement=True)
     email = mapped_column(String(), unique=True, nullable=False)
-    password_hashed = mapped_column(String(128), nullable=False)
+    password_hashed = mapped_column(String(256), nullable=False)
     registered_on = mapped_column(DateTime(), nullable=False)
     events = relationship(
         'Event', secondary=user_event_association)
@@ -69,21 +85,57 @@ class User(UserMixin, db.Model):
         return bool(regex.match(password))
 
     def is_password_correct(self, password_plaintext: str):
-        return check_password_hash(self.password_hashed, password_plaintext)
+        return password_hasher.verify(self.password_hashed, password_plaintext)
+
+    def needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hashed)
 
     def set_password(self, password_plaintext: str):
         self.password_hashed = self._generate_password_hash(password_plaintext)
 
     @staticmethod
     def _generate_password_hash(password_plaintext):
-        return generate_password_hash(password_plaintext)
+        return password_hasher.hash(password_plaintext)
 
     def __repr__(self):
         return f'<User: {self.email}>'
 
 
+# Drop the cached principal of a user whose password changed or who was deleted
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    if inspect(target).attrs.password_hashed.history.has_changes():
+        principal_cache.invalidate_after_commit(object_session(target), target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    principal_cache.invalidate_after_commit(object_session(target), target.id)
+
+
 class Event(db.Model):
     __tablename__ = 'events'
+    __table_args__ = (
+        # One index per sort_by order of GET /events (sort column + id tie-breaker),
+        # alone and behind the location / venue equality filters. Descending
+        # orders are served by scanning the same indexes backwards.
+        Index('ix_events_event_date_id', 'event_date', 'id'),
+        Index('ix_events_participants_id', 'participants', 'id'),
+        Index('ix_events_created_at_id', 'created_at', 'id'),
+        Index('ix_events_location_event_date_id', 'location', 'event_date', 'id'),
+        Index('ix_events_location_participants_id', 'location', 'participants', 'id'),
+        Index('ix_events_location_created_at_id', 'location', 'created_at', 'id'),
+        Index('ix_events_venue_event_date_id', 'venue', 'event_date', 'id'),
+        Index('ix_events_venue_participants_id', 'venue', 'participants', 'id'),
+        Index('ix_events_venue_created_at_id', 'venue', 'created_at', 'id'),
+        # Upcoming events still waiting for their reminder, see project.reminders
+        Index('ix_events_reminder_due', 'event_date',
+              postgresql_where=text('reminder_sent_at IS NULL')),
+        # Full-text search of GET /events/search
+        Index('ix_events_search_vector', 'search_vector', postgresql_using='gin'),
+        # Tag filters of GET /events, the && and @> array operators
+        Index('ix_events_tags', 'tags', postgresql_using='gin'),
+    )
 
     id = mapped_column(Integer(), primary_key=True, autoincrement=True)
     title = mapped_column(String(255), unique=True, nullable=False)
@@ -92,11 +144,22 @@ class Event(db.Model):
     location = mapped_column(String(255), nullable=False)
     event_date = mapped_column(DateTime(), nullable=False)
     tags = mapped_column(ARRAY(String(50)), nullable=True)
-    participants = mapped_column(Integer(), default=1)
-    created_at = mapped_column(DateTime(), default=func.now())
-
-    # subscribers = relationship(
-    #     'User', secondary=user_event_association, back_populates='events') TODO Implement
+    # Sort keys of GET /events, kept non-null so they can be used for keyset pagination
+    participants = mapped_column(Integer(), nullable=False, default=1)
+    created_at = mapped_column(DateTime(), nullable=False, default=func.now())
+    # Incremented by every update of the row, used to build the event ETag
+    version = mapped_column(Integer(), nullable=False, server_default='1')
+    # Set once the reminder of the event has been sent
+    reminder_sent_at = mapped_column(DateTime(), nullable=True)
+    # Words of the title and description, maintained by the events_search_vector
+    # trigger below. Deferred, the ORM never needs it in Python.
+    search_vector = mapped_column(TSVECTOR(), nullable=True, deferred=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    # Read only: subscriptions are added and removed together with the participant
+    # count, see project.events.subscriptions
+    subscribers = relationship('User', secondary=event_subscriptions, viewonly=True)
 
     def __init__(self, title, description, venue, location, event_date, tags=None, participants=1):
         if not title or len(title) < 5 or len(title) > 255:
@@ -128,7 +191,216 @@ class Event(db.Model):
         self.location = location
         self.event_date = event_date
         self.tags = tags if tags is not None else []
-        self.participants = participants
+        self.participants = participants if participants is not None else 1
 
     def __repr__(self):
         return f'<Event: {self.title} - {self.event_date}>'
+
+
+# Text search configuration of Event.search_vector, queries must use the same one
+SEARCH_CONFIG = 'english'
+
+# PostgreSQL 11 has no generated columns: a trigger computes the search vector of
+# every inserted row, including those of bulk inserts, and of rows whose title or
+# description changes. Title words rank above description words.
+# Keep in sync with migration 0e6b3d95c1f4.
+_search_vector_function = DDL(f"""
+CREATE OR REPLACE FUNCTION events_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""")
+_search_vector_trigger = DDL("""
+CREATE TRIGGER events_search_vector
+BEFORE INSERT OR UPDATE OF title, description ON events
+FOR EACH ROW EXECUTE PROCEDURE events_search_vector()
+""")
+event.listen(Event.__table__, 'after_create',
+             _search_vector_function.execute_if(dialect='postgresql'))
+event.listen(Event.__table__, 'after_create',
+             _search_vector_trigger.execute_if(dialect='postgresql'))
+
+# The number of events of every tag, in the tag_counts table, is maintained by
+# statement-level triggers: a statement writing many events, e.g. the insert of
+# POST /events/batch, updates the count of each of their tags once. Counts are
+# upserted in tag order, so concurrent writers lock them in the same order.
+# Keep in sync with migration 7a2f6c8e4d13.
+_TAG_COUNT_DELTA = {
+    'INSERT': "SELECT tag, count(DISTINCT id) FROM new_rows, unnest(tags) AS tag GROUP BY tag",
+    'DELETE': "SELECT tag, -count(DISTINCT id) FROM old_rows, unnest(tags) AS tag GROUP BY tag",
+    'UPDATE': """SELECT tag, sum(delta) FROM (
+                     SELECT DISTINCT id, tag, 1 AS delta FROM new_rows, unnest(tags) AS tag
+                     UNION ALL
+                     SELECT DISTINCT id, tag, -1 FROM old_rows, unnest(tags) AS tag
+                 ) AS changes GROUP BY tag HAVING sum(delta) <> 0""",
+}
+_tag_counts_function = DDL(f"""
+CREATE OR REPLACE FUNCTION events_tag_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO tag_counts (tag, count) {_TAG_COUNT_DELTA['INSERT']} ORDER BY tag
+        ON CONFLICT (tag) DO UPDATE SET count = tag_counts.count + excluded.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO tag_counts (tag, count) {_TAG_COUNT_DELTA['DELETE']} ORDER BY tag
+        ON CONFLICT (tag) DO UPDATE SET count = tag_counts.count + excluded.count;
+    ELSE
+        INSERT INTO tag_counts (tag, count) {_TAG_COUNT_DELTA['UPDATE']} ORDER BY tag
+        ON CONFLICT (tag) DO UPDATE SET count = tag_counts.count + excluded.count;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+_tag_counts_triggers = [DDL(f"""
+CREATE TRIGGER events_tag_counts_{operation.lower()}
+AFTER {operation} ON events REFERENCING {tables}
+FOR EACH STATEMENT EXECUTE PROCEDURE events_tag_counts()
+""") for operation, tables in [('INSERT', 'NEW TABLE AS new_rows'),
+                               ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+                               ('DELETE', 'OLD TABLE AS old_rows')]]
+for _ddl in [_tag_counts_function, *_tag_counts_triggers]:
+    event.listen(Event.__table__, 'after_create', _ddl.execute_if(dialect='postgresql'))
+
+
+class TableVersion:
+    """
+    Version of a whole table, kept in a PostgreSQL sequence
+
+    It identifies the state of responses that depend on many rows, e.g. the
+    ETag of GET /events. Writers bump it once their transaction has committed
+    (bump_after_commit): nextval takes no lock and is not rolled back, so
+    concurrent writers never wait for each other on the version, and a reader
+    cannot label the rows of a transaction that is still to commit with it.
+    Between a commit and its bump, readers may label the new rows with the
+    previous version; the bump changes it again right after.
+    """
+
+    SEQUENCES = {
+        'events': Sequence('events_version_seq', metadata=db.metadata),
+    }
+
+    @classmethod
+    def current(cls, name):
+        sequence = cls.SEQUENCES[name]
+        last_value, is_called = db.session.execute(
+            select(column('last_value'), column('is_called')).select_from(table(sequence.name))
+        ).one()
+        # A sequence that nextval was never called on is at its start value
+        return last_value if is_called else 0
+
+    @classmethod
+    def bump_after_commit(cls, name, session=None):
+        """Increment the version of a table once the current transaction commits.
+
+        A rolled back transaction leaves the version alone.
+        """
+        session = session if session is not None else db.session
+        session.info.setdefault(_PENDING_VERSIONS_KEY, set()).add(name)
+
+    @classmethod
+    def _bump(cls, bind, names):
+        # Committed rows must never keep the previous version, but the commit
+        # already succeeded: a failed bump is logged rather than raised
+        try:
+            with bind.connect() as connection:
+                for name in sorted(names):
+                    connection.execute(select(cls.SEQUENCES[name].next_value()))
+        except SQLAlchemyError:
+            current_app.logger.exception(f'Could not bump the version of {", ".join(names)}')
+
+
+_PENDING_VERSIONS_KEY = 'table_versions'
+_COMMITTED_VERSIONS_KEY = 'committed_table_versions'
+
+
+@event.listens_for(Session, 'after_commit')
+def _commit_pending_versions(session):
+    # A released savepoint can still be rolled back with its transaction
+    if session.in_nested_transaction():
+        return
+    names = session.info.pop(_PENDING_VERSIONS_KEY, None)
+    if names:
+        session.info.setdefault(_COMMITTED_VERSIONS_KEY, set()).update(names)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _bump_committed_versions(session, transaction):
+    # Once the connection of the session is back in the pool: bumping on a
+    # second connection while holding the first would need two per request
+    if transaction.parent is not None:
+        return
+    names = session.info.pop(_COMMITTED_VERSIONS_KEY, None)
+    if names:
+        TableVersion._bump(session.get_bind(), names)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_versions(session, previous_transaction):
+    session.info.pop(_PENDING_VERSIONS_KEY, None)
+
+
+class TagCount(db.Model):
+    """
+    Class that represents the number of events with a tag
+
+    Rows are only written by the triggers of the events table, so GET /tags
+    reads the frequencies without scanning the events. Tags no longer used
+    by any event keep a row with a count of 0.
+    """
+
+    __tablename__ = 'tag_counts'
+
+    tag = mapped_column(String(50), primary_key=True)
+    count = mapped_column(Integer(), nullable=False)
+
+    def __repr__(self):
+        return f'<TagCount: {self.tag} - {self.count}>'
+
+
+class ParticipantShard(db.Model):
+    """
+    Class that represents a share of the participant count of an event
+
+    With EVENTS_PARTICIPANT_SHARDS, subscriptions add to one of the shards of
+    their event, picked at random, instead of locking the row of the event.
+    The scheduler leader folds the shards into Event.participants and deletes
+    them (see project.events.subscriptions). count can be negative.
+    """
+
+    __tablename__ = 'event_participant_shards'
+
+    event_id = mapped_column(Integer(), ForeignKey('events.id', ondelete='CASCADE'),
+                             primary_key=True)
+    shard = mapped_column(SmallInteger(), primary_key=True)
+    count = mapped_column(Integer(), nullable=False)
+
+    def __repr__(self):
+        return f'<ParticipantShard: {self.event_id}/{self.shard} - {self.count}>'
+
+
+class RevokedToken(db.Model):
+    """
+    Class that represents a refresh token that can no longer be used
+
+    jti is the id of a refresh token that was used, or the id of a family of
+    refresh tokens that was revoked (see project.tokens). Rows are only needed
+    until the tokens they revoke expire.
+    """
+
+    __tablename__ = 'revoked_tokens'
+
+    jti = mapped_column(Uuid(), primary_key=True)
+    expires_at = mapped_column(DateTime(), nullable=False, index=True)
+
+    @classmethod
+    def purge(cls):
+        """Delete the rows of tokens that have expired anyway."""
+        return db.session.execute(
+            cls.__table__.delete().where(cls.expires_at < datetime.utcnow())).rowcount
+
+    def __repr__(self):
+        return f'<RevokedToken: {self.jti}>'
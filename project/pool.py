@@ -0,0 +1,64 @@
+"""
+Connection pool of the database engine, instrumented.
+
+TimedQueuePool is SQLAlchemy's QueuePool (the default for PostgreSQL) that
+also counts checkouts, new connections and timeouts, and measures how long
+checkouts wait for a free connection. A pool running out of connections shows
+up as growing waits and overflow long before requests fail with a timeout.
+Its stats() are published by GET /internal/stats.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                if timed_out:
+                    self.timeouts += 1
+                else:
+                    self.checkouts += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        with self._stats_lock:
+            self.connects += 1
+        return connection
+
+    def stats(self):
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'checked_in': self.checkedin(),
+            'overflow': max(0, self.overflow()),
+            'max_overflow': self._max_overflow,
+            'checkouts': self.checkouts,
+            'connects': self.connects,
+            'timeouts': self.timeouts,
+            'wait_seconds_total': round(self.wait_seconds, 6),
+            'wait_seconds_max': round(self.max_wait_seconds, 6),
+        }
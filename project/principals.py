@@ -0,0 +1,111 @@
+"""
+Cache of the users authenticated by an access token.
+
+Without it, token_required loads the user from the database on every
+authenticated request. Entries map a token to a detached snapshot of its user
+that is re-attached to the request's session with merge(load=False), which
+does not emit any SQL. An entry expires after PRINCIPAL_CACHE_TTL seconds, and
+never later than the token itself.
+
+Changing the password of a user or deleting the user invalidates the entries
+of that user once the transaction commits (see project.models). Every user has
+a generation counter, read before the user is loaded from the database and
+stored with the entry: an entry whose generation is no longer current is
+ignored, so a load racing with the invalidating commit cannot be served later.
+
+Entries are kept in every process, the counters in the shared CACHE_BACKEND
+(redis) when there is one, so an invalidation reaches every process and every
+hit costs a read of the counter. Otherwise the counters are in the process,
+and another process would keep authenticating a deleted user, or an old
+password's tokens, for up to PRINCIPAL_CACHE_TTL: the cache is then only used
+when SINGLE_PROCESS is set.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_mapper
+
+from project.cache import LRUCache
+
+_PENDING_KEY = 'stale_principals'
+
+
+class PrincipalCache:
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self._cache = LRUCache()
+        self._counters = self._cache
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('PRINCIPAL_CACHE_TTL', 60)
+        self._cache = LRUCache(app.config.get('PRINCIPAL_CACHE_MAX_ENTRIES', 1024))
+        # Initialized before, see project.initialize_extensions
+        shared_cache = app.extensions.get('cache')
+        if shared_cache is not None and shared_cache.shared:
+            self._counters = shared_cache
+        else:
+            self._counters = self._cache
+            if not app.config.get('SINGLE_PROCESS', True):
+                self.ttl = 0
+        app.extensions['principal_cache'] = self
+
+    def generation(self, user_id):
+        return self._counters.get_counter(f'principals:user:{user_id}')
+
+    def get(self, token, session):
+        """Return the user of a token attached to session, or None on a miss."""
+        entry = self._cache.get(token) if self.ttl > 0 else None
+        if entry is None or entry[1] != self.generation(entry[0].id):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return session.merge(entry[0], load=False)
+
+    def put(self, token, user, expires_at, generation):
+        """Cache the user of a token.
+
+        expires_at is the token's exp claim (seconds since the epoch) and
+        generation the value of generation(user.id) read before loading user.
+        """
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl > 0:
+            self._cache.set(token, (_snapshot(user), generation), ttl)
+
+    def invalidate_user(self, user_id):
+        self._counters.incr(f'principals:user:{user_id}')
+
+    def invalidate_after_commit(self, session, user_id):
+        """Invalidate the entries of a user once session's transaction commits."""
+        session.info.setdefault(_PENDING_KEY, []).append((self, user_id))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache),
+                'enabled': self.ttl > 0}
+
+
+def _snapshot(instance):
+    """Detached copy of the loaded column attributes of an ORM instance."""
+    mapper = object_mapper(instance)
+    snapshot = mapper.class_manager.new_instance()
+    for attribute in mapper.column_attrs:
+        setattr(snapshot, attribute.key, getattr(instance, attribute.key))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_pending(session):
+    for cache, user_id in session.info.pop(_PENDING_KEY, ()):
+        cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
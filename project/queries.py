@@ -0,0 +1,116 @@
+"""
+SQL statements per request, for development and tests.
+
+QueryCounter counts the statements executed while handling a request. When
+QUERY_COUNTER is set (DevelopmentConfig, TestingConfig), every response gets
+an X-Query-Count header, and a warning is logged for requests that execute the
+same SQL more than once, the usual sign of an N+1 pattern: a query run per row
+of a previous result instead of one query for all of them.
+
+Views declare their budget with the query_budget decorator, placed between the
+route and the other decorators:
+
+    @events_blueprint.route('/events/<int:event_id>', methods=['PUT'])
+    @query_budget(5)
+    @token_required
+    def update_event(user, event_id):
+
+A request exceeding the budget of its view logs a warning, or raises
+QueryBudgetExceeded when QUERY_BUDGETS_ENFORCED is set, which makes the test
+issuing the request fail. Budgets count the worst case of a view, e.g. with
+token_required missing the principal cache. Statements executed while a
+streamed response is being sent come after the check and are not counted.
+"""
+from collections import Counter
+from contextvars import ContextVar
+
+from flask import current_app, request
+from sqlalchemy import event
+
+HEADER = 'X-Query-Count'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(statements):
+    """Declare the maximum number of SQL statements of a view."""
+    def decorator(view):
+        view.query_budget = statements
+        return view
+    return decorator
+
+
+class QueryCounter:
+
+    def __init__(self, app=None):
+        self.enforced = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['query_counter'] = self
+        if not app.config.get('QUERY_COUNTER', False):
+            return
+        self.enforced = app.config.get('QUERY_BUDGETS_ENFORCED', False)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if 'sqlalchemy' in app.extensions:
+            with app.app_context():
+                for engine in app.extensions['sqlalchemy'].engines.values():
+                    self.instrument_engine(engine)
+        # The async views run their statements on the sync engine of the async one
+        async_db = app.extensions.get('async_db')
+        if async_db is not None and async_db.engine is not None:
+            self.instrument_engine(async_db.engine.sync_engine)
+
+    def instrument_engine(self, engine):
+        """Count the statements executed by an engine."""
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+
+    def _before_request(self):
+        _statements.set([])
+
+    def _after_request(self, response):
+        statements = _statements.get()
+        if statements is None:
+            return response
+        response.headers[HEADER] = str(len(statements))
+
+        repeated = {statement: count for statement, count in Counter(statements).items()
+                    if count > 1}
+        if repeated:
+            current_app.logger.warning(
+                '%s %s executed the same statement several times:\n%s',
+                request.method, request.path, _describe(repeated))
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and len(statements) > budget:
+            message = (f'{request.method} {request.path} executed {len(statements)} '
+                       f'SQL statements, its budget is {budget}:\n'
+                       f'{_describe(Counter(statements))}')
+            if self.enforced:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
+
+    def _teardown_request(self, exception):
+        _statements.set(None)
+
+
+# Statements executed by the request being handled, None outside of requests
+_statements = ContextVar('query_counter_statements', default=None)
+
+
+def _describe(statements):
+    return '\n'.join(f'  {count}x {" ".join(statement.split())}'
+                     for statement, count in statements.items())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
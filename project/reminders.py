@@ -0,0 +1,266 @@
+"""
+Reminders sent to the owner of an event 30 minutes before it starts.
+
+There is no job per event: a sweep runs every REMINDER_SWEEP_SECONDS, looks up
+the events starting within the next REMINDER_LEAD_MINUTES whose reminder has
+not been sent (events.reminder_sent_at, served by a partial index) and sends
+their reminders in batches. The state of the reminders lives with the events,
+so rescheduled and deleted events need no bookkeeping.
+
+The jobs are run by a single leader, the process holding a PostgreSQL
+advisory lock. The leader is normally the dedicated `flask run-scheduler`
+process; with SCHEDULER_RUN_LEADER_IN_APP the web processes compete for the
+lock themselves. Either way, starting several of them, on one or many nodes,
+is safe: their schedulers stay paused, and they take over when the leader goes
+away. Other processes neither import this module nor start a scheduler.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from flask_mail import Message
+
+from project import db, mailer, metrics
+from project.events import subscriptions
+from project.events.caching import invalidate_events
+from project.models import Event, RevokedToken, User, user_event_association
+
+# Only processes competing for the leader lock import this module and start it
+scheduler = BackgroundScheduler(daemon=True)
+
+# Application used by the jobs, which run outside of any request
+_app = None
+
+
+def start_scheduler(app):
+    """Run the reminders in a thread of this process whenever it is the leader.
+
+    Returns the SchedulerLeader, stop() it to hand the lock over to another process.
+    """
+    configure_scheduler(app)
+    leader = SchedulerLeader(app)
+    threading.Thread(target=leader.run, name='scheduler-leader', daemon=True).start()
+    return leader
+
+
+def configure_scheduler(app):
+    """Start the scheduler of this process, paused until it becomes the leader."""
+    global _app
+    _app = app
+    if scheduler.running:
+        return
+
+    if app.config['SCHEDULER_JOBSTORE'] == 'database':
+        with app.app_context():
+            jobstore = SQLAlchemyJobStore(engine=db.engine)
+    else:
+        jobstore = MemoryJobStore()
+    scheduler.configure(
+        jobstores={'default': jobstore},
+        job_defaults={
+            'coalesce': True,
+            'misfire_grace_time': app.config['REMINDER_MISFIRE_GRACE_SECONDS'],
+        })
+    scheduler.add_listener(metrics.count_job,
+                           EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+    scheduler.start(paused=True)
+
+
+class SchedulerLeader:
+    """Runs the jobs of the scheduler while this process holds the leader lock.
+
+    The lock is a session-level PostgreSQL advisory lock held by a dedicated
+    connection. It is released by the database as soon as that connection
+    goes away, e.g. when the process dies, letting another process take over.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock_id = app.config['SCHEDULER_LOCK_ID']
+        self.interval = app.config['SCHEDULER_HEARTBEAT_SECONDS']
+        self._connection = None
+        self._stopped = threading.Event()
+
+    @property
+    def is_leader(self):
+        return self._connection is not None
+
+    def run(self):
+        """Keep competing for the lock and check that it is still held."""
+        with self.app.app_context():
+            while not self._stopped.is_set():
+                if self.is_leader:
+                    self._check_lock()
+                else:
+                    self._acquire_lock()
+                self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        with self.app.app_context():
+            self._release_lock()
+
+    def _acquire_lock(self):
+        try:
+            connection = db.engine.connect().execution_options(
+                isolation_level='AUTOCOMMIT')
+        except sa.exc.DBAPIError as e:
+            self.app.logger.warning(f'Scheduler could not connect to the database: {e}')
+            return
+        try:
+            acquired = connection.execute(sa.text('SELECT pg_try_advisory_lock(:id)'),
+                                          {'id': self.lock_id}).scalar()
+        except sa.exc.DBAPIError as e:
+            self.app.logger.warning(f'Scheduler could not request the lock: {e}')
+            connection.invalidate()
+            return
+        if not acquired:
+            connection.close()
+            return
+        self._connection = connection
+        register_jobs(self.app)
+        scheduler.resume()
+        self.app.logger.info('This process is now running the scheduled reminders.')
+
+    def _check_lock(self):
+        try:
+            self._connection.execute(sa.text('SELECT 1'))
+        except sa.exc.DBAPIError:
+            self.app.logger.warning('Lost the scheduler lock, pausing the scheduler.')
+            self._release_lock()
+
+    def _release_lock(self):
+        if self._connection is None:
+            return
+        scheduler.pause()
+        try:
+            self._connection.execute(sa.text('SELECT pg_advisory_unlock(:id)'),
+                                     {'id': self.lock_id})
+            self._connection.close()
+        except sa.exc.DBAPIError:
+            self._connection.invalidate()
+        self._connection = None
+
+
+def register_jobs(app):
+    """Add the recurring jobs of the leader to the job store."""
+    scheduler.add_job(func=sweep_reminders, trigger='interval', id='reminder-sweeper',
+                      replace_existing=True,
+                      seconds=app.config['REMINDER_SWEEP_SECONDS'],
+                      next_run_time=datetime.now())
+    scheduler.add_job(func=purge_revoked_tokens, trigger='interval',
+                      id='revoked-tokens-purge', replace_existing=True,
+                      seconds=app.config['REVOKED_TOKENS_PURGE_SECONDS'])
+    # Also registered without EVENTS_PARTICIPANT_SHARDS, to apply the shards left
+    # behind when it is turned off
+    scheduler.add_job(func=fold_participant_shards, trigger='interval',
+                      id='participant-shards-fold', replace_existing=True,
+                      seconds=app.config['EVENTS_PARTICIPANT_FOLD_SECONDS'])
+
+
+def purge_revoked_tokens():
+    # Housekeeping run by the leader as well, see project.tokens
+    with _app.app_context():
+        purged = RevokedToken.purge()
+        db.session.commit()
+        _app.logger.info(f'Purged {purged} expired revoked tokens.')
+
+
+def fold_participant_shards():
+    # Sharded participant counts, see project.events.subscriptions
+    with _app.app_context():
+        event_ids = subscriptions.fold_shards()
+        db.session.commit()
+        if event_ids:
+            invalidate_events(*event_ids)
+
+
+def due_events(now, lead, limit):
+    """Upcoming events within lead of now whose reminder is not sent yet.
+
+    The rows are locked until the end of the transaction, rows locked by
+    another sweep are skipped instead of waited for.
+    """
+    return (sa.select(Event.id, Event.title)
+            .where(Event.reminder_sent_at.is_(None),
+                   Event.event_date > now,
+                   Event.event_date <= now + lead)
+            .order_by(Event.event_date, Event.id)
+            .limit(limit)
+            .with_for_update(of=Event, skip_locked=True))
+
+
+def sweep_reminders():
+    """Send the reminders of the events starting within the reminder window.
+
+    Every batch of due events is claimed, reminded and marked as sent in one
+    transaction, so a reminder is sent once no matter how often, or in how
+    many processes, the sweep runs. If sending fails the transaction is rolled
+    back and the batch is retried by the next sweep; only a crash between
+    sending and committing can send the reminders of a batch twice. E-mails
+    count as sent once queued, the mailer retries their delivery itself.
+
+    Events that are moved have their reminder reset by update_event, deleted
+    events simply stop matching.
+    """
+    with _app.app_context():
+        lead = timedelta(minutes=_app.config['REMINDER_LEAD_MINUTES'])
+        batch_size = _app.config['REMINDER_BATCH_SIZE']
+        while True:
+            now = datetime.now()
+            try:
+                events = db.session.execute(due_events(now, lead, batch_size)).all()
+                if not events:
+                    db.session.rollback()
+                    return
+                event_ids = [event.id for event in events]
+                owners = db.session.execute(
+                    sa.select(user_event_association.c.event_id, User.email)
+                    .join(User, User.id == user_event_association.c.user_id)
+                    .where(user_event_association.c.event_id.in_(event_ids))).all()
+                emails = {}
+                for event_id, email in owners:
+                    emails.setdefault(event_id, []).append(email)
+
+                send_reminders([(event, email) for event in events
+                                for email in emails.get(event.id, ())])
+
+                db.session.execute(sa.update(Event)
+                                   .where(Event.id.in_(event_ids))
+                                   .values(reminder_sent_at=now))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                _app.logger.exception('Sending the event reminders failed.')
+                return
+            if len(events) < batch_size:
+                return
+
+
+def reminder_message(event, user_email):
+    msg = Message('Event Reminder', recipients=[user_email])
+    msg.body = f"Hello {user_email},\n\nThis is a reminder that your event '{event.title}' is scheduled in 30 minutes!\n\nBest regards,\nYour Event App"
+    return msg
+
+
+# Define a function to send reminders
+def send_reminders(reminders):
+    """Send the reminders of a batch of (event, user email) pairs.
+
+    With MAIL_SEND_REMINDERS the e-mails are handed to the mailer, which sends
+    them in the background over pooled connections, blocking while its queue
+    is full.
+    """
+    messages = []
+    for event, user_email in reminders:
+        # Print the reminder to the console
+        print(
+            f"Reminder: User: {user_email} Your event '{event.title}' is scheduled in 30 minutes!")
+        messages.append(reminder_message(event, user_email))
+
+    if _app.config['MAIL_SEND_REMINDERS']:
+        mailer.send_many(messages)
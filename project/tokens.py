@@ -0,0 +1,113 @@
+"""
+Access and refresh tokens.
+
+/login returns a short-lived access token, accepted by token_required, and a
+refresh token. POST /refresh exchanges a refresh token for a new pair with a
+signature check and one insert, without checking the password again. Both
+lifetimes are in minutes: ACCESS_TOKEN_EXPIRES_IN and REFRESH_TOKEN_EXPIRES_IN.
+
+Refresh tokens rotate: each one can be used once. Its id (jti) is recorded in
+the revoked_tokens table when it is used, and presenting it again revokes the
+whole family of tokens descending from the same login, since one of them has
+leaked. /logout revokes the family as well. Rows are kept until the token they
+revoke expires, then purged by the scheduler leader.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+from sqlalchemy.dialects.postgresql import insert
+
+from config import settings
+from project import db
+from project.models import RevokedToken, User
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def _lifetime(minutes):
+    return timedelta(minutes=int(minutes))
+
+
+def _encode(claims):
+    return jwt.encode(claims, settings.JWT_HS256_SECRET_KEY, settings.JWT_ALGORITHM)
+
+
+def issue_tokens(user_id, family=None):
+    """Return a new access token and refresh token for a user.
+
+    family identifies the login the refresh token descends from, a new login
+    starts a new family.
+    """
+    now = datetime.utcnow()
+    access_token = _encode({
+        'public_id': user_id,
+        'type': ACCESS,
+        'exp': now + _lifetime(settings.ACCESS_TOKEN_EXPIRES_IN),
+    })
+    refresh_token = _encode({
+        'public_id': user_id,
+        'type': REFRESH,
+        'jti': uuid.uuid4().hex,
+        'fam': (family or uuid.uuid4()).hex,
+        'exp': now + _lifetime(settings.REFRESH_TOKEN_EXPIRES_IN),
+    })
+    return {'token': access_token, 'refresh_token': refresh_token}
+
+
+def decode_token(token, token_type=ACCESS):
+    """Check the signature, expiry and type of a token and return its claims.
+
+    Raises jwt.InvalidTokenError. Tokens without a type were issued before
+    refresh tokens existed and are access tokens.
+    """
+    claims = jwt.decode(token, settings.JWT_HS256_SECRET_KEY,
+                        algorithms=[settings.JWT_ALGORITHM],
+                        options={'require': ['exp']})
+    if claims.get('type', ACCESS) != token_type:
+        raise jwt.InvalidTokenError(f'wrong token type, expected {token_type}')
+    return claims
+
+
+def rotate_refresh_token(refresh_token):
+    """Exchange a refresh token for a new pair of tokens of the same family."""
+    claims = decode_token(refresh_token, REFRESH)
+    jti, family = uuid.UUID(claims['jti']), uuid.UUID(claims['fam'])
+    if db.session.get(RevokedToken, family) is not None:
+        raise jwt.InvalidTokenError('refresh token was revoked')
+
+    # The insert only succeeds for the first use of the token, even when two
+    # requests race with it
+    used = db.session.execute(
+        insert(RevokedToken)
+        .values(jti=jti, expires_at=datetime.utcfromtimestamp(claims['exp']))
+        .on_conflict_do_nothing()
+        .returning(RevokedToken.jti)).first()
+    if used is None:
+        _revoke_family(family)
+        db.session.commit()
+        raise jwt.InvalidTokenError('refresh token was already used')
+
+    if db.session.get(User, claims['public_id']) is None:
+        db.session.rollback()
+        raise jwt.InvalidTokenError('user does not exist')
+    tokens = issue_tokens(claims['public_id'], family)
+    db.session.commit()
+    return tokens
+
+
+def revoke_refresh_token(refresh_token):
+    """Revoke the family of a refresh token, ending the session it belongs to."""
+    claims = decode_token(refresh_token, REFRESH)
+    _revoke_family(uuid.UUID(claims['fam']))
+    db.session.commit()
+
+
+def _revoke_family(family):
+    # No token of the family expires later than one refresh lifetime from now
+    expires_at = datetime.utcnow() + _lifetime(settings.REFRESH_TOKEN_EXPIRES_IN)
+    db.session.execute(insert(RevokedToken)
+                       .values(jti=family, expires_at=expires_at)
+                       .on_conflict_do_update(index_elements=[RevokedToken.jti],
+                                              set_={'expires_at': expires_at}))
@@ -1,4 +1,3 @@
-from datetime import datetime, timedelta
 import os
 import jwt
 
@@ -6,15 +5,18 @@ import sqlalchemy as sa
 from flask import (current_app, render_template, request,
                    url_for, make_response, jsonify)
 from sqlalchemy.exc import IntegrityError
-from config import settings
 
 from project import db
+from project.hashing import HashingBusy
 from project.models import User
+from project.queries import query_budget
+from project.tokens import issue_tokens, revoke_refresh_token, rotate_refresh_token
 
 from . import users_blueprint
 
 
 @users_blueprint.route('/register', methods=['POST'])
+@query_budget(1)
 def register():
     if request.method == 'POST':
         try:
@@ -26,10 +28,13 @@ def register():
         except IntegrityError:
             db.session.rollback()
             return jsonify({'message': f'ERROR! Email ({new_user.email}) already exists in the database.'})
+        except HashingBusy as e:
+            return jsonify({'message': str(e)}), 503
     return make_response("error", 504, {'Authentication': 'register failed"'})
 
 
 @users_blueprint.route('/login', methods=['POST'])
+@query_budget(2)
 def login():
     if request.method == 'POST':
         auth = request.authorization
@@ -37,10 +42,42 @@ def login():
             return make_response('could not verify', 401, {'Authentication': 'login required"'})
         email = auth.username
         user = User.query.filter_by(email=email).first()
-        if user and user.is_password_correct(auth.password):
-            token = jwt.encode({'public_id': user.id, 'exp': datetime.utcnow(
-            ) + timedelta(minutes=45)}, settings.JWT_HS256_SECRET_KEY, "HS256")
-
-            return jsonify({'token': token})
+        try:
+            password_correct = user is not None and user.is_password_correct(auth.password)
+            if password_correct and user.needs_rehash():
+                # The hash parameters changed since the password was stored
+                user.set_password(auth.password)
+                db.session.commit()
+        except HashingBusy as e:
+            return jsonify({'message': str(e)}), 503
+        if password_correct:
+            return jsonify(issue_tokens(user.id))
 
     return make_response('could not verify',  401, {'Authentication': '"login required"'})
+
+
+# Endpoint to renew the tokens of a session without the password
+@users_blueprint.route('/refresh', methods=['POST'])
+@query_budget(3)
+def refresh():
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not refresh_token:
+        return make_response('could not verify', 401, {'Authentication': '"refresh token required"'})
+    try:
+        return jsonify(rotate_refresh_token(refresh_token))
+    except jwt.InvalidTokenError as e:
+        return jsonify({'message': f'refresh token is invalid, error: {str(e)}'}), 401
+
+
+# Endpoint to end a session, its refresh tokens can no longer be used
+@users_blueprint.route('/logout', methods=['POST'])
+@query_budget(1)
+def logout():
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not refresh_token:
+        return make_response('could not verify', 401, {'Authentication': '"refresh token required"'})
+    try:
+        revoke_refresh_token(refresh_token)
+    except jwt.InvalidTokenError as e:
+        return jsonify({'message': f'refresh token is invalid, error: {str(e)}'}), 401
+    return jsonify({'message': 'logged out successfully'})
@@ -0,0 +1,112 @@
+"""
+Updates and deletes of an event racing with a subscription to it.
+
+The owner check of the view commits a subscription on a connection of its own,
+after the view loaded the event and before it writes its changes. An update
+then no longer matches the version of the event and answers 409 instead of
+overwriting the participants; a delete still deletes the event.
+"""
+import itertools
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from project import create_app, db, principal_cache, query_counter
+from project.events import routes
+from project.events.subscriptions import subscription_statement
+from project.models import Event, User, event_subscriptions
+from project.tokens import issue_tokens
+
+_titles = itertools.count()
+
+
+@pytest.fixture(scope='module')
+def app():
+    os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(principal_cache, 'ttl', 0)
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture(scope='module')
+def owner(app):
+    user = User('conflict-owner@example.com', 'Conflict1234!')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture(scope='module')
+def subscriber(app):
+    user = User('conflict-subscriber@example.com', 'Conflict1234!')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def event_id(owner):
+    event = Event(f'Conflict event {next(_titles)}', 'Jazz concert by the lake', 'Lake stage', 'Lakeside',
+                  datetime.now() + timedelta(days=7), ['jazz'])
+    owner.events.append(event)
+    db.session.commit()
+    return event.id
+
+
+@pytest.fixture
+def racing_subscription(monkeypatch, subscriber):
+    is_event_owner = routes._is_event_owner
+
+    def subscribe_then_check_owner(user, event_id):
+        with db.engine.begin() as connection:
+            connection.execute(subscription_statement(subscriber, event_id, 1))
+        return is_event_owner(user, event_id)
+
+    monkeypatch.setattr(routes, '_is_event_owner', subscribe_then_check_owner)
+    # The subscription is counted as a statement of the view, see test_query_budgets
+    monkeypatch.setattr(query_counter, 'enforced', False)
+
+
+def _headers(user):
+    return {'x-access-tokens': issue_tokens(user.id)['token']}
+
+
+def _subscriptions(event_id):
+    return db.session.execute(db.select(event_subscriptions.c.user_id).where(
+        event_subscriptions.c.event_id == event_id)).scalars().all()
+
+
+def test_update_racing_with_a_subscription(client, owner, subscriber, event_id,
+                                           racing_subscription):
+    response = client.put(f'/events/{event_id}', json={
+        'venue': 'Boat house',
+        'event_date': (datetime.now() + timedelta(days=8)).strftime('%Y-%m-%d %H:%M:%S')},
+        headers=_headers(owner))
+    assert response.status_code == 409
+
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    # The owner, and the subscriber of the racing subscription
+    assert (event.venue, event.participants) == ('Lake stage', 2)
+    assert _subscriptions(event_id) == [subscriber]
+
+
+def test_delete_racing_with_a_subscription(client, owner, event_id, racing_subscription):
+    response = client.delete(f'/events/{event_id}', headers=_headers(owner))
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(Event, event_id) is None
+    assert _subscriptions(event_id) == []
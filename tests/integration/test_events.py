@@ -61,7 +61,8 @@ def test_get_events_with_location(client, init_database):
                 'tags': ['test', 'event'],
                 'participants': 0
             }
-        ]
+        ],
+        'next_cursor': None
     }
     assert json.loads(response.data) == expected_response
 
@@ -123,7 +124,8 @@ def test_get_events_with_venue(client, init_database):
                 'tags': ['test', 'event'],
                 'participants': 0
             }
-        ]
+        ],
+        'next_cursor': None
     }
     assert json.loads(response.data) == expected_response
 
@@ -198,7 +200,8 @@ def test_get_events_with_sort_by(client, init_database):
                 'tags': ['test', 'event'],
                 'participants': 0
             }
-        ]
+        ],
+        'next_cursor': None
     }
     assert json.loads(response.data) == expected_response
 
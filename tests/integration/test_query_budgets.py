@@ -0,0 +1,181 @@
+"""
+Every view of the users and events blueprints, run against the database with
+TestingConfig: QUERY_BUDGETS_ENFORCED fails the request, and so the test,
+when a view executes more SQL statements than its query_budget.
+
+The principal cache is disabled, so authenticated views load their user as
+in the worst case their budget is declared for.
+"""
+import itertools
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from project import create_app, db, principal_cache
+from project.models import Event, User
+from project.queries import HEADER
+from project.tokens import issue_tokens
+
+PASSWORD = 'Budget1234!'
+_titles = itertools.count()
+
+
+@pytest.fixture(scope='module')
+def app():
+    os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(principal_cache, 'ttl', 0)
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture(scope='module')
+def owner(app):
+    return _create_user('owner@example.com')
+
+
+@pytest.fixture(scope='module')
+def subscriber(app):
+    return _create_user('subscriber@example.com')
+
+
+@pytest.fixture
+def event_id(owner):
+    event = Event(f'Budget event {next(_titles)}', 'Jazz concert by the lake', 'Lake stage',
+                  'Lakeside', datetime.now() + timedelta(days=7), ['jazz', 'outdoor'])
+    owner.events.append(event)
+    db.session.commit()
+    return event.id
+
+
+def _create_user(email):
+    user = User(email, PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _event_json():
+    return {'title': f'Budget event {next(_titles)}', 'description': 'Folk festival',
+            'venue': 'Main square', 'location': 'Old town', 'tags': ['folk'],
+            'event_date': (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def _headers(user):
+    return {'x-access-tokens': issue_tokens(user.id)['token']}
+
+
+def request_within_budget(client, method, path, **kwargs):
+    """Send a request and check the statements it executed against its budget."""
+    response = client.open(path, method=method, **kwargs)
+    endpoint, _ = client.application.url_map.bind('localhost').match(path, method)
+    budget = client.application.view_functions[endpoint].query_budget
+    assert int(response.headers[HEADER]) <= budget
+    return response
+
+
+def test_register(client):
+    response = request_within_budget(client, 'POST', '/register', json={
+        'email': 'new-user@example.com', 'password': PASSWORD})
+    assert response.get_json() == {'message': 'registered successfully'}
+
+
+def test_login(client, owner):
+    response = request_within_budget(client, 'POST', '/login', auth=(owner.email, PASSWORD))
+    assert response.status_code == 200
+
+
+def test_refresh_and_logout(client, owner):
+    refresh_token = issue_tokens(owner.id)['refresh_token']
+    response = request_within_budget(client, 'POST', '/refresh',
+                                     json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+
+    response = request_within_budget(client, 'POST', '/logout',
+                                     json={'refresh_token': response.get_json()['refresh_token']})
+    assert response.status_code == 200
+
+
+def test_schedule_event(client, owner):
+    response = request_within_budget(client, 'POST', '/events', json=_event_json(),
+                                     headers=_headers(owner))
+    assert response.status_code == 201
+
+
+def test_schedule_events(client, owner):
+    response = request_within_budget(client, 'POST', '/events/batch',
+                                     json=[_event_json() for _ in range(5)],
+                                     headers=_headers(owner))
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('query_string', [
+    {}, {'location': 'Lakeside', 'sort_by': 'date'}, {'sort_by': 'popularity', 'upcoming': 1},
+    {'tags': 'jazz,folk', 'tags_match': 'any'}, {'fields': 'title,event_date'}])
+def test_get_events(client, event_id, query_string):
+    response = request_within_budget(client, 'GET', '/events', query_string=query_string)
+    assert response.status_code == 200
+
+
+def test_get_events_next_page(client, event_id):
+    response = request_within_budget(client, 'GET', '/events', query_string={'limit': 1})
+    response = request_within_budget(client, 'GET', '/events', query_string={
+        'limit': 1, 'cursor': response.get_json()['next_cursor']})
+    assert response.status_code == 200
+
+
+def test_search_events(client, event_id):
+    response = request_within_budget(client, 'GET', '/events/search',
+                                     query_string={'q': 'jazz'})
+    assert response.status_code == 200
+
+
+def test_get_tags(client, event_id):
+    response = request_within_budget(client, 'GET', '/tags')
+    assert response.status_code == 200
+
+
+def test_get_event_details(client, event_id):
+    response = request_within_budget(client, 'GET', f'/events/{event_id}')
+    assert response.status_code == 200
+
+
+def test_update_event(client, owner, event_id):
+    response = request_within_budget(client, 'PUT', f'/events/{event_id}', json={
+        'venue': 'Boat house', 'tags': ['jazz'],
+        'event_date': (datetime.now() + timedelta(days=8)).strftime('%Y-%m-%d %H:%M:%S')},
+        headers=_headers(owner))
+    assert response.status_code == 200
+
+
+def test_subscribe_and_unsubscribe(client, subscriber, event_id):
+    response = request_within_budget(client, 'POST', f'/events/{event_id}/subscribe',
+                                     headers=_headers(subscriber))
+    assert response.status_code == 201
+
+    response = request_within_budget(client, 'POST', f'/events/{event_id}/unsubscribe',
+                                     headers=_headers(subscriber))
+    assert response.status_code == 200
+
+
+def test_subscribe_to_missing_event(client, subscriber):
+    response = request_within_budget(client, 'POST', '/events/999999/subscribe',
+                                     headers=_headers(subscriber))
+    assert response.status_code == 404
+
+
+def test_delete_event(client, owner, event_id):
+    response = request_within_budget(client, 'DELETE', f'/events/{event_id}',
+                                     headers=_headers(owner))
+    assert response.status_code == 200
@@ -0,0 +1,123 @@
+import asyncio
+import inspect
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from project import async_db, cache
+from project.async_db import AsyncDatabase, async_database_uri
+from project.cache import LRUCache
+from project.events import events_blueprint
+from project.events.async_routes import ASYNC_VIEWS, register_async_views
+from project.events.caching import detail_cache_key
+from project.models import TagCount
+
+
+def test_async_engine_uses_asyncpg_on_the_same_database():
+    assert (async_database_uri('postgresql://user:secret@db:5432/events')
+            == 'postgresql+asyncpg://user:secret@db:5432/events')
+    assert (async_database_uri('postgresql+psycopg2://user:secret@db:5432/')
+            == 'postgresql+asyncpg://user:secret@db:5432/')
+
+
+def test_async_engine_is_only_created_for_async_views():
+    app = Flask(__name__)
+    assert AsyncDatabase(app).engine is None
+
+
+@pytest.mark.parametrize('pooled', [False, True])
+def test_async_engine_only_pools_connections_in_the_loop_of_a_server(pooled):
+    pytest.importorskip('aiosqlite')
+    app = Flask(__name__)
+    app.config.update(ASYNC_VIEWS=True, ASYNC_ENGINE_POOLED=pooled,
+                      ASYNC_DATABASE_URI='sqlite+aiosqlite:///events.sqlite',
+                      SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 7, 'pool_pre_ping': True})
+    engine = AsyncDatabase(app).engine
+    assert isinstance(engine.pool, sa.pool.NullPool) != pooled
+    if pooled:
+        assert engine.pool.size() == 7
+
+
+def test_async_views_replace_the_views_of_their_endpoints():
+    app = Flask(__name__)
+    app.register_blueprint(events_blueprint)
+    sync_views = dict(app.view_functions)
+    rules = sorted(rule.rule for rule in app.url_map.iter_rules())
+
+    register_async_views(app)
+
+    assert sorted(rule.rule for rule in app.url_map.iter_rules()) == rules
+    for endpoint in ASYNC_VIEWS:
+        view = app.view_functions[endpoint]
+        assert inspect.iscoroutinefunction(view)
+        assert view.query_budget == sync_views[endpoint].query_budget
+
+
+@pytest.fixture
+def async_app(tmp_path):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('asgiref')
+    # A local SQLite database stands in for PostgreSQL
+    path = tmp_path / 'events.sqlite'
+    engine = sa.create_engine(f'sqlite:///{path}')
+    TagCount.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(TagCount.__table__.insert(), [
+            {'tag': 'jazz', 'count': 3}, {'tag': 'rock', 'count': 5},
+            {'tag': 'folk', 'count': 0}])
+    engine.dispose()
+
+    app = Flask(__name__)
+    app.config.update(ASYNC_VIEWS=True, ASYNC_DATABASE_URI=f'sqlite+aiosqlite:///{path}',
+                      ASYNC_ENGINE_OPTIONS={}, EVENTS_PAGE_SIZE=50, EVENTS_MAX_PAGE_SIZE=200)
+    async_db.init_app(app)
+    app.register_blueprint(events_blueprint)
+    register_async_views(app)
+    yield app
+    async_db.engine = None
+
+
+def test_async_view_reads_with_the_async_engine(async_app):
+    response = async_app.test_client().get('/tags')
+    assert response.status_code == 200
+    assert response.get_json() == {'tags': [{'tag': 'rock', 'count': 5},
+                                            {'tag': 'jazz', 'count': 3}]}
+
+
+class SharedStore(LRUCache):
+    """A store shared between processes, e.g. redis, recording where it is called."""
+
+    shared = True
+
+    def __init__(self):
+        super().__init__()
+        self.calls_in_event_loop = []
+
+    def get(self, key):
+        self.calls_in_event_loop.append(_in_event_loop())
+        return super().get(key)
+
+    def get_counter(self, key):
+        self.calls_in_event_loop.append(_in_event_loop())
+        return super().get_counter(key)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def test_async_view_uses_a_shared_cache_off_the_event_loop(async_app, monkeypatch):
+    store = SharedStore()
+    monkeypatch.setattr(cache, 'backend', store)
+    with async_app.test_request_context('/events/1'):
+        cache.set(detail_cache_key(1), ('event-1-3', b'{"id": 1}'), 60)
+    store.calls_in_event_loop.clear()
+
+    response = async_app.test_client().get('/events/1')
+    assert response.get_json() == {'id': 1}
+    assert store.calls_in_event_loop == [False, False]
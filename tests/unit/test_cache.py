@@ -0,0 +1,176 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from unittest.mock import patch
+from flask import Flask
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from project import cache
+from project.cache import LRUCache, NullCache, create_backend
+from project.events.caching import (cache_response, cached_response,
+                                    detail_cache_key, detail_etag,
+                                    invalidate_events, list_cache_key, list_etag)
+from project.models import TableVersion
+
+
+def test_lru_cache_get_and_set():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', b'1', ttl=60)
+    assert lru.get('a') == b'1'
+    assert lru.get('missing') is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', b'1', ttl=60)
+    lru.set('b', b'2', ttl=60)
+    lru.get('a')
+    lru.set('c', b'3', ttl=60)
+    assert lru.get('b') is None
+    assert lru.get('a') == b'1'
+    assert lru.get('c') == b'3'
+    assert len(lru) == 2
+
+
+def test_lru_cache_entries_expire():
+    lru = LRUCache()
+    with patch('project.cache.time.monotonic', return_value=100.0):
+        lru.set('a', b'1', ttl=10)
+    with patch('project.cache.time.monotonic', return_value=109.0):
+        assert lru.get('a') == b'1'
+    with patch('project.cache.time.monotonic', return_value=110.0):
+        assert lru.get('a') is None
+
+
+def test_lru_cache_counters_survive_eviction():
+    lru = LRUCache(max_entries=1)
+    assert lru.incr('generation') == 1
+    lru.set('a', b'1', ttl=60)
+    lru.set('b', b'2', ttl=60)
+    assert lru.get_counter('generation') == 1
+
+
+def test_create_backend():
+    assert isinstance(create_backend('memory'), LRUCache)
+    assert isinstance(create_backend('none'), NullCache)
+    with pytest.raises(ValueError, match="Unsupported CACHE_BACKEND: memcached://x"):
+        create_backend('memcached://x')
+
+
+@pytest.mark.parametrize('single_process, backend', [(True, LRUCache), (False, NullCache)])
+def test_memory_backend_only_in_a_single_process(single_process, backend):
+    app = Flask(__name__)
+    app.config['CACHE_BACKEND'] = 'memory'
+    app.config['SINGLE_PROCESS'] = single_process
+    cache.init_app(app)
+    assert isinstance(cache.backend, backend)
+
+
+def test_event_cache_keys_change_after_invalidation():
+    app = Flask(__name__)
+    app.config['CACHE_BACKEND'] = 'memory'
+    cache.init_app(app)
+    with app.test_request_context('/events?sort_by=date&limit=10'):
+        list_key, detail_key, other_key = (
+            list_cache_key(), detail_cache_key(1), detail_cache_key(2))
+        invalidate_events(1)
+        assert list_cache_key() != list_key
+        assert detail_cache_key(1) != detail_key
+        assert detail_cache_key(2) == other_key
+
+
+def test_event_list_cache_key_ignores_argument_order():
+    app = Flask(__name__)
+    app.config['CACHE_BACKEND'] = 'memory'
+    cache.init_app(app)
+    with app.test_request_context('/events?sort_by=date&limit=10'):
+        first = list_cache_key()
+    with app.test_request_context('/events?limit=10&sort_by=date'):
+        assert list_cache_key() == first
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['CACHE_BACKEND'] = 'memory'
+    app.config['EVENT_CACHE_TTL'] = 60
+    cache.init_app(app)
+    return app
+
+
+def test_cached_response_carries_etag():
+    app = make_app()
+    with app.test_request_context('/events/1'):
+        cache_response('key', detail_etag(1, 3), app.response_class(b'{"id": 1}'))
+        response = cached_response('key')
+        assert response.status_code == 200
+        assert response.get_data() == b'{"id": 1}'
+        assert response.headers['ETag'] == '"event-1-3"'
+
+
+def test_cached_response_is_not_modified_for_matching_etag():
+    app = make_app()
+    with app.test_request_context('/events/1'):
+        cache_response('key', detail_etag(1, 3), app.response_class(b'{"id": 1}'))
+    with app.test_request_context('/events/1', headers={'If-None-Match': '"event-1-3"'}):
+        response = cached_response('key')
+        assert response.status_code == 304
+        assert response.get_data() == b''
+
+
+def test_list_etag_depends_on_table_version_and_arguments():
+    app = make_app()
+    with app.test_request_context('/events?sort_by=date'):
+        etag = list_etag(7)
+        assert list_etag(8) != etag
+    with app.test_request_context('/events?sort_by=popularity'):
+        assert list_etag(7) != etag
+
+
+def test_upcoming_listings_are_cached_per_minute():
+    app = make_app()
+    with app.test_request_context('/events?upcoming=1'):
+        key = list_cache_key(datetime(2026, 10, 18, 12, 0))
+        etag = list_etag(7, datetime(2026, 10, 18, 12, 0))
+        assert list_cache_key(datetime(2026, 10, 18, 12, 0)) == key
+        assert list_cache_key(datetime(2026, 10, 18, 12, 1)) != key
+        assert list_etag(7, datetime(2026, 10, 18, 12, 1)) != etag
+
+
+def test_table_version_is_bumped_once_the_transaction_commits(monkeypatch):
+    bumped = []
+    monkeypatch.setattr(TableVersion, '_bump',
+                        classmethod(lambda cls, bind, names: bumped.append(names)))
+    with Session(sa.create_engine('sqlite://')) as session:
+        session.execute(sa.text('SELECT 1'))
+        TableVersion.bump_after_commit('events', session)
+        TableVersion.bump_after_commit('events', session)
+        assert bumped == []
+        session.commit()
+        assert bumped == [{'events'}]
+
+
+def test_table_version_is_not_bumped_by_a_rolled_back_transaction(monkeypatch):
+    bumped = []
+    monkeypatch.setattr(TableVersion, '_bump',
+                        classmethod(lambda cls, bind, names: bumped.append(names)))
+    with Session(sa.create_engine('sqlite://')) as session:
+        session.execute(sa.text('SELECT 1'))
+        TableVersion.bump_after_commit('events', session)
+        session.rollback()
+        session.execute(sa.text('SELECT 1'))
+        session.commit()
+    assert bumped == []
+
+
+def test_table_version_is_bumped_after_the_session_released_its_connection(monkeypatch, tmp_path):
+    engine = sa.create_engine(f'sqlite:///{tmp_path / "versions.db"}', poolclass=QueuePool)
+    checked_out = []
+    monkeypatch.setattr(TableVersion, '_bump', classmethod(
+        lambda cls, bind, names: checked_out.append(bind.pool.checkedout())))
+    with Session(engine) as session:
+        session.execute(sa.text('SELECT 1'))
+        TableVersion.bump_after_commit('events', session)
+        session.commit()
+    assert checked_out == [0]
@@ -0,0 +1,47 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from project.events.routes import _get_date_range
+
+NOW = datetime(2026, 10, 18, 12, 34, 56)
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def date_range(app, query_string):
+    with app.test_request_context('/events', query_string=query_string):
+        with patch('project.events.routes.datetime') as mock_datetime:
+            mock_datetime.now.return_value = NOW
+            mock_datetime.strptime = datetime.strptime
+            return _get_date_range()
+
+
+def test_window_accepts_dates_and_times(app):
+    assert date_range(app, {'from': '2026-10-01', 'to': '2026-10-02 18:00:00'}) == (
+        datetime(2026, 10, 1), datetime(2026, 10, 2, 18, 0))
+    assert date_range(app, {}) == (None, None)
+
+
+def test_upcoming_starts_at_the_current_minute(app):
+    assert date_range(app, {'upcoming': '1'}) == (datetime(2026, 10, 18, 12, 34), None)
+    assert date_range(app, {'upcoming': 'true', 'from': '2026-10-01'}) == (
+        datetime(2026, 10, 18, 12, 34), None)
+    assert date_range(app, {'upcoming': '1', 'from': '2026-11-01'}) == (
+        datetime(2026, 11, 1), None)
+
+
+@pytest.mark.parametrize('query_string', [
+    {'from': 'tomorrow'},
+    {'to': '2026-13-01'},
+    {'from': '2026-10-02', 'to': '2026-10-01'},
+    {'upcoming': '1', 'to': '2026-10-01'},
+])
+def test_invalid_windows_are_rejected(app, query_string):
+    with pytest.raises(ValueError):
+        date_range(app, query_string)
@@ -0,0 +1,40 @@
+import pytest
+from flask import Flask
+
+from project import db
+from project.events.routes import _is_event_owner
+from project.models import User, user_event_association
+
+
+@pytest.fixture
+def app():
+    # Only the users and association tables are needed, both are portable
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        User.__table__.create(db.engine)
+        user_event_association.create(db.engine)
+        yield app
+
+
+def test_is_event_owner(app):
+    owner = User('owner@example.com', 'Abcd1234!')
+    other = User('other@example.com', 'Abcd1234!')
+    db.session.add_all([owner, other])
+    db.session.commit()
+    db.session.execute(user_event_association.insert().values(
+        user_id=owner.id, event_id=42))
+
+    assert _is_event_owner(owner, 42)
+    assert not _is_event_owner(owner, 43)
+    assert not _is_event_owner(other, 42)
+
+
+def test_is_event_owner_does_not_load_user_events(app):
+    owner = User('owner@example.com', 'Abcd1234!')
+    db.session.add(owner)
+    db.session.commit()
+
+    _is_event_owner(owner, 42)
+    assert 'events' not in owner.__dict__
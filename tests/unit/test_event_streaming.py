@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+from project.events import routes
+from project.events.routes import _stream_events
+from project.json_provider import JSONProvider
+
+
+class FakeStatement:
+    def __init__(self):
+        self.options = None
+
+    def execution_options(self, **options):
+        self.options = options
+        return self
+
+
+def make_rows():
+    # The columns of event_columns(): id, title, description, venue, location,
+    # event_date, tags, participants
+    return [(event_id, f'Event {event_id} Title', 'Valid Description', 'Valid Venue',
+             'Valid Location', datetime(2099, 1, event_id, 12, 0, 0), ['tag'], 3)
+            for event_id in (1, 2)]
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    def stream(rows, ndjson, fields=None):
+        statement = FakeStatement()
+        session = SimpleNamespace(execute=lambda statement: iter(rows))
+        monkeypatch.setattr(routes, 'db', SimpleNamespace(session=session))
+        app = Flask(__name__)
+        app.json = JSONProvider(app)
+        app.config['EVENTS_STREAM_BATCH_SIZE'] = 10
+        with app.test_request_context('/events'):
+            response = _stream_events(statement, ndjson, fields)
+            return response, response.get_data(), statement
+    return stream
+
+
+def test_stream_events_as_json_document(stream):
+    response, body, statement = stream(make_rows(), ndjson=False)
+
+    assert response.mimetype == 'application/json'
+    assert statement.options == {'yield_per': 10}
+    events = json.loads(body)['events']
+    assert [event['id'] for event in events] == [1, 2]
+    assert events[0]['event_date'] == '2099-01-01 12:00:00'
+    assert events[0]['participants'] == 3
+
+
+def test_stream_events_as_ndjson(stream):
+    response, body, _ = stream(make_rows(), ndjson=True)
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = body.decode().splitlines()
+    assert [json.loads(line)['title'] for line in lines] == [
+        'Event 1 Title', 'Event 2 Title']
+
+
+def test_stream_events_with_fields(stream):
+    rows = [(1, 'Event 1 Title', datetime(2099, 1, 1, 12, 0, 0))]
+    _, body, _ = stream(rows, ndjson=True, fields=('id', 'title'))
+    assert json.loads(body) == {'id': 1, 'title': 'Event 1 Title'}
+
+
+def test_stream_events_with_no_results(stream):
+    _, body, _ = stream([], ndjson=False)
+    assert json.loads(body) == {'events': []}
@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from project import json_provider
+from project.json_provider import JSONProvider
+
+DOCUMENT = {'b': [1, 2.5, None, True], 'a': {'z': 'é', 'y': Decimal('1.5')}}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def app(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip('orjson is not installed')
+    app = Flask(__name__)
+    app.json = JSONProvider(app)
+    return app
+
+
+def test_datetimes_use_the_api_format(app):
+    with app.app_context():
+        body = jsonify({'at': datetime(2099, 1, 2, 3, 4, 5, 678), 'on': date(2099, 1, 2)})
+        assert body.get_json() == {'at': '2099-01-02 03:04:05', 'on': '2099-01-02'}
+        assert app.json.dumps(datetime(2099, 1, 2)) == '"2099-01-02 00:00:00"'
+
+
+def test_documents_match_the_default_provider(app):
+    default = Flask(__name__)
+    with default.app_context():
+        expected = jsonify(DOCUMENT)
+    with app.app_context():
+        response = jsonify(DOCUMENT)
+    assert response.get_json() == expected.get_json()
+    # Keys stay sorted and the separators compact, only non-ASCII characters may
+    # be written as UTF-8 instead of escapes
+    assert response.get_data(as_text=True).startswith('{"a":{"y":"1.5","z":')
+    assert app.json.loads(app.json.dumps(DOCUMENT)) == expected.get_json()
@@ -0,0 +1,89 @@
+import queue
+import smtplib
+import sys
+
+import pytest
+from flask import Flask
+from flask_mail import Mail, Message
+
+from project.mailer import Mailer
+
+
+class FakeConnection:
+    """Stands in for flask_mail.Connection, failing the first `failures` sends."""
+    opened = []
+    failures = 0
+
+    def __init__(self, mail):
+        self.sent = []
+        FakeConnection.opened.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def send(self, message):
+        if FakeConnection.failures:
+            FakeConnection.failures -= 1
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.sent.append(message)
+
+
+@pytest.fixture
+def mailer(monkeypatch):
+    # project.mailer is also the name of the application's Mailer instance
+    monkeypatch.setattr(sys.modules['project.mailer'], 'Connection', FakeConnection)
+    FakeConnection.opened = []
+    FakeConnection.failures = 0
+    app = Flask(__name__)
+    app.config.update(MAIL_DEFAULT_SENDER='events@example.com', MAIL_WORKERS=1,
+                      MAIL_BATCH_SIZE=100, MAIL_RETRY_BACKOFF=0, MAIL_QUEUE_SIZE=10)
+    Mail(app)
+    mailer = Mailer(app)
+    with app.app_context():
+        yield mailer
+    mailer.stop()
+
+
+def make_messages(number):
+    return [Message('Event Reminder', recipients=[f'user{n}@example.com'])
+            for n in range(number)]
+
+
+def test_messages_share_a_connection(mailer):
+    mailer.send_many(make_messages(5))
+    mailer.join()
+
+    assert len(FakeConnection.opened) == 1
+    assert len(FakeConnection.opened[0].sent) == 5
+    assert mailer.stats()['sent'] == 5
+
+
+def test_failed_sends_are_retried_over_a_new_connection(mailer):
+    FakeConnection.failures = 2
+    mailer.send_many(make_messages(1))
+    mailer.join()
+
+    stats = mailer.stats()
+    assert len(FakeConnection.opened) == 3
+    assert (stats['sent'], stats['retried'], stats['failed']) == (1, 2, 0)
+
+
+def test_messages_are_dropped_after_the_last_retry(mailer):
+    FakeConnection.failures = 10
+    mailer.send_many(make_messages(1))
+    mailer.join()
+
+    assert mailer.stats()['failed'] == 1
+    assert mailer.stats()['retried'] == 3
+
+
+def test_queue_is_bounded(mailer):
+    mailer.stop()
+    mailer._start = lambda: None
+    for message in make_messages(10):
+        mailer.send(message, block=False)
+    with pytest.raises(queue.Full):
+        mailer.send(make_messages(1)[0], block=False)
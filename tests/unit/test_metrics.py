@@ -0,0 +1,115 @@
+import os
+
+import sqlalchemy as sa
+from flask import Flask
+
+from project.metrics import Histogram, Metrics, mark_process_dead, read_multiprocess_dir
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(METRICS_ENABLED=True, METRICS_MAX_SERIES=10, **config)
+    metrics = Metrics(app)
+    engine = sa.create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+
+    @app.route('/things')
+    def list_things():
+        with engine.connect() as connection:
+            connection.execute(sa.text('SELECT 1'))
+            connection.execute(sa.text('SELECT 2'))
+        return 'things'
+
+    return app, metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency.', ('endpoint',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, endpoint='a')
+
+    assert histogram.render() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{endpoint="a",le="0.1"} 1',
+        'latency_seconds_bucket{endpoint="a",le="1"} 3',
+        'latency_seconds_bucket{endpoint="a",le="+Inf"} 4',
+        'latency_seconds_sum{endpoint="a"} 6.25',
+        'latency_seconds_count{endpoint="a"} 4',
+    ]
+
+
+def test_series_are_bounded():
+    histogram = Histogram('latency_seconds', 'Latency.', ('endpoint',), max_series=2)
+    for endpoint in ('a', 'b', 'c', 'd"\n'):
+        histogram.observe(1, endpoint=endpoint)
+
+    rendered = '\n'.join(histogram.render())
+    assert 'endpoint="_other"' in rendered
+    assert 'endpoint="c"' not in rendered
+    assert len(histogram._series) == 3
+
+
+def test_requests_and_their_statements_are_measured():
+    app, metrics = make_app()
+    client = app.test_client()
+    assert client.get('/things').status_code == 200
+    assert client.get('/missing').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert ('http_request_duration_seconds_count'
+            '{endpoint="list_things",method="GET",status="200"} 1') in body
+    assert ('http_request_duration_seconds_count'
+            '{endpoint="unmatched",method="GET",status="404"} 1') in body
+    assert 'db_statements_per_request_sum{endpoint="list_things"} 2' in body
+    assert 'db_statement_duration_seconds_count{endpoint="list_things"} 2' in body
+    assert 'http_requests_in_flight{endpoint="list_things"} 0' in body
+    # The request being served is still in flight
+    assert 'http_requests_in_flight{endpoint="metrics"} 1' in body
+
+
+def test_statements_outside_of_requests():
+    app, metrics = make_app()
+    engine = sa.create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+    with engine.connect() as connection:
+        connection.execute(sa.text('SELECT 1'))
+
+    assert 'db_statement_duration_seconds_count{endpoint="none"} 1' in metrics.render()
+
+
+def test_workers_serve_the_sum_of_their_metrics(tmp_path):
+    # The metrics of another worker, process 1, written to the shared directory
+    other_app, other_metrics = make_app(METRICS_MULTIPROCESS_DIR=str(tmp_path),
+                                        METRICS_FLUSH_SECONDS=3600)
+    other_app.test_client().get('/things')
+    other_metrics.requests_in_flight.inc(endpoint='list_things')
+    other_metrics.flush()
+    os.rename(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+
+    app, metrics = make_app(METRICS_MULTIPROCESS_DIR=str(tmp_path), METRICS_FLUSH_SECONDS=3600)
+    client = app.test_client()
+    client.get('/things')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert ('http_request_duration_seconds_count'
+            '{endpoint="list_things",method="GET",status="200"} 2') in body
+    assert 'db_statements_per_request_sum{endpoint="list_things"} 4' in body
+    assert 'http_requests_in_flight{endpoint="list_things"} 1' in body
+
+
+def test_metrics_of_an_exited_worker_are_archived(tmp_path):
+    app, metrics = make_app(METRICS_MULTIPROCESS_DIR=str(tmp_path), METRICS_FLUSH_SECONDS=3600)
+    app.test_client().get('/things')
+    metrics.requests_in_flight.inc(endpoint='list_things')
+    metrics.flush()
+    before = read_multiprocess_dir(str(tmp_path))
+
+    mark_process_dead(str(tmp_path), os.getpid())
+    after = read_multiprocess_dir(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['.lock', 'archive.json']
+    assert after['http_request_duration_seconds'] == before['http_request_duration_seconds']
+    assert after['db_statements_per_request'] == before['db_statements_per_request']
+    # Gauges go away with their process
+    assert 'http_requests_in_flight' not in after
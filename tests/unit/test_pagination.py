@@ -0,0 +1,50 @@
+import pytest
+from datetime import datetime
+
+from project.events.pagination import decode_cursor, encode_cursor
+from project.models import Event
+
+
+def make_event(event_id, participants=1):
+    event = Event('Valid Title', 'Valid Description', 'Valid Venue', 'Valid Location',
+                  datetime(2099, 1, 1, 12, 0, 0), [], participants)
+    event.id = event_id
+    event.created_at = datetime(2023, 1, 1, 8, 30, 0)
+    return event
+
+
+def test_cursor_round_trip_for_date_sort():
+    cursor = encode_cursor(make_event(7), 'date')
+    assert decode_cursor(cursor, 'date') == (datetime(2099, 1, 1, 12, 0, 0), 7)
+
+
+def test_cursor_round_trip_for_popularity_sort():
+    cursor = encode_cursor(make_event(3, participants=42), 'popularity')
+    assert decode_cursor(cursor, 'popularity') == (42, 3)
+
+
+def test_cursor_round_trip_for_creation_time_sort():
+    cursor = encode_cursor(make_event(5), 'creation_time')
+    assert decode_cursor(cursor, 'creation_time') == (
+        datetime(2023, 1, 1, 8, 30, 0), 5)
+
+
+def test_cursor_round_trip_without_sort():
+    cursor = encode_cursor(make_event(9), None)
+    assert decode_cursor(cursor, None) == (None, 9)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(make_event(11), 'date')
+    assert all(c.isalnum() or c in '-_' for c in cursor)
+
+
+def test_cursor_from_another_sort_is_rejected():
+    cursor = encode_cursor(make_event(7), 'date')
+    with pytest.raises(ValueError, match="Cursor does not match the requested sort_by."):
+        decode_cursor(cursor, 'popularity')
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError, match="Invalid value for cursor."):
+        decode_cursor('not-a-cursor', 'date')
@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+
+from project.hashing import HashingBusy, PasswordHasher
+
+
+def make_hasher(**config):
+    app = Flask(__name__)
+    app.config.update({'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+                       'PASSWORD_HASH_WORKERS': 0, **config})
+    return PasswordHasher(app)
+
+
+def test_hash_and_verify_inline():
+    hasher = make_hasher()
+    password_hash = hasher.hash('Abcd1234!')
+    assert password_hash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(password_hash, 'Abcd1234!')
+    assert not hasher.verify(password_hash, 'Abcd1234?')
+
+
+def test_hash_and_verify_in_worker_processes():
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1)
+    try:
+        password_hash = hasher.hash('Abcd1234!')
+        assert hasher.verify(password_hash, 'Abcd1234!')
+    finally:
+        hasher.shutdown()
+
+
+def test_needs_rehash_when_parameters_change():
+    old_hash = make_hasher(PASSWORD_HASH_METHOD='pbkdf2:sha256:2000').hash('Abcd1234!')
+    hasher = make_hasher()
+    assert hasher.needs_rehash(old_hash)
+    assert not hasher.needs_rehash(hasher.hash('Abcd1234!'))
+    assert make_hasher(PASSWORD_SALT_LENGTH=24).needs_rehash(hasher.hash('Abcd1234!'))
+
+
+def test_completes_the_default_method_parameters():
+    hasher = make_hasher(PASSWORD_HASH_METHOD='pbkdf2:sha256')
+    assert not hasher.needs_rehash(hasher.hash('Abcd1234!'))
+
+
+def test_busy_when_the_queue_is_full():
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=1,
+                         PASSWORD_HASH_QUEUE_TIMEOUT=0.01)
+    hasher._slots.acquire()
+    with pytest.raises(HashingBusy):
+        hasher.hash('Abcd1234!')
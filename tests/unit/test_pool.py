@@ -0,0 +1,35 @@
+import pytest
+import sqlalchemy as sa
+
+from project.pool import TimedQueuePool
+
+
+def make_engine(**options):
+    return sa.create_engine('sqlite://', poolclass=TimedQueuePool, **options)
+
+
+def test_counts_checkouts_and_connections():
+    engine = make_engine(pool_size=2, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(sa.text('SELECT 1'))
+
+    stats = engine.pool.stats()
+    assert stats['checkouts'] == 3
+    assert stats['connects'] == 1
+    assert stats['checked_out'] == 0
+    assert stats['timeouts'] == 0
+
+
+def test_counts_timeouts_and_overflow():
+    engine = make_engine(pool_size=1, max_overflow=1, pool_timeout=0.01)
+    first, second = engine.connect(), engine.connect()
+    assert engine.pool.stats()['overflow'] == 1
+    with pytest.raises(sa.exc.TimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+
+    stats = engine.pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['wait_seconds_max'] >= 0.01
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from sqlalchemy.orm import Session
+
+from project.cache import Cache, LRUCache
+from project.models import User
+from project.principals import PrincipalCache
+
+
+@pytest.fixture(scope='module')
+def engine():
+    # The users table is portable, so an in-memory SQLite database will do
+    engine = sa.create_engine('sqlite://')
+    User.__table__.create(engine)
+    with Session(engine) as session:
+        session.add(User('test@example.com', 'Abcd1234!'))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+def count_statements(engine):
+    statements = []
+    sa.event.listen(engine, 'before_cursor_execute',
+                    lambda *args: statements.append(args[2]))
+    return statements
+
+
+def cache_user(principal_cache, session, token, expires_at=None):
+    generation = principal_cache.generation(1)
+    user = session.get(User, 1)
+    principal_cache.put(token, user, expires_at or time.time() + 600, generation)
+    return user
+
+
+def test_cached_user_is_attached_without_queries(engine, session):
+    principal_cache = PrincipalCache()
+    cache_user(principal_cache, session, 'token')
+
+    with Session(engine) as other_session:
+        statements = count_statements(engine)
+        user = principal_cache.get('token', other_session)
+        assert user.email == 'test@example.com'
+        assert user in other_session
+        assert statements == []
+    assert principal_cache.stats()['hits'] == 1
+
+
+def test_unknown_token_is_a_miss(session):
+    principal_cache = PrincipalCache()
+    assert principal_cache.get('unknown', session) is None
+    assert principal_cache.stats()['misses'] == 1
+
+
+def test_entry_does_not_outlive_token(session):
+    principal_cache = PrincipalCache()
+    cache_user(principal_cache, session, 'expired', expires_at=time.time() - 1)
+    assert principal_cache.get('expired', session) is None
+
+
+def test_password_change_invalidates_after_commit(session, monkeypatch):
+    principal_cache = PrincipalCache()
+    monkeypatch.setattr('project.models.principal_cache', principal_cache)
+    user = cache_user(principal_cache, session, 'token')
+
+    user.set_password('Efgh5678!')
+    session.flush()
+    assert principal_cache.get('token', session) is not None
+
+    session.commit()
+    assert principal_cache.get('token', session) is None
+
+
+def test_rolled_back_password_change_keeps_entry(session, monkeypatch):
+    principal_cache = PrincipalCache()
+    monkeypatch.setattr('project.models.principal_cache', principal_cache)
+    user = cache_user(principal_cache, session, 'token')
+
+    user.set_password('Efgh5678!')
+    session.flush()
+    session.rollback()
+    assert principal_cache.get('token', session) is not None
+
+
+def test_load_racing_with_invalidation_is_not_served(session):
+    principal_cache = PrincipalCache()
+    generation = principal_cache.generation(1)
+    user = session.get(User, 1)
+    principal_cache.invalidate_user(1)
+    principal_cache.put('token', user, time.time() + 600, generation)
+    assert principal_cache.get('token', session) is None
+
+
+class SharedStore(LRUCache):
+    """Stands for a redis store, shared by the processes of the tests."""
+    shared = True
+
+
+def principal_cache_of_process(shared_store=None, single_process=False):
+    app = Flask(__name__)
+    app.config['SINGLE_PROCESS'] = single_process
+    shared_cache = Cache()
+    shared_cache.init_app(app)
+    if shared_store is not None:
+        shared_cache.backend = shared_store
+    principal_cache = PrincipalCache()
+    principal_cache.init_app(app)
+    return principal_cache
+
+
+def test_invalidation_reaches_every_process_with_a_shared_backend(session):
+    shared_store = SharedStore()
+    process_a = principal_cache_of_process(shared_store)
+    process_b = principal_cache_of_process(shared_store)
+    cache_user(process_b, session, 'token')
+
+    process_a.invalidate_user(1)
+    assert process_b.get('token', session) is None
+
+
+def test_process_local_cache_is_disabled_with_several_processes(session):
+    principal_cache = principal_cache_of_process()
+    cache_user(principal_cache, session, 'token')
+    assert principal_cache.get('token', session) is None
+    assert principal_cache.stats()['enabled'] is False
+
+
+def test_process_local_cache_serves_a_single_process(session):
+    principal_cache = principal_cache_of_process(single_process=True)
+    cache_user(principal_cache, session, 'token')
+    assert principal_cache.get('token', session) is not None
@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+
+from project.events import events_blueprint
+from project.queries import HEADER, QueryBudgetExceeded, QueryCounter, query_budget
+from project.users import users_blueprint
+
+
+def make_app(enforced):
+    app = Flask(__name__)
+    app.config.update(TESTING=True, QUERY_COUNTER=True, QUERY_BUDGETS_ENFORCED=enforced)
+    engine = sa.create_engine('sqlite://')
+    QueryCounter(app).instrument_engine(engine)
+
+    @app.route('/things')
+    @query_budget(2)
+    def list_things():
+        with engine.connect() as connection:
+            for thing_id in range(3):
+                connection.execute(sa.text('SELECT :id'), {'id': thing_id})
+        return 'things'
+
+    @app.route('/thing')
+    @query_budget(2)
+    def get_thing():
+        with engine.connect() as connection:
+            connection.execute(sa.text('SELECT 1'))
+        return 'thing'
+
+    return app
+
+
+def test_statements_are_counted():
+    client = make_app(enforced=True).test_client()
+    assert client.get('/thing').headers[HEADER] == '1'
+
+
+def test_budget_is_enforced():
+    client = make_app(enforced=True).test_client()
+    with pytest.raises(QueryBudgetExceeded, match='executed 3 SQL statements, its budget is 2'):
+        client.get('/things')
+
+
+def test_repeated_statements_are_reported(caplog):
+    client = make_app(enforced=False).test_client()
+    with caplog.at_level(logging.WARNING):
+        response = client.get('/things')
+
+    assert response.status_code == 200
+    assert response.headers[HEADER] == '3'
+    assert '3x SELECT ?' in caplog.text
+    assert 'its budget is 2' in caplog.text
+
+
+def test_every_route_has_a_budget():
+    app = Flask(__name__)
+    app.register_blueprint(users_blueprint)
+    app.register_blueprint(events_blueprint)
+
+    missing = [rule.rule for rule in app.url_map.iter_rules()
+               if rule.endpoint != 'static'
+               and getattr(app.view_functions[rule.endpoint], 'query_budget', None) is None]
+    assert missing == []
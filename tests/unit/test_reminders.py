@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.base import STATE_PAUSED
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+
+from project.reminders import (configure_scheduler, due_events, register_jobs,
+                               scheduler, sweep_reminders)
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.update(SCHEDULER_JOBSTORE='memory',
+                      REMINDER_MISFIRE_GRACE_SECONDS=60, REMINDER_SWEEP_SECONDS=60,
+                      REVOKED_TOKENS_PURGE_SECONDS=3600, EVENTS_PARTICIPANT_FOLD_SECONDS=5)
+    configure_scheduler(app)
+    return app
+
+
+def test_scheduler_is_paused_until_elected():
+    make_app()
+    assert scheduler.running
+    assert scheduler.state == STATE_PAUSED
+
+
+def test_reminders_are_sent_by_a_single_sweep_job():
+    app = make_app()
+    register_jobs(app)
+    register_jobs(app)
+    try:
+        assert sorted(job.id for job in scheduler.get_jobs()) == [
+            'participant-shards-fold', 'reminder-sweeper', 'revoked-tokens-purge']
+        job = scheduler.get_job('reminder-sweeper')
+        assert job.func is sweep_reminders
+        assert job.trigger.interval == timedelta(seconds=60)
+    finally:
+        scheduler.remove_all_jobs()
+
+
+def test_due_events_claims_unsent_reminders_without_waiting():
+    now = datetime(2099, 1, 1, 12, 0, 0)
+    sql = str(due_events(now, timedelta(minutes=30), 500).compile(
+        dialect=postgresql.dialect()))
+    assert 'events.reminder_sent_at IS NULL' in sql
+    assert 'events.event_date > %(event_date_1)s' in sql
+    assert 'events.event_date <= %(event_date_2)s' in sql
+    assert sql.endswith('FOR UPDATE OF events SKIP LOCKED')
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from project.events.search import decode_cursor, encode_cursor, search_statement
+
+
+def compile_sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_search_uses_the_search_vector_and_ranks_matches():
+    sql = compile_sql(search_statement('jazz "open air" -indoor', 20))
+
+    assert 'events.search_vector @@ websearch_to_tsquery(%(websearch_to_tsquery_1)s, ' in sql
+    assert 'ORDER BY CAST(ts_rank(events.search_vector, websearch_to_tsquery(' in sql
+    assert sql.endswith('DESC, events.id DESC \n LIMIT %(param_1)s')
+    # Only the columns of the response are selected
+    assert sql.startswith('SELECT events.id, events.title, events.description, events.venue, '
+                          'events.location, events.event_date, events.tags, '
+                          'events.participants, CAST(ts_rank(')
+
+
+def test_search_resumes_after_the_cursor():
+    cursor = encode_cursor(Decimal('0.0607927'), 42)
+    statement = search_statement('jazz', 20, cursor)
+    params = statement.compile(dialect=postgresql.dialect()).params
+
+    assert ') < (%(' in compile_sql(statement)
+    assert Decimal('0.0607927') in params.values()
+    assert 42 in params.values()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(Decimal('0.0607927'), 42)) == (Decimal('0.0607927'), 42)
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', encode_cursor('NaN', 1),
+                                    encode_cursor(Decimal('0.5'), 'id')])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match='Invalid value for cursor'):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('q', [None, '   ', 'x' * 201])
+def test_invalid_query_is_rejected(q):
+    with pytest.raises(ValueError):
+        search_statement(q, 20)
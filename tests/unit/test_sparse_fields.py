@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+
+from project.events.caching import detail_etag
+from project.events.routes import _get_fields
+from project.events.serialization import event_columns, event_dict, event_dicts
+from project.models import Event
+
+ROW = (7, 'Event Title', 'Event Description', 'Event Venue', 'Event Location',
+       datetime(2100, 1, 2, 18, 30), ['music'], 5)
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_fields_keep_their_usual_order_and_always_include_the_id(app):
+    with app.test_request_context('/events?fields=event_date, title'):
+        assert _get_fields() == ('id', 'title', 'event_date')
+    with app.test_request_context('/events'):
+        assert _get_fields() is None
+
+
+def test_unknown_fields_are_rejected(app):
+    with app.test_request_context('/events?fields=title,password_hashed'):
+        with pytest.raises(ValueError, match='Unknown fields: password_hashed'):
+            _get_fields()
+
+
+def test_only_the_requested_columns_are_selected():
+    columns = event_columns(('id', 'title'), Event.participants, Event.id, None)
+    sql = str(sa.select(*columns).compile(dialect=postgresql.dialect()))
+    assert sql == 'SELECT events.id, events.title, events.participants \nFROM events'
+
+
+def test_rows_are_serialized_without_their_extra_columns():
+    assert event_dict(ROW) == {
+        'id': 7, 'title': 'Event Title', 'description': 'Event Description',
+        'venue': 'Event Venue', 'location': 'Event Location',
+        'event_date': datetime(2100, 1, 2, 18, 30), 'tags': ['music'], 'participants': 5}
+    assert event_dicts([(7, 'Event Title', 5)], ('id', 'title')) == [
+        {'id': 7, 'title': 'Event Title'}]
+
+
+def test_every_set_of_fields_has_its_own_etag():
+    assert detail_etag(7, 3) == 'event-7-3'
+    assert detail_etag(7, 3, ('id', 'title')) == 'event-7-3-id.title'
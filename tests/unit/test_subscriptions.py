@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+
+from project.events import subscriptions
+from project.events.subscriptions import fold_statement, subscription_statement
+
+
+def compile_sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_subscribing_increments_the_participants_in_the_same_statement():
+    sql = compile_sql(subscription_statement(3, 7, 1))
+    assert sql.startswith('WITH changed AS \n(INSERT INTO event_subscriptions')
+    assert 'ON CONFLICT DO NOTHING RETURNING event_subscriptions.event_id' in sql
+    assert 'UPDATE events SET participants=(events.participants + %(participants_1)s)' in sql
+    assert 'FROM changed WHERE events.id = changed.event_id' in sql
+
+
+def test_unsubscribing_decrements_only_deleted_subscriptions():
+    statement = subscription_statement(3, 7, -1)
+    sql = compile_sql(statement)
+    assert sql.startswith('WITH changed AS \n(DELETE FROM event_subscriptions')
+    assert 'FROM changed WHERE events.id = changed.event_id' in sql
+    assert -1 in statement.compile().params.values()
+
+
+def test_sharded_subscriptions_leave_the_event_row_alone():
+    sql = compile_sql(subscription_statement(3, 7, 1, shard=2))
+    assert 'UPDATE events' not in sql
+    assert 'INSERT INTO event_participant_shards (event_id, shard, count)' in sql
+    assert ('ON CONFLICT (event_id, shard) DO UPDATE SET '
+            'count = (event_participant_shards.count + excluded.count)') in sql
+
+
+def test_folding_skips_shards_locked_by_subscriptions():
+    sql = compile_sql(fold_statement())
+    assert sql.startswith('WITH folded AS \n(DELETE FROM event_participant_shards')
+    assert 'FOR UPDATE SKIP LOCKED' in sql
+    assert 'participants=(events.participants + deltas.delta)' in sql
+
+
+@pytest.mark.parametrize('shards, sharded', [(0, False), (8, True)])
+def test_sharding_is_optional(shards, sharded):
+    app = Flask(__name__)
+    app.config['EVENTS_PARTICIPANT_SHARDS'] = shards
+    with app.app_context():
+        assert subscriptions.is_sharded() is sharded
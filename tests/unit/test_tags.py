@@ -0,0 +1,36 @@
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+
+from project.events.routes import _get_tags
+from project.models import Event
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['EVENTS_MAX_TAGS_FILTER'] = 3
+    return app
+
+
+def test_tags_are_parsed_from_a_comma_separated_list(app):
+    with app.test_request_context('/events?tags=music, jazz,,music'):
+        assert _get_tags() == ['jazz', 'music']
+    with app.test_request_context('/events'):
+        assert _get_tags() == []
+
+
+@pytest.mark.parametrize('tags', ['a,b,c,d', 'x' * 51])
+def test_too_many_or_too_long_tags_are_rejected(app, tags):
+    with app.test_request_context('/events', query_string={'tags': tags}):
+        with pytest.raises(ValueError, match='Invalid value for tags'):
+            _get_tags()
+
+
+def test_tag_filters_use_the_array_operators():
+    def where(criterion):
+        return str(sa.select(Event.id).where(criterion).compile(dialect=postgresql.dialect()))
+
+    assert 'events.tags && %(tags_1)s::VARCHAR(50)[]' in where(Event.tags.overlap(['a']))
+    assert 'events.tags @> %(tags_1)s::VARCHAR(50)[]' in where(Event.tags.contains(['a']))
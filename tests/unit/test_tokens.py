@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from config import settings
+from project.tokens import REFRESH, decode_token, issue_tokens
+
+
+def test_login_issues_an_access_and_a_refresh_token():
+    tokens = issue_tokens(7)
+    access = decode_token(tokens['token'])
+    refresh = decode_token(tokens['refresh_token'], REFRESH)
+
+    assert access['public_id'] == refresh['public_id'] == 7
+    assert refresh['jti'] != refresh['fam']
+    assert refresh['exp'] - access['exp'] == pytest.approx(
+        (int(settings.REFRESH_TOKEN_EXPIRES_IN) - int(settings.ACCESS_TOKEN_EXPIRES_IN)) * 60,
+        abs=2)
+
+
+def test_refresh_tokens_keep_their_family():
+    family = decode_token(issue_tokens(7)['refresh_token'], REFRESH)['fam']
+    rotated = issue_tokens(7, uuid.UUID(family))['refresh_token']
+    assert decode_token(rotated, REFRESH)['fam'] == family
+
+
+def test_refresh_token_is_not_an_access_token():
+    tokens = issue_tokens(7)
+    with pytest.raises(jwt.InvalidTokenError, match='expected access'):
+        decode_token(tokens['refresh_token'])
+    with pytest.raises(jwt.InvalidTokenError, match='expected refresh'):
+        decode_token(tokens['token'], REFRESH)
+
+
+def test_tokens_issued_before_refresh_tokens_are_access_tokens():
+    token = jwt.encode({'public_id': 7, 'exp': datetime.utcnow() + timedelta(minutes=45)},
+                       settings.JWT_HS256_SECRET_KEY, 'HS256')
+    assert decode_token(token)['public_id'] == 7
+
+
+def test_expired_tokens_are_rejected():
+    token = jwt.encode({'public_id': 7, 'exp': datetime.utcnow() - timedelta(minutes=1)},
+                       settings.JWT_HS256_SECRET_KEY, 'HS256')
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(token)